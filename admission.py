@@ -0,0 +1,224 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+SCOPE_USER = "user"
+SCOPE_GROUP = "group"
+SCOPE_GLOBAL = "global"
+
+
+class QueueFull(Exception):
+    """上游请求队列已满"""
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """补充令牌后返回还需要等待多少秒才有一个令牌，0 表示可以立即通过"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class RateLimiter:
+    """按键（用户 ID、群号）分别限速的令牌桶，per_minute 为 0 时不限速。
+
+    空闲的桶会被补满，和新建的桶没有区别，因此键的数量超过 max_keys 时直接淘汰最久未使用的桶。
+    """
+
+    def __init__(self, per_minute: float, burst: int, max_keys: int = 10000):
+        self.rate = per_minute / 60
+        self.burst = max(1, burst)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def bucket(self, key: str, now: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class AdmissionController:
+    """用户、群、全局三级令牌桶限速。
+
+    三级都有令牌时才一起扣减，避免在群或全局被拒绝时白白消耗用户自己的令牌。
+    """
+
+    def __init__(self, user_per_minute: float = 0, user_burst: int = 1,
+                 group_per_minute: float = 0, group_burst: int = 1,
+                 global_per_minute: float = 0, global_burst: int = 1):
+        self.limiters = {
+            SCOPE_USER: RateLimiter(user_per_minute, user_burst),
+            SCOPE_GROUP: RateLimiter(group_per_minute, group_burst),
+            SCOPE_GLOBAL: RateLimiter(global_per_minute, global_burst, max_keys=1),
+        }
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {scope: 0 for scope in self.limiters}
+
+    def check(self, user_id: str, group_id: str = "") -> Optional[Tuple[str, float]]:
+        """允许通过时返回 None，否则返回 (被拒绝的级别, 建议等待的秒数)"""
+        now = time.monotonic()
+        keys = ((SCOPE_USER, user_id), (SCOPE_GROUP, group_id), (SCOPE_GLOBAL, ""))
+        buckets = []
+        for scope, key in keys:
+            limiter = self.limiters[scope]
+            if not limiter.enabled or (scope == SCOPE_GROUP and not key):
+                continue
+            bucket = limiter.bucket(key, now)
+            wait = bucket.wait_time(now)
+            if wait > 0:
+                self.rejected[scope] += 1
+                return scope, wait
+            buckets.append(bucket)
+        for bucket in buckets:
+            bucket.take()
+        self.admitted += 1
+        return None
+
+    def stats(self) -> Dict:
+        return {
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "tracked_users": len(self.limiters[SCOPE_USER]),
+            "tracked_groups": len(self.limiters[SCOPE_GROUP]),
+        }
+
+
+class WorkQueue:
+    """上游请求的有界并发队列：最多 concurrency 个请求同时执行，最多 max_waiting 个请求排队，
+    再多的请求直接抛出 QueueFull，不占用处理器等待。"""
+
+    def __init__(self, name: str, concurrency: int, max_waiting: int):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.max_waiting = max_waiting
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.max_depth = 0
+        self.completed = 0
+        self.queued = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+
+    def position(self) -> int:
+        """新请求需要排队时返回它的排队位置（从 1 开始），可以立即执行时返回 0"""
+        if self.active < self.concurrency and not self.waiting:
+            return 0
+        return self.waiting + 1
+
+    @property
+    def full(self) -> bool:
+        return self.active >= self.concurrency and self.waiting >= self.max_waiting
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self.full:
+            self.rejected += 1
+            raise QueueFull(self.name)
+        if self.active >= self.concurrency or self.waiting:
+            self.queued += 1
+        self.waiting += 1
+        self.max_depth = max(self.max_depth, self.waiting)
+        start = time.monotonic()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.wait_seconds += time.monotonic() - start
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict:
+        started = self.completed + self.active
+        return {
+            "active": self.active,
+            "concurrency": self.concurrency,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "max_depth": self.max_depth,
+            "completed": self.completed,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "avg_wait_ms": self.wait_seconds / started * 1000 if started else 0.0,
+        }
+
+
+class ParallelLimiter:
+    """按键（用户 ID）和全局两级限制同时进行的任务数，超出的任务等待空位。
+
+    先占用户自己的名额再占全局名额，等待中的任务不会占着全局名额拖慢其他用户；
+    键的信号量在没有任务使用时删除，不随用户数量增长。
+    """
+
+    def __init__(self, per_key: int, total: int):
+        self.per_key = max(1, per_key)
+        self.total = max(1, total)
+        self._global = asyncio.Semaphore(self.total)
+        # 键 -> [信号量, 正在使用或等待的任务数]
+        self._keys: Dict[str, list] = {}
+        self.active = 0
+        self.max_active = 0
+        self.completed = 0
+
+    @asynccontextmanager
+    async def slot(self, key: str) -> AsyncIterator[None]:
+        entry = self._keys.get(key)
+        if entry is None:
+            entry = self._keys[key] = [asyncio.Semaphore(self.per_key), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._global:
+                    self.active += 1
+                    self.max_active = max(self.max_active, self.active)
+                    try:
+                        yield
+                    finally:
+                        self.active -= 1
+                        self.completed += 1
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._keys[key]
+
+    def stats(self) -> Dict:
+        return {
+            "active": self.active,
+            "max_active": self.max_active,
+            "per_key": self.per_key,
+            "total": self.total,
+            "keys": len(self._keys),
+            "completed": self.completed,
+        }
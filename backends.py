@@ -0,0 +1,182 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from astrbot.api import logger
+
+STATE_CLOSED = "closed"        # 正常
+STATE_OPEN = "open"            # 熔断中，不参与调度
+STATE_HALF_OPEN = "half_open"  # 冷却结束，放一个探测请求
+
+
+class Backend:
+    """一个 pansou 后端的健康状态：EWMA 延迟、EWMA 错误率、最近的延迟样本和熔断器"""
+
+    def __init__(self, url: str, window: int = 100):
+        self.url = url
+        self.latency_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.state = STATE_CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.requests = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def percentile(self, percent: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+class BackendPool:
+    """多个 pansou 镜像的调度。
+
+    - 按 EWMA 延迟 ×（1 + 错误率惩罚）+ 错误率排序，优先使用最快、最稳定的后端
+    - 连续失败 failure_threshold 次后熔断，cooldown 秒后进入半开状态，放一个探测请求，成功即恢复
+    - 请求失败时依次换下一个后端重试，每个后端最多尝试一次
+    - 开启对冲后，首选后端超过 p95 延迟（限制在 [hedge_min_delay, hedge_max_delay] 之间）仍未返回，
+      就向第二个后端再发一次，先成功的结果生效，另一个请求被取消
+    """
+
+    def __init__(self, urls: List[str], alpha: float = 0.3, failure_threshold: int = 3, cooldown: float = 30,
+                 hedge: bool = False, hedge_percentile: float = 95, hedge_min_delay: float = 0.3,
+                 hedge_max_delay: float = 5.0, min_samples: int = 20):
+        self.backends = [Backend(url) for url in dict.fromkeys(urls)]
+        self.alpha = alpha
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+        self.min_samples = min_samples
+
+    def score(self, backend: Backend) -> float:
+        # 没有样本的后端按 0 延迟处理，让它尽快得到测量；错误率另外按每 100% 折合 1 秒加罚
+        latency = backend.latency_ewma or 0.0
+        return latency * (1 + 4 * backend.error_ewma) + backend.error_ewma
+
+    def candidates(self) -> List[Backend]:
+        """可用后端，按分数从好到差排列；全部熔断时仍返回最早熔断的一个，避免完全不可用"""
+        now = time.monotonic()
+        available = []
+        for backend in self.backends:
+            if backend.state == STATE_OPEN and now - backend.opened_at >= self.cooldown:
+                backend.state = STATE_HALF_OPEN
+                backend.probing = False
+            if backend.state == STATE_CLOSED:
+                available.append(backend)
+            elif backend.state == STATE_HALF_OPEN and not backend.probing:
+                available.append(backend)
+        available.sort(key=self.score)
+        if not available and self.backends:
+            available.append(min(self.backends, key=lambda b: b.opened_at))
+        return available
+
+    def hedge_delay(self, backend: Backend) -> float:
+        if len(backend.samples) < self.min_samples:
+            p95 = None
+        else:
+            p95 = backend.percentile(self.hedge_percentile)
+        if p95 is None:
+            return self.hedge_max_delay
+        return min(self.hedge_max_delay, max(self.hedge_min_delay, p95))
+
+    def record(self, backend: Backend, elapsed: float, ok: bool):
+        backend.requests += 1
+        backend.error_ewma = self.alpha * (0.0 if ok else 1.0) + (1 - self.alpha) * backend.error_ewma
+        backend.probing = False
+        if ok:
+            backend.samples.append(elapsed)
+            if backend.latency_ewma is None:
+                backend.latency_ewma = elapsed
+            else:
+                backend.latency_ewma = self.alpha * elapsed + (1 - self.alpha) * backend.latency_ewma
+            backend.consecutive_failures = 0
+            if backend.state != STATE_CLOSED:
+                logger.info(f"[PanSearch] 后端恢复: {backend.url}")
+                backend.state = STATE_CLOSED
+            return
+        backend.failures += 1
+        backend.consecutive_failures += 1
+        if backend.state == STATE_HALF_OPEN or backend.consecutive_failures >= self.failure_threshold:
+            if backend.state != STATE_OPEN:
+                logger.warning(f"[PanSearch] 后端熔断 {self.cooldown} 秒: {backend.url}")
+            backend.state = STATE_OPEN
+            backend.opened_at = time.monotonic()
+
+    async def _attempt(self, backend: Backend, fn: Callable[[str], Awaitable[Any]]) -> Any:
+        if backend.state == STATE_HALF_OPEN:
+            backend.probing = True
+        start = time.monotonic()
+        try:
+            result = await fn(backend.url)
+        except asyncio.CancelledError:
+            # 对冲中落败被取消，不计入成功或失败
+            backend.probing = False
+            raise
+        except Exception:
+            self.record(backend, time.monotonic() - start, ok=False)
+            raise
+        self.record(backend, time.monotonic() - start, ok=True)
+        return result
+
+    async def run(self, fn: Callable[[str], Awaitable[Any]]) -> Tuple[Any, str]:
+        """用最合适的后端执行 fn(后端地址)，返回 (结果, 实际使用的后端地址)；所有后端都失败时抛出最后一个异常"""
+        queue = self.candidates()
+        if not queue:
+            raise RuntimeError("没有配置搜索后端")
+        pending: Dict[asyncio.Task, Backend] = {}
+        hedge_task: Optional[asyncio.Task] = None
+        last_error: Optional[BaseException] = None
+        try:
+            while queue or pending:
+                if not pending:
+                    backend = queue.pop(0)
+                    pending[asyncio.ensure_future(self._attempt(backend, fn))] = backend
+                hedge_delay = None
+                if self.hedge and queue and len(pending) == 1:
+                    hedge_delay = self.hedge_delay(next(iter(pending.values())))
+                done, _ = await asyncio.wait(pending, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # 首选后端超过对冲延迟仍未返回，向下一个后端再发一次
+                    backend = queue.pop(0)
+                    backend.hedges += 1
+                    logger.info(f"[PanSearch] 搜索超过 {hedge_delay:.2f} 秒未返回，对冲请求: {backend.url}")
+                    hedge_task = asyncio.ensure_future(self._attempt(backend, fn))
+                    pending[hedge_task] = backend
+                    continue
+                for task in done:
+                    backend = pending.pop(task)
+                    if task.exception() is None:
+                        if task is hedge_task:
+                            backend.hedge_wins += 1
+                        return task.result(), backend.url
+                    last_error = task.exception()
+                    logger.warning(f"[PanSearch] 后端请求失败: {backend.url}: {type(last_error).__name__}: {str(last_error)}")
+        finally:
+            for task in pending:
+                task.cancel()
+        raise last_error
+
+    def stats(self) -> List[Dict]:
+        return [
+            {
+                "url": backend.url,
+                "state": backend.state,
+                "latency_ms": (backend.latency_ewma or 0.0) * 1000,
+                "p95_ms": (backend.percentile(95) or 0.0) * 1000,
+                "error_rate": backend.error_ewma,
+                "requests": backend.requests,
+                "failures": backend.failures,
+                "hedges": backend.hedges,
+                "hedge_wins": backend.hedge_wins,
+            }
+            for backend in self.backends
+        ]
@@ -0,0 +1,103 @@
+"""多后端搜索调度：在本地启动几个模拟的 pansou 服务，对比单一后端、多后端、多后端 + 对冲请求的延迟分布
+
+模拟的服务：
+- tail：平时 50ms，3% 的请求卡 1.5 秒（长尾）
+- steady：稳定 120ms
+- broken：一半请求返回 HTTP 500
+- down：端口上没有服务
+用法：python bench/bench_backends.py [请求数]
+"""
+import asyncio
+import random
+import sys
+import time
+
+from aiohttp import web
+
+from common import load, print_table
+
+backends = load("backends")
+http_client = load("http_client")
+
+PORT = 18190
+RESPONSE = {"code": 0, "data": {"total": 1, "merged_by_type": {"quark": [{"url": "https://pan.quark.cn/s/x", "note": "x"}]}}}
+
+
+def stub(delay, tail_rate=0.0, tail_delay=0.0, error_rate=0.0, seed=0):
+    rnd = random.Random(seed)
+
+    async def handler(request):
+        if rnd.random() < error_rate:
+            raise web.HTTPInternalServerError()
+        await asyncio.sleep(tail_delay if rnd.random() < tail_rate else delay)
+        return web.json_response(RESPONSE)
+    return handler
+
+
+async def start_servers():
+    runners = []
+    urls = {}
+    specs = {
+        "tail": stub(0.05, tail_rate=0.03, tail_delay=1.5, seed=1),
+        "steady": stub(0.12, seed=2),
+        "broken": stub(0.05, error_rate=0.5, seed=3),
+    }
+    for offset, (name, handler) in enumerate(specs.items()):
+        app = web.Application()
+        app.router.add_post("/api/search", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", PORT + offset).start()
+        runners.append(runner)
+        urls[name] = f"http://127.0.0.1:{PORT + offset}"
+    urls["down"] = f"http://127.0.0.1:{PORT + 9}"
+    return runners, urls
+
+
+async def run_scenario(client, urls, hedge, requests):
+    pool = backends.BackendPool(urls, hedge=hedge, hedge_min_delay=0.1, hedge_max_delay=1.0, cooldown=5)
+    latencies = []
+    failures = 0
+
+    async def request(base_url):
+        return await client.post_json(f"{base_url}/api/search", json={"kw": "仙逆"})
+
+    for _ in range(requests):
+        start = time.perf_counter()
+        try:
+            await pool.run(request)
+        except Exception:
+            failures += 1
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    def pct(p):
+        return f"{latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000:.0f}"
+    hedges = sum(stats["hedges"] for stats in pool.stats())
+    return [pct(50), pct(95), pct(99), f"{latencies[-1] * 1000:.0f}", failures, hedges]
+
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    runners, urls = await start_servers()
+    client = http_client.AsyncHttpClient(timeout=5)
+    scenarios = [
+        ("单一后端（长尾）", [urls["tail"]], False),
+        ("单一后端（不可用）", [urls["down"]], False),
+        ("不可用 + 半数报错 + 长尾 + 稳定", [urls["down"], urls["broken"], urls["tail"], urls["steady"]], False),
+        ("同上 + 对冲", [urls["down"], urls["broken"], urls["tail"], urls["steady"]], True),
+        ("长尾 + 稳定 + 对冲", [urls["tail"], urls["steady"]], True),
+    ]
+    rows = []
+    try:
+        for name, scenario_urls, hedge in scenarios:
+            rows.append([name, *await run_scenario(client, scenario_urls, hedge, requests)])
+    finally:
+        await client.close()
+        for runner in runners:
+            await runner.cleanup()
+    print_table(["场景", "p50(ms)", "p95(ms)", "p99(ms)", "最大(ms)", "失败", "对冲次数"], rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+"""搜索结果去重：合并响应越来越大时，去重的耗时，以及去重前后前几页中不重复的分享数
+
+同一批热门分享由多个来源重复返回，重复的写法包括：带查询参数、提取码写在链接里、末尾斜杠、
+百度的 /share/init?surl= 形式，以及标题更短或更长的版本。
+用法：python bench/bench_dedup.py [重复比例]
+"""
+import random
+import sys
+import time
+
+from common import load, print_table
+
+dedup = load("dedup")
+records = load("records")
+
+HOSTS = {"baidu": "pan.baidu.com", "quark": "pan.quark.cn", "uc": "drive.uc.cn", "xunlei": "pan.xunlei.com"}
+PAGE_SIZE = 8
+PAGES = 10
+
+
+def variant(share_id, cloud_type, rnd):
+    """同一个分享的一种随机写法，返回 (链接, 提取码)"""
+    host = HOSTS[cloud_type]
+    password = f"{int(share_id[-4:], 16) % 10000:04d}"
+    kind = rnd.randrange(5)
+    if kind == 0:
+        return f"https://{host}/s/{share_id}", password
+    if kind == 1:
+        return f"https://{host}/s/{share_id}?pwd={password}", ""
+    if kind == 2:
+        return f"https://{host}/s/{share_id}/", f" {password} "
+    if kind == 3 and cloud_type == "baidu":
+        return f"https://{host}/share/init?surl={share_id[1:]}", password
+    return f"https://{host}/s/{share_id}?from=plugin{rnd.randrange(8)}", password
+
+
+def make_response(per_type, dup_rate, rnd):
+    links_by_type = {}
+    for cloud_type in HOSTS:
+        unique = max(1, int(per_type * (1 - dup_rate)))
+        ids = [f"1{rnd.getrandbits(40):010x}" for _ in range(unique)]
+        links = []
+        for i in range(per_type):
+            # 重复的多是热门分享：多个来源都会返回排在前面的那些
+            share_id = ids[i] if i < unique else rnd.choice(ids[:max(8, unique // 10)])
+            url, password = variant(share_id, cloud_type, rnd)
+            note = "仙逆" + " 第1-128集 4K 国语中字" * rnd.randrange(3)
+            links.append(records.LinkRecord(url, password, note, cloud_type, f"plugin:source{i % 8}"))
+        rnd.shuffle(links)
+        links_by_type[cloud_type] = links
+    return links_by_type
+
+
+def shown_unique(links_by_type):
+    """按插件的轮次排列（每种网盘每轮2条）取前 PAGES 页，统计其中不重复的分享数"""
+    shown = []
+    for round_start in range(0, PAGE_SIZE * PAGES, 2):
+        for links in links_by_type.values():
+            shown.extend(links[round_start:round_start + 2])
+    shown = shown[:PAGE_SIZE * PAGES]
+    return len({dedup.share_key(record.url) for record in shown})
+
+
+def main():
+    dup_rate = float(sys.argv[1]) if len(sys.argv) > 1 else 0.4
+    rnd = random.Random(3)
+    rows = []
+    for per_type in (100, 1000, 10000, 50000):
+        links_by_type = make_response(per_type, dup_rate, rnd)
+        total = per_type * len(HOSTS)
+        rounds = max(1, 20000 // total)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            deduped, removed = dedup.dedupe_links(links_by_type)
+        elapsed = (time.perf_counter() - start) / rounds
+        rows.append([
+            total, removed, f"{elapsed * 1000:.2f}", f"{elapsed / total * 1e6:.2f}",
+            f"{shown_unique(links_by_type)}/{PAGE_SIZE * PAGES}", f"{shown_unique(deduped)}/{PAGE_SIZE * PAGES}",
+        ])
+    print_table(["链接数", "去掉重复", "耗时(ms)", "每条(µs)", f"前{PAGES}页不重复(去重前)", f"前{PAGES}页不重复(去重后)"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""本地链接索引：随着索引增长，批量写入速度、查询延迟和文件大小的变化
+
+链接标题由随机组合的剧名加集数、画质等后缀构成，查询分三类：
+- 命中：已收录的剧名
+- 常见词：几乎所有标题都包含的“高清”，倒排表最长的情况
+- 未命中：没有收录的剧名
+用法：python bench/bench_index.py [最大链接数]
+"""
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import load, print_table
+
+link_index = load("link_index")
+records = load("records")
+query = load("query")
+
+CHARS = "仙逆庆余年繁花狂飙三体长相思莲花楼漫长的季节凡人修仙传斗破苍穹吞噬星空完美世界遮天一人之下雪中悍刀行赘婿开端人世间山海情隐秘角落沉默真相"
+TYPES = ["quark", "baidu", "uc", "xunlei", "aliyun"]
+
+
+def make_titles(count, rnd):
+    titles = set()
+    while len(titles) < count:
+        titles.add("".join(rnd.choice(CHARS) for _ in range(rnd.randint(2, 5))))
+    return sorted(titles)
+
+
+def make_batch(titles, start, count, rnd):
+    batch = []
+    now = time.time()
+    for i in range(start, start + count):
+        title = rnd.choice(titles)
+        cloud_type = TYPES[i % len(TYPES)]
+        note = f"{title} 第{rnd.randint(1, 60)}集 4K 高清 国语中字 {cloud_type}"
+        batch.append((records.LinkRecord(f"https://pan.{cloud_type}.cn/s/{i:08d}", f"{i % 10000:04d}", note,
+                                         cloud_type, f"plugin:source{i % 8}"), now))
+    return batch
+
+
+def measure(index, keywords, rounds=3):
+    latencies = []
+    found = 0
+    for _ in range(rounds):
+        for keyword in keywords:
+            start = time.perf_counter()
+            rows = index._query(query.fold_text(keyword), "all")
+            latencies.append(time.perf_counter() - start)
+            found += len(rows)
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    return f"{p50:.2f}", f"{p99:.2f}", found // rounds // len(keywords)
+
+
+def main():
+    max_links = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rnd = random.Random(1)
+    titles = make_titles(5000, rnd)
+    known = rnd.sample(titles, 50)
+    missing = [title + "乙丙" for title in rnd.sample(titles, 50)]
+    steps = [size for size in (10000, 50000, 100000, 200000, 500000) if size <= max_links] or [max_links]
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        index = link_index.LinkIndex(Path(tmp) / "index.db", max_links=max_links)
+        size = 0
+        for target in steps:
+            start = time.perf_counter()
+            while size < target:
+                count = min(500, target - size)
+                added, _ = index._write_batch(make_batch(titles, size, count, rnd))
+                index.link_count += added
+                size += count
+            write_rate = (target - (rows[-1][0] if rows else 0)) / (time.perf_counter() - start)
+            hit = measure(index, known)
+            common = measure(index, ["高清"], rounds=5)
+            miss = measure(index, missing)
+            rows.append([target, f"{write_rate:.0f}", *hit, *common[:2], *miss[:2],
+                         f"{index.size_bytes() / 1024 / 1024:.1f}"])
+        index._reader.close()
+        index._writer.close()
+    print_table(["链接数", "写入(条/秒)", "命中p50(ms)", "命中p99(ms)", "每次命中条数",
+                 "常见词p50(ms)", "常见词p99(ms)", "未命中p50(ms)", "未命中p99(ms)", "文件(MB)"], rows)
+
+
+if __name__ == "__main__":
+    main()
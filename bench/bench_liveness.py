@@ -0,0 +1,111 @@
+"""链接有效性检查：对比开启前后用户选择第一页资源时的转存失败次数
+
+模拟服务把一部分分享链接固定为失效（分享页显示“分享已失效”，转存也会失败），
+每个用户搜索一个关键词后从第一页随机选择一个资源。
+用法：python bench/bench_liveness.py [用户数] [失效比例]
+"""
+import asyncio
+import logging
+import random
+import sys
+import time
+from urllib.parse import urlsplit
+
+from common import load, print_table
+from stub_servers import Fault, StubServers
+
+main_module = load("main")
+
+KEYWORDS = [f"测试剧{i}" for i in range(40)]
+
+
+class Ctx:
+    pass
+
+
+class Event:
+    def __init__(self, text, user_id):
+        self.message_str = text
+        self.bot = {"user_id": 10000, "nickname": "机器人"}
+        self._user_id = user_id
+
+    def get_sender_id(self):
+        return self._user_id
+
+    def get_sender_name(self):
+        return self._user_id
+
+    def get_group_id(self):
+        return "g1"
+
+    def get_messages(self):
+        return []
+
+    def plain_result(self, text):
+        return text
+
+
+async def send(plugin, text, user_id):
+    replies = []
+    async for reply in plugin.handle_any_message(Event(text, user_id)):
+        replies.append(reply)
+    return replies
+
+
+async def run_scenario(stubs, users, liveness):
+    plugin = main_module.MyPlugin(Ctx(), {
+        "pansou_api_url": stubs.url,
+        "ziliao_api_url": stubs.url,
+        "rate_limit_user_per_minute": 0,
+        "rate_limit_group_per_minute": 0,
+        "liveness_enabled": liveness,
+    })
+    if plugin.liveness is not None:
+        # 只在压测中放行本地的模拟分享页，插件默认只访问已知网盘的分享页
+        plugin.liveness.share_hosts = {urlsplit(stubs.url).netloc}
+    rnd = random.Random(7)
+    before = dict(stubs.calls)
+    search_times = []
+    try:
+        for i in range(users):
+            user_id = f"u{i}"
+            start = time.perf_counter()
+            await send(plugin, "搜" + rnd.choice(KEYWORDS), user_id)
+            search_times.append(time.perf_counter() - start)
+            await send(plugin, str(rnd.randint(1, plugin.page_size)), user_id)
+        stats = plugin.liveness.stats() if plugin.liveness is not None else None
+    finally:
+        await plugin.terminate()
+    calls = {key: stubs.calls[key] - before[key] for key in stubs.calls}
+    search_times.sort()
+    return calls, search_times, stats
+
+
+async def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    dead_rate = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+    stubs = StubServers(search_fault=Fault(latency=0.05), transfer_fault=Fault(latency=0.05),
+                        share_fault=Fault(latency=0.03, jitter=0.02), share_dead_rate=dead_rate,
+                        local_share_urls=True, port=18295)
+    await stubs.start()
+    rows = []
+    failures = {}
+    try:
+        for name, liveness in (("关闭", False), ("开启", True)):
+            calls, search_times, stats = await run_scenario(stubs, users, liveness)
+            failures[name] = calls["transfer_errors"]
+            rows.append([
+                name, calls["transfer"], calls["transfer_errors"], f"{calls['transfer_errors'] / max(calls['transfer'], 1):.1%}",
+                f"{search_times[len(search_times) // 2] * 1000:.0f}",
+                f"{search_times[int(len(search_times) * 0.95)] * 1000:.0f}",
+                calls["share"], stats["dropped"] if stats else "-",
+            ])
+    finally:
+        await stubs.stop()
+    print_table(["检查", "转存", "转存失败", "失败率", "搜索p50(ms)", "搜索p95(ms)", "分享页请求", "拦截失效链接"], rows)
+    print(f"避免的转存失败：{failures['关闭'] - failures['开启']} 次")
+
+
+if __name__ == "__main__":
+    logging.getLogger("astrbot").setLevel(logging.WARNING)
+    asyncio.run(main())
@@ -0,0 +1,163 @@
+"""响应结构识别与链接提取：单次遍历的 ResponseNormalizer vs 原来的逐层猜测
+
+先用 fixtures/ 下每种已知结构的样例校验提取结果，再用大响应对比耗时。
+用法：python bench/bench_normalizer.py [每种网盘的链接数]
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+from common import load, make_links, print_table
+
+normalizer_module = load("normalizer")
+LinkRecord = load("records").LinkRecord
+
+CLOUD_TYPES = ["quark", "baidu", "uc", "xunlei"]
+FIXTURES = Path(__file__).parent / "fixtures"
+
+# 每个样例期望提取到的 {网盘类型: 链接数}，以及搜索时使用的 src
+EXPECTED = {
+    "shape_envelope_merged.json": ("all", {"quark": 3, "baidu": 2, "xunlei": 2}),
+    "shape_top_level_merged.json": ("all", {"quark": 1, "uc": 3}),
+    "shape_envelope_links.json": ("baidu", {"baidu": 4}),
+    "shape_data_list.json": ("all", {"quark": 2, "uc": 2}),
+    "shape_type_keys.json": ("all", {"quark": 2, "xunlei": 3}),
+    "shape_generic.json": ("baidu", {"baidu": 3}),
+    "shape_error_with_data.json": ("all", {"quark": 2}),
+}
+
+
+def legacy_search_result(result):
+    """原 _search_resources 中对响应结构的判断（去掉日志）"""
+    if result.get("code") == 0:
+        if result.get("data"):
+            data = result.get("data", {})
+            if isinstance(data, dict) and (data.get('total', 0) > 0 or data.get('links', []) or data.get('merged_by_type', {})):
+                return data
+            elif isinstance(data, list):
+                return {"total": len(data), "links": data}
+        elif "links" in result:
+            links = result.get("links", [])
+            return {"total": len(links), "links": links}
+        elif "merged_by_type" in result:
+            merged_by_type = result.get("merged_by_type", {})
+            total = sum(len(links) for links in merged_by_type.values())
+            return {"total": total, "merged_by_type": merged_by_type}
+        return result
+    if result.get("data"):
+        return result.get("data", {})
+    return {}
+
+
+def legacy_links_by_type(search_result):
+    """原 _extract_all_links 中按类型收集链接的部分（去掉日志和轮次排列），同样生成 LinkRecord"""
+    def record(link, cloud_type):
+        return LinkRecord(link.get("url", ""), link.get("password", ""), link.get("note", ""),
+                          cloud_type, link.get("source", ""))
+
+    merged_by_type = search_result.get("merged_by_type", {})
+    max_links_per_type = 100
+    all_links_by_type = {}
+    if merged_by_type:
+        for cloud_type in CLOUD_TYPES:
+            if cloud_type in merged_by_type:
+                type_links = [record(link, cloud_type) for link in merged_by_type[cloud_type][:max_links_per_type]]
+                if type_links:
+                    all_links_by_type[cloud_type] = type_links
+    else:
+        links = search_result.get("links", [])
+        if links:
+            current_src = search_result.get("src", "")
+            if current_src in CLOUD_TYPES:
+                type_links = [record(link, current_src) for link in links[:max_links_per_type]]
+                if type_links:
+                    all_links_by_type[current_src] = type_links
+        else:
+            for cloud_type in CLOUD_TYPES:
+                if cloud_type in search_result:
+                    type_links = [record(link, cloud_type) for link in search_result[cloud_type][:max_links_per_type]]
+                    if type_links:
+                        all_links_by_type[cloud_type] = type_links
+        if not all_links_by_type and "data" in search_result:
+            data = search_result.get("data", {})
+            data_links = data.get("links", [])
+            if data_links:
+                current_src = data.get("src", "") or search_result.get("src", "")
+                if current_src in CLOUD_TYPES:
+                    type_links = [record(link, current_src) for link in data_links[:max_links_per_type]]
+                    if type_links:
+                        all_links_by_type[current_src] = type_links
+        if not all_links_by_type:
+            for key, value in search_result.items():
+                if isinstance(value, list) and value and isinstance(value[0], dict):
+                    possible_types = [t for t in CLOUD_TYPES if t in str(key).lower() or t in str(search_result.get("src", ""))]
+                    cloud_type = possible_types[0] if possible_types else "other"
+                    type_links = []
+                    for link in value[:max_links_per_type]:
+                        if "url" in link or "link" in link:
+                            type_links.append(LinkRecord(
+                                link.get("url", link.get("link", "")),
+                                link.get("password", link.get("pwd", "")),
+                                link.get("note", link.get("title", "")),
+                                cloud_type,
+                                link.get("source", ""),
+                            ))
+                    if type_links:
+                        all_links_by_type[cloud_type] = type_links
+    return {t: links for t, links in all_links_by_type.items() if t in CLOUD_TYPES}
+
+
+def check_fixtures():
+    rows = []
+    failures = 0
+    for name, (src, expected) in EXPECTED.items():
+        response = json.loads((FIXTURES / name).read_text(encoding="utf-8"))
+        normalizer = normalizer_module.ResponseNormalizer(CLOUD_TYPES)
+        links_by_type, shape = normalizer.normalize(response, src, backend="fixture")
+        got = {t: len(links) for t, links in links_by_type.items()}
+        legacy = {t: len(links) for t, links in legacy_links_by_type(legacy_search_result(response)).items()}
+        ok = got == expected
+        failures += not ok
+        rows.append([name, shape, got, legacy, "OK" if ok else "FAIL"])
+    print_table(["样例", "识别结构", "新实现", "原实现", "结果"], rows)
+    return failures
+
+
+def bench(per_type: int, repeat: int = 50):
+    response = {
+        "code": 0,
+        "message": "success",
+        "data": {
+            "total": per_type * 6,
+            "merged_by_type": {t: make_links("仙逆", t, per_type) for t in CLOUD_TYPES + ["aliyun", "magnet"]},
+        },
+    }
+    normalizer = normalizer_module.ResponseNormalizer(CLOUD_TYPES)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        legacy_links_by_type(legacy_search_result(response))
+    legacy_ms = (time.perf_counter() - start) / repeat * 1000
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        normalizer.normalize(response, "all", backend="bench")
+    new_ms = (time.perf_counter() - start) / repeat * 1000
+    return legacy_ms, new_ms
+
+
+def main():
+    failures = check_fixtures()
+    print()
+    sizes = [int(sys.argv[1])] if len(sys.argv) > 1 else [20, 100, 1000]
+    rows = []
+    for per_type in sizes:
+        legacy_ms, new_ms = bench(per_type)
+        rows.append([per_type, f"{legacy_ms:.3f}", f"{new_ms:.3f}", f"{legacy_ms / new_ms:.2f}x"])
+    print_table(["每种网盘链接数", "原实现(ms)", "新实现(ms)", "加速"], rows)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""搜索关键词规范化：校验各种写法的规范化结果，以及每个关键词的处理耗时
+
+CASES 中既有应该合并到同一个关键词的写法，也有不能被改动的片名（片名本身带字母和数字，
+容易被误当成季数集数）。"原规则"一列是改为只认明确的季数集数写法之前的默认规则。
+用法：python bench/bench_query.py [重复次数]
+"""
+import sys
+import time
+
+from common import load, print_table
+
+query = load("query")
+
+# 改为只认明确写法之前的默认规则：单独的 s、e 后面隔着空格的数字也会被去掉
+LEGACY_STRIP_PATTERNS = [
+    r"第[0-9一二三四五六七八九十百零〇两]+[季部集期话篇章]",
+    r"(?<![a-z])(?:season|s)\s*\d+(?:\s*ep?\s*\d+)?",
+    r"(?<![a-z])(?:ep?|episode)\s*\d+",
+    r"\d{1,4}[集话]",
+    r"全\d*集|全集|完整版|完结|高清|蓝光|超清|4k|1080p|720p|国语|粤语|中字|电视剧|连续剧|动漫|动画|电影",
+]
+
+# (关键词, 期望的规范化结果)
+CASES = [
+    # 应该合并的写法
+    ("仙逆", "仙逆"),
+    ("《仙逆》", "仙逆"),
+    ("仙逆第一季", "仙逆"),
+    ("仙逆 第12集 4K", "仙逆"),
+    ("仙逆（主演：XXX）", "仙逆"),
+    ("慶餘年 第二季", "庆余年"),
+    ("Friends S01E02", "friends"),
+    ("Friends s01 e02", "friends"),
+    ("Andor S2", "andor"),
+    ("Loki Season 2", "loki"),
+    ("Loki EP3", "loki"),
+    ("Loki Episode 3", "loki"),
+    ("Loki E3", "loki"),
+    # 片名本身带字母和数字，不能改动
+    ("WALL-E 2", "wall e 2"),
+    ("Ocean's 11", "ocean s 11"),
+    ("Se7en", "se7en"),
+    ("Apollo 13", "apollo 13"),
+    ("Station 19", "station 19"),
+    ("Terminator 2", "terminator 2"),
+    ("E3", "e3"),
+]
+
+
+def check_cases():
+    normalizer = query.QueryNormalizer()
+    legacy = query.QueryNormalizer(LEGACY_STRIP_PATTERNS)
+    rows = []
+    failures = 0
+    for keyword, expected in CASES:
+        got = normalizer.canonical(keyword)
+        ok = got == expected
+        failures += not ok
+        rows.append([keyword, legacy.canonical(keyword), got, expected, "OK" if ok else "FAIL"])
+    print_table(["关键词", "原规则", "现规则", "期望", "结果"], rows)
+    return failures
+
+
+def main():
+    failures = check_cases()
+    print()
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    normalizer = query.QueryNormalizer()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for keyword, _ in CASES:
+            normalizer.canonical(keyword)
+    elapsed = time.perf_counter() - start
+    print_table(["关键词数", "每个关键词(µs)"], [[len(CASES), f"{elapsed / repeat / len(CASES) * 1e6:.2f}"]])
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
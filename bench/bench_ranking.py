@@ -0,0 +1,104 @@
+"""结果排序：用户找到一个能转存的资源平均需要选择几次，以及排序的耗时
+
+模拟的搜索结果中：
+- 8 个来源的转存成功率从 20% 到 95% 不等，发布超过 90 天的链接成功率再打折扣
+- 约四成标题只是部分匹配关键词（别的剧），用户看到后直接跳过，不会选择
+用户从第一条往下看，选择第一个标题匹配的资源，转存失败就选下一个，最多选择 8 次。
+排序开启时，每次转存结果都会记录到来源可靠性统计中，后面的搜索会用上。
+用法：python bench/bench_ranking.py [搜索次数]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+from common import load, print_table
+
+ranking = load("ranking")
+records = load("records")
+
+CLOUD_TYPES = ["quark", "baidu", "uc", "xunlei"]
+SOURCE_RATES = [0.95, 0.9, 0.9, 0.85, 0.6, 0.4, 0.3, 0.2]
+SHOWS = ["仙逆", "庆余年", "繁花", "狂飙", "三体", "长相思", "莲花楼", "凡人修仙传", "斗破苍穹", "完美世界"]
+LINKS_PER_TYPE = 2
+MAX_TRIES = 8
+
+
+def make_response(keyword, rnd, now):
+    links_by_type = {}
+    truth = {}
+    for cloud_type in CLOUD_TYPES:
+        links = []
+        for i in range(100):
+            source = rnd.randrange(len(SOURCE_RATES))
+            age = rnd.uniform(0, 365) * 86400
+            if rnd.random() < 0.6:
+                note = f"{keyword} 第{rnd.randint(1, 40)}集 4K"
+            else:
+                note = f"{rnd.choice(SHOWS)}{keyword[0]} 合集"
+            rate = SOURCE_RATES[source] * (1.0 if age < 90 * 86400 else 0.7)
+            url = f"https://pan.{cloud_type}.cn/s/{keyword}{cloud_type}{i}"
+            published = datetime.fromtimestamp(now - age, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+            links.append(records.LinkRecord(url, "", note, cloud_type, f"plugin:source{source}", published))
+            truth[url] = rnd.random() < rate
+        links_by_type[cloud_type] = links
+    return links_by_type, truth
+
+
+def round_robin(links_by_type):
+    """与插件未开启排序时的 _extract_all_links 相同"""
+    links = []
+    max_links = max(len(links) for links in links_by_type.values())
+    for start in range(0, max_links, LINKS_PER_TYPE):
+        for cloud_type in CLOUD_TYPES:
+            links.extend(links_by_type.get(cloud_type, [])[start:start + LINKS_PER_TYPE])
+    return links
+
+
+def simulate(links, keyword, truth, tracker):
+    """返回 (转存次数, 是否找到能用的资源)"""
+    tries = 0
+    for record in links:
+        if keyword not in record.note:
+            continue
+        tries += 1
+        success = truth[record.url]
+        if tracker is not None:
+            tracker.record(record, success)
+        if success:
+            return tries, True
+        if tries >= MAX_TRIES:
+            break
+    return tries, False
+
+
+def main():
+    searches = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rows = []
+    for name, ranked in (("轮次排列", False), ("排序", True)):
+        rnd = random.Random(11)
+        tracker = ranking.ReliabilityTracker()
+        ranker = ranking.Ranker(tracker)
+        transfers = found = first_try = 0
+        elapsed = 0.0
+        now = time.time()
+        for i in range(searches):
+            keyword = rnd.choice(SHOWS)
+            links_by_type, truth = make_response(keyword, rnd, now)
+            start = time.perf_counter()
+            if ranked:
+                links = ranker.arrange(keyword, links_by_type, CLOUD_TYPES, LINKS_PER_TYPE)
+            else:
+                links = round_robin(links_by_type)
+            elapsed += time.perf_counter() - start
+            tries, success = simulate(links, keyword, truth, tracker if ranked else None)
+            transfers += tries
+            found += success
+            first_try += success and tries == 1
+        rows.append([name, f"{transfers / searches:.2f}", f"{first_try / searches:.1%}", f"{found / searches:.1%}",
+                     f"{elapsed / searches * 1000:.2f}"])
+    print_table(["排列方式", "平均转存次数", "第一次就成功", "找到可用资源", "每次排列(ms)"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""handle_any_message 消息分发：预编译的 MessageRouter vs 原来的逐条规则匹配
+
+回放 fixtures/group_chatter.txt 中的群聊消息（大部分是普通聊天），先校验两种实现的分发结果一致，
+再对比每条消息的平均耗时。
+用法：python bench/bench_router.py [回放消息条数]
+"""
+import re
+import sys
+import time
+from pathlib import Path
+
+from common import load, print_table
+
+router_module = load("router")
+
+FIXTURES = Path(__file__).parent / "fixtures"
+BOT = {"user_id": 10000, "nickname": "机器人"}
+
+
+class Plain:
+    type = "Plain"
+
+    def __init__(self, text):
+        self.text = text
+
+
+class At:
+    type = "At"
+
+    def __init__(self, qq):
+        self.qq = qq
+
+
+class Event:
+    def __init__(self, message_str, chain):
+        self.message_str = message_str
+        self.bot = BOT
+        self._chain = chain
+
+    def get_messages(self):
+        return self._chain
+
+
+def load_events():
+    events = []
+    for line in (FIXTURES / "group_chatter.txt").read_text(encoding="utf-8").splitlines():
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("@机器人"):
+            text = line[len("@机器人"):]
+            events.append(Event(text, [At(BOT["user_id"]), Plain(text)]))
+        else:
+            events.append(Event(line, [Plain(line)]))
+    return events
+
+
+def legacy_route(event):
+    """原 handle_any_message 中的判断顺序（去掉回复内容），返回值与 MessageRouter.route 相同"""
+    message_str = event.message_str
+    message_chain = event.get_messages()
+    join_keywords = ['加入了群聊', '加入群聊', '已加入', '新成员', 'welcome', 'Welcome']
+    if any(keyword in message_str for keyword in join_keywords):
+        return "join", None
+    if message_chain:
+        for msg in message_chain:
+            if hasattr(msg, 'type') and msg.type in ['MemberJoin', 'MemberJoinEvent', '群成员加入', '入群']:
+                return "join", None
+            if hasattr(msg, 'content') and any(keyword in msg.content for keyword in join_keywords):
+                return "join", None
+
+    message_str = event.message_str.strip()
+    message_chain = event.get_messages()
+    bot = event.bot
+    bot_id = str(bot.get('user_id', ''))
+    bot_name = bot.get('nickname', '')
+    if message_chain:
+        for msg in message_chain:
+            if hasattr(msg, 'type') and msg.type in ['At', 'at']:
+                if hasattr(msg, 'target') and str(msg.target) == bot_id:
+                    return "at", None
+                elif hasattr(msg, 'qq') and str(msg.qq) == bot_id:
+                    return "at", None
+            if hasattr(msg, 'content') and bot_name in msg.content:
+                return "at", None
+
+    search_patterns = [r'^搜(.+)$', r'^百度(.+)$', r'^夸克(.+)$', r'^UC(.+)$', r'^迅雷(.+)$']
+    cloud_types = {r'^搜(.+)$': "all", r'^百度(.+)$': "baidu", r'^夸克(.+)$': "quark",
+                   r'^UC(.+)$': "uc", r'^迅雷(.+)$': "xunlei"}
+    for pattern in search_patterns:
+        match = re.match(pattern, message_str)
+        if match:
+            keyword = match.group(1).strip()
+            if keyword:
+                return "search", (keyword, cloud_types[pattern])
+            break
+
+    if message_str in ["下一页", "下一頁", "next", "下页", "下頁"]:
+        return "page", "next"
+    if message_str in ["上一页", "上一頁", "prev", "previous", "上页", "上頁"]:
+        return "page", "prev"
+
+    select_patterns = [r'^第(\d+)个$', r'^第(\d+)個$', r'^(\d+)$', r'^选择(\d+)$', r'^選擇(\d+)$', r'^转存(\d+)$']
+    for pattern in select_patterns:
+        match = re.match(pattern, message_str)
+        if match:
+            return "select", int(match.group(1))
+    return None
+
+
+def check(events, router):
+    rows = []
+    failures = 0
+    routed = {}
+    for event in events:
+        expected = legacy_route(event)
+        got = router.route(event)
+        if got != expected:
+            failures += 1
+            rows.append([event.message_str, expected, got])
+        kind = got[0] if got else "忽略"
+        routed[kind] = routed.get(kind, 0) + 1
+    if rows:
+        print_table(["消息", "原实现", "新实现"], rows)
+    print("分发结果：" + "，".join(f"{kind} {count}" for kind, count in routed.items()))
+    return failures
+
+
+def bench(events, total):
+    router = router_module.MessageRouter()
+    replay = (events * (total // len(events) + 1))[:total]
+
+    start = time.perf_counter()
+    for event in replay:
+        legacy_route(event)
+    legacy_us = (time.perf_counter() - start) / total * 1e6
+
+    start = time.perf_counter()
+    for event in replay:
+        router.route(event)
+    new_us = (time.perf_counter() - start) / total * 1e6
+    return legacy_us, new_us
+
+
+def main():
+    events = load_events()
+    failures = check(events, router_module.MessageRouter())
+    print()
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    legacy_us, new_us = bench(events, total)
+    print_table(["回放消息数", "原实现(us/条)", "新实现(us/条)", "加速"],
+                [[total, f"{legacy_us:.2f}", f"{new_us:.2f}", f"{legacy_us / new_us:.2f}x"]])
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""会话内存占用对比：每条链接一个 dict vs LinkRecord
+
+用法：python bench/bench_session_memory.py [会话数]
+"""
+import sys
+import tracemalloc
+
+from common import load, make_links, print_table
+
+records = load("records")
+
+CLOUD_TYPES = ["quark", "baidu", "uc", "xunlei"]
+LINKS_PER_TYPE = 100
+
+
+def build_dict_session(raw):
+    return {
+        "keyword": "仙逆",
+        "results": [
+            {
+                "url": link["url"],
+                "password": link["password"],
+                "note": link["note"],
+                "type": cloud_type,
+                "source": link["source"],
+            }
+            for cloud_type, links in raw.items()
+            for link in links
+        ],
+        "current_page": 1,
+    }
+
+
+def build_record_session(raw):
+    return {
+        "keyword": "仙逆",
+        "results": [
+            records.LinkRecord(link["url"], link["password"], link["note"], cloud_type, link["source"])
+            for cloud_type, links in raw.items()
+            for link in links
+        ],
+        "current_page": 1,
+    }
+
+
+def measure(builder, sessions: int) -> float:
+    # 每个会话使用独立的上游响应，模拟真实情况下各自解析出来的字符串
+    raws = [{t: make_links(f"kw{n}", t, LINKS_PER_TYPE) for t in CLOUD_TYPES} for n in range(sessions)]
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    store = [builder(raw) for raw in raws]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    assert len(store) == sessions
+    return allocated / sessions
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    dict_bytes = measure(build_dict_session, sessions)
+    record_bytes = measure(build_record_session, sessions)
+    links = len(CLOUD_TYPES) * LINKS_PER_TYPE
+    print(f"{sessions} 个会话，每个会话 {links} 条链接（不含 url/note 等字符串本身，它们两种方式共享）\n")
+    print_table(
+        ["表示方式", "字节/会话", "字节/链接"],
+        [
+            ["dict", f"{dict_bytes:,.0f}", f"{dict_bytes / links:,.0f}"],
+            ["LinkRecord", f"{record_bytes:,.0f}", f"{record_bytes / links:,.0f}"],
+        ],
+    )
+    print(f"\n节省: {1 - record_bytes / dict_bytes:.1%}")
+
+
+if __name__ == "__main__":
+    main()
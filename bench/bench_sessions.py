@@ -0,0 +1,101 @@
+"""会话内存预算：搜索高峰时会话占用的内存，以及估算字节数与实际分配的差距
+
+每个用户搜索一次，会话保存 400 条链接（每种网盘 100 条）并渲染第一页，然后翻到第二页（渲染、resize、刷新有效期）。
+“不同”表示每个用户搜索的都是不同的关键词，链接对象各不相同（最坏情况，没有和搜索缓存共享的链接对象）；
+“相同”表示所有用户搜索同一个热门关键词，链接对象来自同一份搜索缓存，每条链接的大小只计算一次。
+实际分配用 tracemalloc 统计，包含会话存储本身的开销；“估算偏差”是增量累计的总数与逐个会话完整估算之和的差。
+用法：python bench/bench_sessions.py [用户数] [预算MB]
+"""
+import sys
+import time
+import tracemalloc
+
+from common import load, print_table
+
+records = load("records")
+sessions = load("sessions")
+
+PAGE_SIZE = 8
+
+
+def make_results(user, links=400):
+    return [
+        records.LinkRecord(f"https://pan.quark.cn/s/{user:06d}{i:04d}abcdef", f"{i % 10000:04d}",
+                           f"剧名{user} 第{i}集 4K 高清 国语中字", "quark", f"plugin:source{i % 8}",
+                           f"2025-01-{1 + i % 28:02d}T12:00:00Z")
+        for i in range(links)
+    ]
+
+
+def render(results, page):
+    start = (page - 1) * PAGE_SIZE
+    return "\n".join(f"【{start + i + 1}】{record.note}\n    📦 夸克网盘\n------------------------"
+                     for i, record in enumerate(results[start:start + PAGE_SIZE]))
+
+
+def make_session(user, results):
+    return {"keyword": f"剧名{user}", "results": results, "current_page": 1, "_pages": {1: render(results, 1)}}
+
+
+def shrink(session):
+    keep = session["current_page"] * PAGE_SIZE
+    if len(session["results"]) <= keep:
+        return False
+    session["results"] = session["results"][:keep]
+    session["_pages"] = {}
+    return True
+
+
+def fill(users, max_bytes, shared):
+    """返回 (会话存储, 写入总耗时, 翻页总耗时)；只统计会话存储的操作（含估算和截断、淘汰），不含生成链接和渲染"""
+    store = sessions.SessionStore(timeout=300, max_sessions=100000, max_bytes=max_bytes,
+                                  sizeof=records.estimate_session_size, shrink=shrink)
+    hot = make_results(0) if shared else None
+    write_elapsed = flip_elapsed = 0.0
+    for user in range(users):
+        user_id = f"u{user}"
+        session = make_session(user, list(hot) if shared else make_results(user))
+        start = time.perf_counter()
+        store[user_id] = session
+        write_elapsed += time.perf_counter() - start
+        page = render(session["results"], 2)
+        start = time.perf_counter()
+        if user_id in store:
+            session["current_page"] = 2
+            store.resize(user_id, records.add_rendered_page(session["_pages"], 2, page))
+            store.touch(user_id)
+        flip_elapsed += time.perf_counter() - start
+    return store, write_elapsed, flip_elapsed
+
+
+def run(users, max_bytes, shared):
+    tracemalloc.start()
+    store, _, _ = fill(users, max_bytes, shared)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # 不限制时不做估算，单独算一遍估算值用于对比
+    full = sum(records.estimate_session_size(session) for session, *_ in store._sessions.values())
+    estimated = store.total_bytes if max_bytes else full
+    stats = store.stats()
+    del store
+    # tracemalloc 会拖慢内存分配，耗时另外在不追踪的情况下测量
+    _, write_elapsed, flip_elapsed = fill(users, max_bytes, shared)
+    return [
+        f"{max_bytes / 1024 / 1024:.0f}" if max_bytes else "不限制", "相同" if shared else "不同", users,
+        stats["live"], stats["truncated"], stats["budget_evicted"], f"{estimated / 1024 / 1024:.1f}",
+        f"{(estimated - full) / 1024:+.1f}KB", f"{current / 1024 / 1024:.1f}", f"{peak / 1024 / 1024:.1f}",
+        f"{write_elapsed / users * 1e6:.0f}", f"{flip_elapsed / users * 1e6:.1f}",
+    ]
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    budget_mb = float(sys.argv[2]) if len(sys.argv) > 2 else 64
+    rows = [run(users, max_bytes, shared) for shared in (False, True)
+            for max_bytes in (0, int(budget_mb * 1024 * 1024))]
+    print_table(["预算(MB)", "关键词", "用户数", "保留会话", "截断", "淘汰", "估算(MB)", "估算偏差", "实际(MB)", "峰值(MB)",
+                 "每次写入(µs)", "每次翻页(µs)"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""大响应解析：完整 json.loads + ResponseNormalizer vs MergedStreamParser 流式解析
+
+以 fixtures/ 下录制的 pansou merged 响应为准（也可以在命令行传入其他录制的响应文件），
+按 64KB 分块模拟到达，对比解析耗时、读取的字节数和 tracemalloc 峰值内存。
+录制的响应只有几十 KB，“录制×N”把每种类型的链接按录制时的内容和顺序重复到指定数量，模拟关键词较宽泛时的大响应；
+合成数据只作为补充，用来对比类型顺序的影响：
+“前”表示四种网盘排在 merged_by_type 开头，取满配额后即可停止读取；
+“字母序”是 pansou（Go map 序列化时按键排序）实际返回的顺序，与录制的响应相同，需要的类型和其他类型交错；
+“后”表示前面有大量其他类型（aliyun、magnet 等）需要跳过，是流式解析最不利的情况。
+用法：python bench/bench_streaming.py [每种网盘的链接数] [录制的响应文件 ...]
+"""
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from common import load, make_links, print_table
+
+normalizer_module = load("normalizer")
+streaming = load("streaming")
+
+CLOUD_TYPES = ["quark", "baidu", "uc", "xunlei"]
+OTHER_TYPES = ["aliyun", "magnet", "ed2k", "115", "pikpak", "tianyi"]
+CHUNK_SIZE = 64 * 1024
+RECORDED = [Path(__file__).parent / "fixtures" / "recorded_search.json"]
+
+
+ORDERS = {
+    "前": CLOUD_TYPES + OTHER_TYPES,
+    "字母序": sorted(CLOUD_TYPES + OTHER_TYPES),
+    "后": OTHER_TYPES + CLOUD_TYPES,
+}
+
+
+def make_response(per_type: int, order) -> bytes:
+    response = {
+        "code": 0,
+        "message": "success",
+        "data": {
+            "total": per_type * len(order),
+            "merged_by_type": {t: make_links("仙逆", t, per_type) for t in order},
+        },
+    }
+    return json.dumps(response, ensure_ascii=False).encode("utf-8")
+
+
+def scale_recorded(recorded: dict, per_type: int) -> bytes:
+    """按录制时的类型顺序，把每种类型的链接重复到 per_type 条，分享 ID 加上序号避免完全相同"""
+    merged = {}
+    for cloud_type, links in recorded["data"]["merged_by_type"].items():
+        merged[cloud_type] = [dict(links[i % len(links)], url=f"{links[i % len(links)]['url']}{i // len(links)}")
+                              for i in range(per_type)] if links else []
+    response = dict(recorded, data=dict(recorded["data"], total=sum(map(len, merged.values())), merged_by_type=merged))
+    return json.dumps(response, ensure_ascii=False).encode("utf-8")
+
+
+def chunks(body: bytes):
+    for start in range(0, len(body), CHUNK_SIZE):
+        yield body[start:start + CHUNK_SIZE]
+
+
+def full_parse(body: bytes, src: str):
+    # 与 aiohttp response.json() 相同：先读完整个响应，再解码、解析
+    buffer = b"".join(chunks(body))
+    normalizer = normalizer_module.ResponseNormalizer(CLOUD_TYPES)
+    links_by_type, _ = normalizer.normalize(json.loads(buffer.decode("utf-8")), src, backend="bench")
+    return links_by_type, len(buffer)
+
+
+def stream_parse(body: bytes, src: str):
+    wanted = [src] if src in CLOUD_TYPES else CLOUD_TYPES
+    parser = streaming.MergedStreamParser(wanted, quota=100)
+    for chunk in chunks(body):
+        if parser.feed(chunk):
+            break
+    return parser.links_by_type, parser.bytes_read
+
+
+def measure(fn, body: bytes, src: str, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(body, src)
+    elapsed_ms = (time.perf_counter() - start) / repeat * 1000
+
+    tracemalloc.start()
+    links_by_type, read = fn(body, src)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return links_by_type, elapsed_ms, read, peak
+
+
+def compare(rows, label: str, order_name: str, body: bytes, repeat: int) -> int:
+    failures = 0
+    for src in ("all", "quark"):
+        # 响应体本身不计入峰值，两种方式都是在已收到的字节上工作
+        full_links, full_ms, full_read, full_peak = measure(full_parse, body, src, repeat)
+        stream_links, stream_ms, stream_read, stream_peak = measure(stream_parse, body, src, repeat)
+        same = ({t: [r.to_list() for r in links] for t, links in full_links.items() if src == "all" or t == src}
+                == {t: [r.to_list() for r in links] for t, links in stream_links.items()})
+        failures += not same
+        rows.append([
+            label, order_name, src, f"{len(body) / 1024 / 1024:.2f}MB",
+            f"{full_ms:.2f}", f"{stream_ms:.2f}", f"{full_ms / stream_ms:.1f}x",
+            f"{stream_read * 100 // full_read}%",
+            f"{full_peak / 1024 / 1024:.1f}MB", f"{stream_peak / 1024 / 1024:.1f}MB",
+            "OK" if same else "FAIL",
+        ])
+    return failures
+
+
+def main():
+    sizes = [int(sys.argv[1])] if len(sys.argv) > 1 else [200, 2000, 10000]
+    recorded_paths = [Path(arg) for arg in sys.argv[2:]] or RECORDED
+    rows = []
+    failures = 0
+    for path in recorded_paths:
+        body = path.read_bytes()
+        recorded = json.loads(body)
+        order_name = ",".join(recorded["data"]["merged_by_type"])
+        failures += compare(rows, f"录制 {path.name}", order_name, body, 200)
+        for per_type in sizes:
+            failures += compare(rows, f"录制×{per_type}", order_name, scale_recorded(recorded, per_type),
+                                max(3, 20000 // per_type))
+    for per_type in sizes:
+        for order_name, order in ORDERS.items():
+            failures += compare(rows, f"合成 {per_type}", order_name, make_response(per_type, order),
+                                max(3, 20000 // per_type))
+    print_table(["数据", "类型顺序", "src", "响应大小", "完整解析(ms)", "流式解析(ms)", "加速",
+                 "读取比例", "完整解析峰值", "流式解析峰值", "结果一致"], rows)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
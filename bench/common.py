@@ -0,0 +1,38 @@
+"""基准测试公共工具：在不启动 AstrBot 的情况下加载插件内的模块"""
+import importlib
+import sys
+import types
+from pathlib import Path
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+PACKAGE = "pansou_plugin"
+
+
+def load(module: str):
+    """以包的形式导入插件目录下的模块，使模块内的相对导入可以正常工作"""
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [str(PLUGIN_DIR)]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.{module}")
+
+
+def make_links(keyword: str, cloud_type: str, count: int, sources: int = 8):
+    """生成 pansou merged_by_type 格式的链接列表"""
+    return [
+        {
+            "url": f"https://pan.{cloud_type}.cn/s/{keyword}{i:06d}abcdef",
+            "password": f"{i % 10000:04d}",
+            "note": f"{keyword} 第{i}集 4K 高清 国语中字 {cloud_type}",
+            "datetime": f"2025-01-{1 + i % 28:02d}T12:00:00Z",
+            "source": f"plugin:source{i % sources}",
+        }
+        for i in range(count)
+    ]
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(cell)) for cell in column) for column in zip(headers, *rows)]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(cell).ljust(w) for cell, w in zip(row, widths)))
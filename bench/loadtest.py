@@ -0,0 +1,336 @@
+"""离线压测：本地模拟 pansou/ziliao 服务，用合成的群聊消息驱动 handle_any_message
+
+- 模拟服务回放 fixtures/recorded_search.json、recorded_transfer.json，可注入延迟、长尾和失败
+- 消息按固定速率开环发送（泊松到达），混合普通聊天、搜索、翻页、选择和@机器人；
+  关键词按 Zipf 分布取热门剧名，翻页和选择只由已经搜索过的用户发出
+- 输出吞吐量、各类消息的 p50/p95/p99、上游调用次数、内存占用和插件自身的计数器
+- --json 保存结果，--baseline 与之前保存的结果对比，p95 或吞吐量退化超过阈值时以退出码 1 结束，可用于 CI
+
+插件的用户/群限速默认关闭（否则压测流量大部分会被限速拒绝），可以用 --config 重新打开。
+用法：python bench/loadtest.py [--rate 50] [--duration 20] [--search-latency 200] [--config key=value ...]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+from common import load, print_table
+from stub_servers import Fault, StubServers
+
+main_module = load("main")
+router_module = load("router")
+
+FIXTURES = Path(__file__).parent / "fixtures"
+BOT = {"user_id": 10000, "nickname": "机器人"}
+
+KEYWORDS = ["仙逆", "庆余年", "繁花", "狂飙", "三体", "长相思", "莲花楼", "漫长的季节", "凡人修仙传", "斗破苍穹",
+            "吞噬星空", "完美世界", "遮天", "一人之下", "雪中悍刀行", "赘婿", "开端", "人世间", "山海情", "隐秘的角落",
+            "沉默的真相", "去有风的地方", "苍兰诀", "星汉灿烂", "梦华录", "卿卿日常", "与凤行", "玫瑰的故事", "墨雨云间", "庆余年第二季"]
+SEARCH_PREFIXES = [("搜", 70), ("夸克", 12), ("百度", 10), ("UC", 4), ("迅雷", 4)]
+DEFAULT_MIX = "chatter=80,search=8,page=4,select=6,at=2"
+
+
+class Plain:
+    type = "Plain"
+
+    def __init__(self, text):
+        self.text = text
+
+
+class At:
+    type = "At"
+
+    def __init__(self, qq):
+        self.qq = qq
+
+
+class Event:
+    """只实现 handle_any_message 用到的 AstrMessageEvent 接口"""
+
+    def __init__(self, text, user_id, group_id, chain):
+        self.message_str = text
+        self.bot = BOT
+        self._user_id = user_id
+        self._group_id = group_id
+        self._chain = chain
+
+    def get_sender_id(self):
+        return self._user_id
+
+    def get_sender_name(self):
+        return f"用户{self._user_id}"
+
+    def get_group_id(self):
+        return self._group_id
+
+    def get_messages(self):
+        return self._chain
+
+    def plain_result(self, text):
+        return text
+
+
+class Ctx:
+    pass
+
+
+class EventGenerator:
+    def __init__(self, users, groups, mix, zipf, seed):
+        self.rnd = random.Random(seed)
+        self.users = [(f"u{i}", f"g{i % groups}") for i in range(users)]
+        self.kinds, self.kind_weights = zip(*mix.items())
+        self.keyword_weights = [1 / (rank + 1) ** zipf for rank in range(len(KEYWORDS))]
+        self.prefixes, self.prefix_weights = zip(*SEARCH_PREFIXES)
+        # 只保留不会触发指令的群聊消息作为普通聊天
+        router = router_module.MessageRouter()
+        lines = (FIXTURES / "group_chatter.txt").read_text(encoding="utf-8").splitlines()
+        self.chatter = [line for line in lines
+                        if line and not line.startswith(("#", "@")) and router.route_text(line.strip()) is None]
+        # 搜索过、会话里有结果的用户
+        self.searched = {}
+
+    def next(self):
+        kind = self.rnd.choices(self.kinds, self.kind_weights)[0]
+        if kind in ("page", "select") and not self.searched:
+            kind = "search"
+        if kind in ("page", "select"):
+            user_id, group_id = self.rnd.choice(list(self.searched.items()))
+        else:
+            user_id, group_id = self.rnd.choice(self.users)
+        chain = None
+        if kind == "chatter":
+            text = self.rnd.choice(self.chatter)
+        elif kind == "search":
+            keyword = self.rnd.choices(KEYWORDS, self.keyword_weights)[0]
+            text = self.rnd.choices(self.prefixes, self.prefix_weights)[0] + keyword
+            self.searched[user_id] = group_id
+        elif kind == "page":
+            text = "下一页" if self.rnd.random() < 0.8 else "上一页"
+        elif kind == "select":
+            number = self.rnd.randint(1, 6)
+            text = f"第{number}个" if self.rnd.random() < 0.3 else str(number)
+        else:
+            text = "在吗"
+            chain = [At(BOT["user_id"]), Plain(text)]
+        return kind, Event(text, user_id, group_id, chain if chain is not None else [Plain(text)])
+
+
+def parse_pairs(items, convert=str):
+    result = {}
+    for item in items:
+        key, _, value = item.partition("=")
+        result[key.strip()] = convert(value.strip())
+    return result
+
+
+def parse_value(value):
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return None
+
+
+async def drive(plugin, event, kind, latencies, replies, errors):
+    start = time.perf_counter()
+    try:
+        async for _ in plugin.handle_any_message(event):
+            replies[kind] += 1
+    except Exception:
+        errors[kind] += 1
+    latencies[kind].append(time.perf_counter() - start)
+
+
+async def run(args):
+    stubs = StubServers(
+        search_fault=Fault(args.search_latency / 1000, args.search_jitter / 1000, args.tail_rate,
+                           args.tail_latency / 1000, args.search_error_rate),
+        transfer_fault=Fault(args.transfer_latency / 1000, args.transfer_jitter / 1000, 0.0, 0.0,
+                             args.transfer_error_rate),
+        port=args.port,
+        seed=args.seed,
+    )
+    await stubs.start()
+    config = {
+        "pansou_api_url": stubs.url,
+        "ziliao_api_url": stubs.url,
+        "rate_limit_user_per_minute": 0,
+        "rate_limit_group_per_minute": 0,
+    }
+    config.update(parse_pairs(args.config, parse_value))
+    plugin = main_module.MyPlugin(Ctx(), config)
+    generator = EventGenerator(args.users, args.groups, parse_pairs(args.mix.split(","), float), args.zipf, args.seed)
+
+    latencies = defaultdict(list)
+    replies = defaultdict(int)
+    errors = defaultdict(int)
+    tasks = set()
+    if args.tracemalloc:
+        tracemalloc.start()
+    arrivals = random.Random(args.seed + 1)
+    start = time.perf_counter()
+    next_at = start
+    sent = 0
+    try:
+        while next_at - start < args.duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            kind, event = generator.next()
+            task = asyncio.create_task(drive(plugin, event, kind, latencies, replies, errors))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            sent += 1
+            next_at += arrivals.expovariate(args.rate)
+        # 等待还没处理完的消息，超时的算作未完成
+        if tasks:
+            await asyncio.wait(list(tasks), timeout=args.drain_timeout)
+        elapsed = time.perf_counter() - start
+        unfinished = len(tasks)
+        for task in list(tasks):
+            task.cancel()
+        traced_peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024 if args.tracemalloc else None
+        counters = {name: counter.total() for name, counter in plugin.metrics.counters.items()}
+        sessions = plugin.user_sessions.stats()
+    finally:
+        if args.tracemalloc:
+            tracemalloc.stop()
+        await plugin.terminate()
+        await stubs.stop()
+
+    completed = sum(len(values) for values in latencies.values())
+    kinds = {}
+    for kind, values in sorted(latencies.items()):
+        values.sort()
+        kinds[kind] = {
+            "count": len(values),
+            "replies": replies[kind],
+            "errors": errors[kind],
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": values[-1] * 1000,
+        }
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("json", "baseline")},
+        "sent": sent,
+        "completed": completed,
+        "unfinished": unfinished,
+        "elapsed_s": elapsed,
+        "throughput": completed / elapsed if elapsed else 0.0,
+        "kinds": kinds,
+        "upstream": dict(stubs.calls),
+        "memory": {
+            "tracemalloc_peak_mb": traced_peak,
+            "rss_mb": current_rss_mb(),
+            # Linux 上 ru_maxrss 的单位是 KB
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+        "sessions": sessions,
+        "plugin_counters": counters,
+    }
+
+
+def report(result):
+    print(f"发送 {result['sent']} 条，完成 {result['completed']} 条，未完成 {result['unfinished']} 条，"
+          f"耗时 {result['elapsed_s']:.1f}s，吞吐 {result['throughput']:.1f} 条/秒")
+    rows = [[kind, stats["count"], stats["replies"], stats["errors"], f"{stats['p50_ms']:.2f}",
+             f"{stats['p95_ms']:.2f}", f"{stats['p99_ms']:.2f}", f"{stats['max_ms']:.2f}"]
+            for kind, stats in result["kinds"].items()]
+    print_table(["消息类型", "条数", "回复数", "异常", "p50(ms)", "p95(ms)", "p99(ms)", "最大(ms)"], rows)
+    upstream = result["upstream"]
+    print(f"上游调用：搜索 {upstream['search']} 次（失败 {upstream['search_errors']}），"
+          f"转存 {upstream['transfer']} 次（失败 {upstream['transfer_errors']}）")
+    memory = result["memory"]
+    parts = [f"RSS {memory['rss_mb']:.1f}MB" if memory["rss_mb"] is not None else "",
+             f"峰值 RSS {memory['max_rss_mb']:.1f}MB"]
+    if memory["tracemalloc_peak_mb"] is not None:
+        parts.append(f"tracemalloc 峰值 {memory['tracemalloc_peak_mb']:.1f}MB")
+    print("内存：" + "，".join(part for part in parts if part))
+    print(f"会话：{result['sessions']}")
+    print("插件计数器：" + "，".join(f"{name} {value:g}" for name, value in result["plugin_counters"].items()))
+
+
+def compare(result, baseline, max_regression):
+    """返回超过阈值的退化项；延迟很小时（< 1ms）的波动不计入"""
+    problems = []
+    if result["throughput"] < baseline["throughput"] * (1 - max_regression):
+        problems.append(f"吞吐 {baseline['throughput']:.1f} -> {result['throughput']:.1f} 条/秒")
+    for kind, old in baseline["kinds"].items():
+        new = result["kinds"].get(kind)
+        if new is None:
+            continue
+        if new["p95_ms"] > max(old["p95_ms"] * (1 + max_regression), old["p95_ms"] + 1):
+            problems.append(f"{kind} p95 {old['p95_ms']:.2f} -> {new['p95_ms']:.2f}ms")
+        if new["errors"] > old["errors"]:
+            problems.append(f"{kind} 异常 {old['errors']} -> {new['errors']}")
+    if result["unfinished"] > baseline["unfinished"]:
+        problems.append(f"未完成 {baseline['unfinished']} -> {result['unfinished']}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=50, help="每秒消息数（泊松到达）")
+    parser.add_argument("--duration", type=float, default=20, help="发送消息的时长（秒）")
+    parser.add_argument("--drain-timeout", type=float, default=30, help="发送结束后等待处理完成的最长时间（秒）")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--groups", type=int, default=20)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"各类消息的权重，默认 {DEFAULT_MIX}")
+    parser.add_argument("--zipf", type=float, default=1.1, help="关键词热度的 Zipf 指数")
+    parser.add_argument("--search-latency", type=float, default=200, help="搜索接口延迟（毫秒）")
+    parser.add_argument("--search-jitter", type=float, default=50)
+    parser.add_argument("--tail-rate", type=float, default=0.02, help="搜索请求进入长尾的比例")
+    parser.add_argument("--tail-latency", type=float, default=2000)
+    parser.add_argument("--search-error-rate", type=float, default=0.0)
+    parser.add_argument("--transfer-latency", type=float, default=300)
+    parser.add_argument("--transfer-jitter", type=float, default=100)
+    parser.add_argument("--transfer-error-rate", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=18285)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--config", action="append", default=[], metavar="KEY=VALUE",
+                        help="覆盖插件配置，值按 JSON 解析，例如 --config prefetch_enabled=true")
+    parser.add_argument("--tracemalloc", action="store_true", help="统计 Python 内存分配峰值（会明显拖慢处理）")
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    parser.add_argument("--baseline", help="与之前 --json 保存的结果对比")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="允许的退化比例，默认 0.2")
+    args = parser.parse_args()
+
+    # 插件每条搜索都会打日志，压测时只保留警告以上
+    logging.getLogger("astrbot").setLevel(logging.WARNING)
+    result = asyncio.run(run(args))
+    report(result)
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, ensure_ascii=False, indent=1), encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        problems = compare(result, baseline, args.max_regression)
+        if problems:
+            print("❌ 相比基线出现退化：" + "；".join(problems))
+            sys.exit(1)
+        print("✅ 与基线相比没有超过阈值的退化")
+
+
+if __name__ == "__main__":
+    main()
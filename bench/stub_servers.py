@@ -0,0 +1,114 @@
+"""本地模拟的 pansou 搜索 API、ziliao 转存 API 和网盘分享页，回放 fixtures/ 下录制的响应
+
+每个接口可以单独设置延迟（基础值 + 随机抖动 + 长尾）和失败率，用于压测和回归对比。
+share_dead_rate 按分享 ID 的哈希固定一部分链接为失效：分享页显示“分享已失效”，转存这些链接也会失败。
+local_share_urls 为 True 时，回放的搜索结果中的分享链接改为指向本地的模拟分享页。
+"""
+import asyncio
+import json
+import random
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict
+from urllib.parse import unquote, urlsplit
+
+from aiohttp import web
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+@dataclass
+class Fault:
+    """延迟与故障注入，时间单位为秒"""
+    latency: float = 0.0
+    jitter: float = 0.0
+    tail_rate: float = 0.0
+    tail_latency: float = 0.0
+    error_rate: float = 0.0
+
+    def delay(self, rnd: random.Random) -> float:
+        if self.tail_rate and rnd.random() < self.tail_rate:
+            return self.tail_latency
+        return max(0.0, self.latency + rnd.uniform(-self.jitter, self.jitter))
+
+    def fails(self, rnd: random.Random) -> bool:
+        return bool(self.error_rate) and rnd.random() < self.error_rate
+
+
+@dataclass
+class StubServers:
+    search_fault: Fault = field(default_factory=Fault)
+    transfer_fault: Fault = field(default_factory=Fault)
+    share_fault: Fault = field(default_factory=Fault)
+    share_dead_rate: float = 0.0
+    local_share_urls: bool = False
+    host: str = "127.0.0.1"
+    port: int = 18285
+    seed: int = 0
+    calls: Dict[str, int] = field(default_factory=lambda: {"search": 0, "search_errors": 0,
+                                                            "transfer": 0, "transfer_errors": 0,
+                                                            "share": 0, "share_dead": 0})
+
+    def __post_init__(self):
+        self._rnd = random.Random(self.seed)
+        # 录制的响应里关键词固定为“仙逆”，回放时替换成请求的关键词
+        self._search_template = (FIXTURES / "recorded_search.json").read_text(encoding="utf-8")
+        self._transfer = json.loads((FIXTURES / "recorded_transfer.json").read_text(encoding="utf-8"))
+        self._cloud_types = list(json.loads(self._search_template)["data"]["merged_by_type"])
+        self._runner = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def _search(self, request: web.Request) -> web.Response:
+        self.calls["search"] += 1
+        body = await request.json()
+        await asyncio.sleep(self.search_fault.delay(self._rnd))
+        if self.search_fault.fails(self._rnd):
+            self.calls["search_errors"] += 1
+            raise web.HTTPInternalServerError()
+        keyword = json.dumps(str(body.get("kw", "")), ensure_ascii=False)[1:-1]
+        text = self._search_template.replace("仙逆", keyword)
+        if self.local_share_urls:
+            for cloud_type in self._cloud_types:
+                text = text.replace(f"https://pan.{cloud_type}.cn/s/", f"{self.url}/share/{cloud_type}/")
+        return web.Response(text=text, content_type="application/json")
+
+    def share_dead(self, share_id: str) -> bool:
+        return zlib.crc32(share_id.encode("utf-8")) % 1000 < self.share_dead_rate * 1000
+
+    async def _share_page(self, request: web.Request) -> web.Response:
+        self.calls["share"] += 1
+        await asyncio.sleep(self.share_fault.delay(self._rnd))
+        if self.share_fault.fails(self._rnd):
+            raise web.HTTPTooManyRequests()
+        if self.share_dead(request.match_info["share_id"]):
+            self.calls["share_dead"] += 1
+            return web.Response(text="<html><body>分享已失效</body></html>", content_type="text/html")
+        return web.Response(text="<html><body>文件列表</body></html>", content_type="text/html")
+
+    async def _transfer_handler(self, request: web.Request) -> web.Response:
+        self.calls["transfer"] += 1
+        form = await request.post()
+        await asyncio.sleep(self.transfer_fault.delay(self._rnd))
+        share_id = unquote(urlsplit(str(form.get("url", ""))).path.rstrip("/").rsplit("/", 1)[-1])
+        if self.transfer_fault.fails(self._rnd) or self.share_dead(share_id):
+            self.calls["transfer_errors"] += 1
+            return web.json_response(self._transfer["error"])
+        return web.json_response(self._transfer["ok"])
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/api/search", self._search)
+        app.router.add_post("/api/open/transfer", self._transfer_handler)
+        app.router.add_get("/share/{cloud_type}/{share_id}", self._share_page)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
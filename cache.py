@@ -0,0 +1,196 @@
+import asyncio
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+def estimate_size(obj: Any) -> int:
+    """粗略估算对象占用的字节数（递归统计 dict/list/str），用于缓存的容量限制"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += estimate_size(key) + estimate_size(value)
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            size += estimate_size(item)
+    elif hasattr(obj, "__slots__"):
+        for name in obj.__slots__:
+            size += estimate_size(getattr(obj, name, None))
+    return size
+
+
+class TTLCache:
+    """带过期时间的 LRU 缓存。
+
+    - 每个条目写入时记录过期时间，读取时发现过期即删除并计为未命中
+    - 条目数超过 max_entries 或总字节数超过 max_bytes（0 表示不限制）时，淘汰最久未使用的条目
+    - 配置了 backend（见 storage.py）时，写入同步到后端，内存未命中时从后端读取，
+      encode/decode 负责缓存值和可序列化数据之间的转换
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1000, max_bytes: int = 0,
+                 sizeof: Callable[[Any], int] = estimate_size, backend: Any = None, namespace: str = "",
+                 encode: Optional[Callable[[Any], Any]] = None, decode: Optional[Callable[[Any], Any]] = None):
+        self.ttl = ttl
+        self.backend = backend
+        self.namespace = namespace
+        self._encode = encode or (lambda value: value)
+        self._decode = decode or (lambda data: data)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        # key -> (value, expires_at, size)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[1] > time.monotonic()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is not None and entry[1] <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            return self._load(key, default)
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def _load(self, key: Hashable, default: Any) -> Any:
+        found = self.backend.get(self.namespace, key) if self.backend is not None else None
+        if found is None:
+            self.misses += 1
+            return default
+        data, expires_at = found
+        value = self._decode(data)
+        self._store(key, value, expires_at - time.time())
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        self._store(key, value, ttl)
+        if self.backend is not None:
+            self.backend.set(self.namespace, key, self._encode(value), ttl)
+
+    def _store(self, key: Hashable, value: Any, ttl: float):
+        if key in self._data:
+            self._remove(key)
+        size = self._sizeof(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            # 单个条目就超过容量上限，不缓存
+            return
+        self._data[key] = (value, time.monotonic() + ttl, size)
+        self.total_bytes += size
+        while self._data and (len(self._data) > self.max_entries
+                              or (self.max_bytes and self.total_bytes > self.max_bytes)):
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        if self.backend is not None:
+            self.backend.delete(self.namespace, key)
+        if key in self._data:
+            self._remove(key)
+            return True
+        return False
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        keys = {key for key in self._data if predicate(key)}
+        if self.backend is not None:
+            keys.update(key for key in self.backend.keys(self.namespace) if predicate(key))
+        for key in keys:
+            self.invalidate(key)
+        return len(keys)
+
+    def clear(self) -> int:
+        count = len(self._data)
+        self._data.clear()
+        self.total_bytes = 0
+        if self.backend is not None:
+            self.backend.clear(self.namespace)
+        return count
+
+    def _remove(self, key: Hashable):
+        _, _, size = self._data.pop(key)
+        self.total_bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SingleFlight:
+    """合并并发的相同请求：同一个 key 在途时，后来的调用者直接等待第一个请求的结果。
+
+    fan-out 指一次上游请求最终服务的调用者数量（发起者 + 等待者）。
+    """
+
+    def __init__(self):
+        # key -> [task, 当前 fan-out]
+        self._inflight: Dict[Hashable, list] = {}
+        self.flights = 0
+        self.waiters = 0
+        self.max_fanout = 1
+        self.fanout_counts: Dict[int, int] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._inflight.get(key)
+        if entry is not None:
+            entry[1] += 1
+            self.waiters += 1
+            # shield：某个等待者被取消时不影响正在进行的上游请求
+            return await asyncio.shield(entry[0])
+
+        task = asyncio.ensure_future(fn())
+        entry = [task, 1]
+        self._inflight[key] = entry
+        self.flights += 1
+        task.add_done_callback(lambda _: self._finish(key, entry))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, entry: list):
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+        fanout = entry[1]
+        self.max_fanout = max(self.max_fanout, fanout)
+        self.fanout_counts[fanout] = self.fanout_counts.get(fanout, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inflight": len(self._inflight),
+            "flights": self.flights,
+            "waiters": self.waiters,
+            "max_fanout": self.max_fanout,
+            "avg_fanout": (self.flights + self.waiters) / self.flights if self.flights else 0.0,
+            "fanout_counts": dict(sorted(self.fanout_counts.items())),
+        }
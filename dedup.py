@@ -0,0 +1,101 @@
+import re
+from typing import Dict, List, Tuple
+from urllib.parse import unquote, urlsplit, urlunsplit
+
+from .records import LinkRecord, parse_timestamp
+
+# 分享链接的域名 -> 网盘类型；同一个分享在不同来源中的写法只在查询参数、提取码、末尾斜杠等处不同
+SHARE_HOSTS = {
+    "pan.baidu.com": "baidu",
+    "yun.baidu.com": "baidu",
+    "pan.quark.cn": "quark",
+    "drive.uc.cn": "uc",
+    "fast.uc.cn": "uc",
+    "pan.xunlei.com": "xunlei",
+    "www.alipan.com": "aliyun",
+    "alipan.com": "aliyun",
+    "www.aliyundrive.com": "aliyun",
+    "aliyundrive.com": "aliyun",
+}
+# 协议、域名、路径、查询参数；搜索结果中的链接几乎都能匹配，一次正则代替 urlsplit
+SHARE_URL_RE = re.compile(r"\s*([A-Za-z]+)://([^/?#]+)([^?#]*)(?:\?([^#]*))?")
+# 分享 ID：/s/<ID>；百度的 /s/1<ID> 和 /share/init?surl=<ID> 是同一个分享
+SHARE_PATH_RE = re.compile(r"/s/([\w-]+)")
+SURL_RE = re.compile(r"(?:^|&)surl=([\w-]+)")
+# 链接里携带提取码的查询参数
+PASSWORD_RE = re.compile(r"(?:^|&)(?:pwd|password|passcode)=([^&]*)")
+
+
+def canonical_url(url: str) -> str:
+    """去掉查询参数、锚点和末尾斜杠，协议和域名转小写"""
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), "", ""))
+
+
+def share_key(url: str) -> str:
+    """同一个分享的不同写法得到相同的键：已知网盘取 "类型:分享ID"，其他链接取规范化后的链接"""
+    match = SHARE_URL_RE.match(url)
+    if match is None:
+        return canonical_url(url)
+    scheme, host, path, query = match.groups()
+    host = host.lower()
+    cloud_type = SHARE_HOSTS.get(host)
+    if cloud_type is not None:
+        share = SHARE_PATH_RE.match(path)
+        if share:
+            share_id = share.group(1)
+            if cloud_type == "baidu" and share_id.startswith("1"):
+                share_id = share_id[1:]
+            return f"{cloud_type}:{share_id}"
+        if cloud_type == "baidu" and query:
+            surl = SURL_RE.search(query)
+            if surl:
+                return f"baidu:{surl.group(1)}"
+    return f"{scheme.lower()}://{host}{path.rstrip('/')}"
+
+
+def share_password(record: LinkRecord) -> str:
+    """去掉提取码两端的空白；没有单独给出提取码时从链接的查询参数里取"""
+    password = record.password.strip()
+    if password or "?" not in record.url:
+        return password
+    match = PASSWORD_RE.search(record.url.partition("?")[2].partition("#")[0])
+    return unquote(match.group(1)).strip() if match else ""
+
+
+def dedupe_links(links_by_type: Dict[str, List[LinkRecord]]) -> Tuple[Dict[str, List[LinkRecord]], int]:
+    """按分享键去掉重复的链接，返回 (去重后的分组, 去掉的数量)。
+
+    每个分享保留第一次出现的位置，标题取各来源中最长的一个，提取码取第一个非空的，发布时间取最新的；
+    需要修改时创建新的 LinkRecord，不改动缓存中共享的原始记录。只遍历一次所有链接。
+    """
+    deduped: Dict[str, List[LinkRecord]] = {}
+    # 分享键 -> (网盘类型, 在该类型列表中的位置)
+    seen: Dict[str, Tuple[str, int]] = {}
+    removed = 0
+    for cloud_type, links in links_by_type.items():
+        bucket = deduped.setdefault(cloud_type, [])
+        for record in links:
+            password = share_password(record)
+            key = share_key(record.url)
+            found = seen.get(key)
+            if found is None:
+                if password != record.password:
+                    record = LinkRecord(record.url, password, record.note, record.type, record.source,
+                                        record.datetime)
+                seen[key] = (cloud_type, len(bucket))
+                bucket.append(record)
+                continue
+            removed += 1
+            kept_type, position = found
+            kept = deduped[kept_type][position]
+            note = record.note if len(record.note.strip()) > len(kept.note.strip()) else kept.note
+            published = kept.datetime
+            if record.datetime and record.datetime != published and \
+                    (not published or parse_timestamp(record.datetime) > parse_timestamp(published)):
+                # 只有两个来源的发布时间不同时才解析比较
+                published = record.datetime
+            if note is not kept.note or (password and not kept.password) or published is not kept.datetime:
+                deduped[kept_type][position] = LinkRecord(kept.url, kept.password or password, note,
+                                                          kept.type, kept.source, published)
+    return deduped, removed
@@ -0,0 +1,73 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import aiohttp
+
+
+class AsyncHttpClient:
+    """插件内所有上游请求（pansou 搜索、ziliao 转存）共用的异步 HTTP 客户端。
+
+    内部只维护一个 aiohttp.ClientSession，连接保持 keep-alive 复用；
+    总连接数和单个主机的并发连接数由 TCPConnector 限制，超出的请求会排队等待空闲连接，
+    不会阻塞事件循环。
+    """
+
+    def __init__(self, timeout: float = 30, pool_limit: int = 100, per_host_limit: int = 20,
+                 keepalive_timeout: float = 30):
+        self.timeout = timeout
+        self.pool_limit = pool_limit
+        self.per_host_limit = per_host_limit
+        self.keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = asyncio.Lock()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # 会话需要在事件循环内创建，因此延迟到第一次请求时初始化
+        if self._session is not None and not self._session.closed:
+            return self._session
+        async with self._lock:
+            if self._session is None or self._session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.pool_limit,
+                    limit_per_host=self.per_host_limit,
+                    keepalive_timeout=self.keepalive_timeout,
+                    ttl_dns_cache=300,
+                )
+                self._session = aiohttp.ClientSession(
+                    connector=connector,
+                    timeout=aiohttp.ClientTimeout(total=self.timeout),
+                )
+        return self._session
+
+    async def post_json(self, url: str, json: Optional[Dict] = None, data: Optional[Dict] = None,
+                        headers: Optional[Dict] = None) -> Any:
+        """发送 POST 请求并解析 JSON 响应，HTTP 错误状态码会抛出 aiohttp.ClientResponseError"""
+        session = await self._get_session()
+        async with session.post(url, json=json, data=data, headers=headers) as response:
+            response.raise_for_status()
+            # 部分上游返回的 Content-Type 不是 application/json，这里不做校验
+            return await response.json(content_type=None)
+
+    async def post_stream(self, url: str, json: Optional[Dict] = None, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+        """发送 POST 请求并逐块返回响应内容；调用方提前结束迭代时连接会被直接关闭，不再读取剩余数据"""
+        session = await self._get_session()
+        async with session.post(url, json=json) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(chunk_size):
+                yield chunk
+
+    async def get_text(self, url: str, max_bytes: int = 64 * 1024, timeout: Optional[float] = None,
+                       headers: Optional[Dict] = None, allow_redirects: bool = True) -> Tuple[int, str, str]:
+        """发送 GET 请求，返回 (状态码, 响应内容的前 max_bytes 字节, Location 响应头)，不检查状态码；
+        allow_redirects 为 False 时不跟随跳转，由调用方根据 Location 决定是否继续请求"""
+        session = await self._get_session()
+        request_timeout = aiohttp.ClientTimeout(total=timeout) if timeout else None
+        async with session.get(url, headers=headers, timeout=request_timeout,
+                               allow_redirects=allow_redirects) as response:
+            body = await response.content.read(max_bytes)
+            return response.status, body.decode("utf-8", errors="replace"), response.headers.get("Location", "")
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
@@ -0,0 +1,281 @@
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from astrbot.api import logger
+
+from .query import fold_text
+from .records import LinkRecord
+
+GRAM_SIZE = 2
+
+Row = Tuple[str, str, str, str, str, str]
+
+
+def text_grams(text: str) -> Set[str]:
+    """字符二元组；不足两个字符时返回文本本身"""
+    if len(text) < GRAM_SIZE:
+        return {text} if text else set()
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+class LinkIndex:
+    """本地链接索引：保存搜索API返回过的所有链接，按标题的字符二元组建倒排索引。
+
+    - 每次上游搜索的结果写入内存缓冲区，后台任务定期批量写入 SQLite，同一链接再次出现时只更新最后出现时间
+    - 查询时取包含关键词全部二元组的链接，再用子串匹配过滤，按最后出现时间从新到旧排列
+    - 超过 max_age_days 没有再出现的链接和超出 max_links 的最旧链接在压缩时删除，删除较多时回收文件空间
+    标题只索引折叠后（见 query.fold_text）的前 note_max_chars 个字符。
+    """
+
+    def __init__(self, path: str, max_links: int = 50000, max_age_days: float = 30, note_max_chars: int = 64,
+                 flush_interval: float = 2.0, compact_interval: float = 3600, scan_limit: int = 1000):
+        self.path = str(path)
+        self.max_links = max_links
+        self.max_age = max_age_days * 86400
+        self.note_max_chars = note_max_chars
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        self.scan_limit = scan_limit
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        # 读写都在线程中进行：写连接只在批量写入和压缩时使用，读连接由锁保证同一时间只有一个查询
+        self._writer = self._connect()
+        self._reader = self._connect()
+        self._read_lock = threading.Lock()
+        self._writer.execute(
+            "CREATE TABLE IF NOT EXISTS links ("
+            " id INTEGER PRIMARY KEY,"
+            " url TEXT NOT NULL UNIQUE,"
+            " password TEXT NOT NULL,"
+            " note TEXT NOT NULL,"
+            " folded TEXT NOT NULL,"
+            " type TEXT NOT NULL,"
+            " source TEXT NOT NULL,"
+            " first_seen REAL NOT NULL,"
+            " last_seen REAL NOT NULL)"
+        )
+        self._writer.execute("CREATE INDEX IF NOT EXISTS idx_links_last_seen ON links (last_seen)")
+        self._writer.execute(
+            "CREATE TABLE IF NOT EXISTS grams ("
+            " gram TEXT NOT NULL,"
+            " link_id INTEGER NOT NULL,"
+            " PRIMARY KEY (gram, link_id)) WITHOUT ROWID"
+        )
+        self._writer.commit()
+        self.link_count = self._writer.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+        # url -> (链接, 出现时间)
+        self._pending: Dict[str, Tuple[LinkRecord, float]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._background: Optional[asyncio.Task] = None
+        self._last_compact = time.monotonic()
+        self.added = 0
+        self.updated = 0
+        self.removed = 0
+        self.compactions = 0
+        self.queries = 0
+        self.query_hits = 0
+        self.query_seconds = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _grams(self, folded: str) -> Set[str]:
+        return text_grams(folded[:self.note_max_chars])
+
+    def add(self, links_by_type: Dict[str, List[LinkRecord]]):
+        """记录一次搜索返回的链接，下一次批量写入时落盘"""
+        now = time.time()
+        for links in links_by_type.values():
+            for record in links:
+                if record.url:
+                    self._pending[record.url] = (record, now)
+
+    def _write_batch(self, batch: List[Tuple[LinkRecord, float]]) -> Tuple[int, int]:
+        added = updated = 0
+        with self._writer:
+            for record, seen in batch:
+                folded = fold_text(record.note)
+                row = self._writer.execute("SELECT id, folded FROM links WHERE url = ?", (record.url,)).fetchone()
+                if row is None:
+                    cursor = self._writer.execute(
+                        "INSERT INTO links (url, password, note, folded, type, source, first_seen, last_seen)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (record.url, record.password, record.note, folded, record.type, record.source, seen, seen),
+                    )
+                    link_id = cursor.lastrowid
+                    added += 1
+                else:
+                    link_id, old_folded = row
+                    self._writer.execute(
+                        "UPDATE links SET password = ?, note = ?, folded = ?, type = ?, source = ?, last_seen = ?"
+                        " WHERE id = ?",
+                        (record.password, record.note, folded, record.type, record.source, seen, link_id),
+                    )
+                    updated += 1
+                    if old_folded == folded:
+                        continue
+                    # 标题变了，换掉旧的二元组
+                    self._writer.executemany("DELETE FROM grams WHERE gram = ? AND link_id = ?",
+                                             [(gram, link_id) for gram in self._grams(old_folded)])
+                self._writer.executemany("INSERT OR IGNORE INTO grams (gram, link_id) VALUES (?, ?)",
+                                         [(gram, link_id) for gram in self._grams(folded)])
+        return added, updated
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            try:
+                added, updated = await asyncio.to_thread(self._write_batch, list(batch.values()))
+            except Exception:
+                # 写入失败时把数据放回缓冲区，下次再试（期间的新数据优先）
+                for url, entry in batch.items():
+                    self._pending.setdefault(url, entry)
+                raise
+            self.added += added
+            self.updated += updated
+            self.link_count += added
+        # 超出上限较多时不等定时压缩
+        if self.link_count > self.max_links * 1.1:
+            await self.compact()
+
+    def _delete_rows(self, rows: List[Tuple[int, str]]):
+        self._writer.executemany("DELETE FROM grams WHERE gram = ? AND link_id = ?",
+                                 [(gram, link_id) for link_id, folded in rows for gram in self._grams(folded)])
+        self._writer.executemany("DELETE FROM links WHERE id = ?", [(link_id,) for link_id, _ in rows])
+
+    def _compact(self) -> int:
+        cutoff = time.time() - self.max_age
+        with self._writer:
+            rows = self._writer.execute("SELECT id, folded FROM links WHERE last_seen < ?", (cutoff,)).fetchall()
+            remaining = self._writer.execute("SELECT COUNT(*) FROM links").fetchone()[0] - len(rows)
+            if remaining > self.max_links:
+                rows += self._writer.execute(
+                    "SELECT id, folded FROM links WHERE last_seen >= ? ORDER BY last_seen LIMIT ?",
+                    (cutoff, remaining - self.max_links),
+                ).fetchall()
+            self._delete_rows(rows)
+        # 空闲页超过四分之一时整理数据库文件
+        page_count = self._writer.execute("PRAGMA page_count").fetchone()[0]
+        freelist = self._writer.execute("PRAGMA freelist_count").fetchone()[0]
+        if freelist * 4 > page_count:
+            self._writer.execute("VACUUM")
+        return len(rows)
+
+    async def compact(self) -> int:
+        """删除过期和超出数量上限的链接，返回删除数量"""
+        async with self._flush_lock:
+            removed = await asyncio.to_thread(self._compact)
+            self.link_count -= removed
+            self.removed += removed
+            self.compactions += 1
+            self._last_compact = time.monotonic()
+        if removed:
+            logger.info(f"[PanSearch] 链接索引压缩完成，删除 {removed} 条，剩余 {self.link_count} 条")
+        return removed
+
+    def _query(self, folded: str, src: str) -> List[Row]:
+        type_filter = " AND l.type = ?" if src != "all" else ""
+        type_params = (src,) if src != "all" else ()
+        with self._read_lock:
+            if len(folded) < GRAM_SIZE:
+                rows = self._reader.execute(
+                    f"SELECT l.url, l.password, l.note, l.type, l.source, l.folded FROM links l"
+                    f" WHERE l.folded LIKE ?{type_filter} ORDER BY l.last_seen DESC LIMIT ?",
+                    (f"%{folded}%", *type_params, self.scan_limit),
+                ).fetchall()
+            else:
+                grams = sorted(text_grams(folded))
+                # 倒排表很长（常见词）时，按最后出现时间从新到旧扫描链接表，凑够 scan_limit 条就停止；
+                # 否则从倒排表取交集。两种方式的代价分别约为 scan_limit * 总数 / 倒排表长度 和 倒排表长度
+                threshold = max(self.scan_limit, int(math.sqrt(self.scan_limit * max(self.link_count, 1))))
+                shortest = min(self._reader.execute(
+                    "SELECT COUNT(*) FROM (SELECT 1 FROM grams WHERE gram = ? LIMIT ?)", (gram, threshold)
+                ).fetchone()[0] for gram in grams)
+                if shortest >= threshold:
+                    exists = " AND ".join("EXISTS (SELECT 1 FROM grams WHERE gram = ? AND link_id = l.id)" for _ in grams)
+                    rows = self._reader.execute(
+                        f"SELECT l.url, l.password, l.note, l.type, l.source, l.folded FROM links l"
+                        f" WHERE {exists}{type_filter} ORDER BY l.last_seen DESC LIMIT ?",
+                        (*grams, *type_params, self.scan_limit),
+                    ).fetchall()
+                else:
+                    placeholders = ",".join("?" * len(grams))
+                    rows = self._reader.execute(
+                        f"SELECT l.url, l.password, l.note, l.type, l.source, l.folded FROM links l"
+                        f" JOIN (SELECT link_id FROM grams WHERE gram IN ({placeholders})"
+                        f" GROUP BY link_id HAVING COUNT(*) = ?) m ON l.id = m.link_id"
+                        f" WHERE 1{type_filter} ORDER BY l.last_seen DESC LIMIT ?",
+                        (*grams, len(grams), *type_params, self.scan_limit),
+                    ).fetchall()
+        # 包含全部二元组不代表包含整个关键词，再做一次子串匹配
+        return [row for row in rows if folded in row[5]]
+
+    async def search(self, keyword: str, src: str = "all", per_type: int = 100) -> Dict[str, List[LinkRecord]]:
+        """按关键词查找历史链接，返回与搜索API相同的按网盘类型分组的结构"""
+        folded = fold_text(keyword)
+        if not folded:
+            return {}
+        start = time.perf_counter()
+        rows = await asyncio.to_thread(self._query, folded, src)
+        links_by_type: Dict[str, List[LinkRecord]] = {}
+        for url, password, note, cloud_type, source, _ in rows:
+            links = links_by_type.setdefault(cloud_type, [])
+            if len(links) < per_type:
+                links.append(LinkRecord(url, password, note, cloud_type, source))
+        self.queries += 1
+        self.query_seconds += time.perf_counter() - start
+        if links_by_type:
+            self.query_hits += 1
+        return links_by_type
+
+    async def _run_background(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if time.monotonic() - self._last_compact >= self.compact_interval:
+                    await self.compact()
+            except Exception as e:
+                logger.error(f"[PanSearch] 链接索引写入失败: {str(e)}")
+
+    async def start(self):
+        self._background = asyncio.create_task(self._run_background())
+
+    async def close(self):
+        if self._background is not None:
+            self._background.cancel()
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"[PanSearch] 链接索引写入失败: {str(e)}")
+        self._reader.close()
+        self._writer.close()
+
+    def size_bytes(self) -> int:
+        return sum(os.path.getsize(path) for path in (self.path, f"{self.path}-wal") if os.path.exists(path))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "links": self.link_count,
+            "max_links": self.max_links,
+            "pending": len(self._pending),
+            "bytes": self.size_bytes(),
+            "added": self.added,
+            "updated": self.updated,
+            "removed": self.removed,
+            "compactions": self.compactions,
+            "queries": self.queries,
+            "hits": self.query_hits,
+            "avg_query_ms": self.query_seconds / self.queries * 1000 if self.queries else 0.0,
+        }
@@ -0,0 +1,165 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from .cache import TTLCache
+from .dedup import SHARE_HOSTS, share_key
+from .records import LinkRecord
+
+VERDICT_ALIVE = "alive"
+VERDICT_DEAD = "dead"
+VERDICT_UNKNOWN = "unknown"
+
+# 分享页上表示链接失效的提示文字（各网盘特有的提示 + 通用提示）；分享页大多由前端渲染，这里只能识别服务端直接返回的提示
+DEAD_MARKERS = {
+    "baidu": ["分享的文件已经被取消", "你来晚了", "涉及侵权"],
+    "quark": ["文件已被分享者删除"],
+    "uc": ["分享不存在"],
+    "xunlei": ["链接已过期", "分享不存在"],
+}
+GENERIC_DEAD_MARKERS = ["分享已失效", "链接已失效", "链接不存在", "分享已过期", "已被删除", "取消了分享"]
+# 分享页跳转最多跟随的次数
+MAX_REDIRECTS = 3
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+class LivenessChecker:
+    """后台检查分享链接是否还有效，结论按分享键（见 dedup.share_key）缓存。
+
+    - schedule() 为还没有结论的链接启动检查，每种网盘同时最多 concurrency_per_type 个请求，
+      同一链接同时只检查一次，进行中的检查总数超过 max_inflight 时跳过
+    - 有效、失效、无法判断（请求失败、被限流等）三种结论分别缓存 alive_ttl、dead_ttl、unknown_ttl 秒
+    - drop_dead() 去掉已知失效的链接；无法判断的链接照常展示
+    - record_transfer() 记录实际发出的转存请求（用户选择或预转存）的结果，用于统计检查的准确程度
+    搜索结果中的链接来自上游，不可信：只访问主机在 share_hosts（默认为 dedup.SHARE_HOSTS）中的链接，
+    跳转也只跟随到这些主机，避免被构造的链接引导去访问本机或内网地址。
+    fetch(url) 不跟随跳转，返回 (状态码, 页面内容, Location 响应头)。
+    """
+
+    def __init__(self, fetch: Callable[[str], Awaitable[Tuple[int, str, str]]], cloud_types: Iterable[str],
+                 concurrency_per_type: int = 4, alive_ttl: float = 3600, dead_ttl: float = 86400,
+                 unknown_ttl: float = 300, max_entries: int = 20000, max_inflight: int = 200,
+                 share_hosts: Optional[Iterable[str]] = None):
+        self._fetch = fetch
+        self.cloud_types = set(cloud_types)
+        # 允许访问的主机（含端口时写成 host:port），按链接中的 netloc 原样比较
+        self.share_hosts = set(SHARE_HOSTS if share_hosts is None else share_hosts)
+        self.concurrency_per_type = max(1, concurrency_per_type)
+        self.ttls = {VERDICT_ALIVE: alive_ttl, VERDICT_DEAD: dead_ttl, VERDICT_UNKNOWN: unknown_ttl}
+        self.max_inflight = max_inflight
+        self.verdicts = TTLCache(ttl=alive_ttl, max_entries=max_entries)
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.counts = {VERDICT_ALIVE: 0, VERDICT_DEAD: 0, VERDICT_UNKNOWN: 0}
+        self.skipped = 0
+        self.dropped = 0
+        # 实际发出的转存请求的结果：按检查结论分类
+        self.transfers: Dict[Tuple[Optional[str], bool], int] = {}
+
+    def allowed(self, url: str) -> bool:
+        """链接的协议是 http(s)，且主机在 share_hosts 中；带用户名或端口的写法不匹配"""
+        try:
+            parts = urlsplit(url.strip())
+        except ValueError:
+            return False
+        return parts.scheme.lower() in ("http", "https") and parts.netloc.lower() in self.share_hosts
+
+    def verdict(self, url: str) -> Optional[str]:
+        return self.verdicts.get(share_key(url))
+
+    @staticmethod
+    def classify(cloud_type: str, status: int, text: str) -> str:
+        if status in (404, 410):
+            return VERDICT_DEAD
+        if status >= 400:
+            # 403/429/5xx 多半是被限流或风控，不能说明链接失效
+            return VERDICT_UNKNOWN
+        if any(marker in text for marker in DEAD_MARKERS.get(cloud_type, ())) or \
+                any(marker in text for marker in GENERIC_DEAD_MARKERS):
+            return VERDICT_DEAD
+        return VERDICT_ALIVE
+
+    async def _fetch_share_page(self, cloud_type: str, url: str) -> str:
+        # 内部方法：请求分享页并判断结论，只跟随指向 share_hosts 的跳转
+        for _ in range(MAX_REDIRECTS + 1):
+            status, text, location = await self._fetch(url)
+            if status not in REDIRECT_STATUSES:
+                return self.classify(cloud_type, status, text)
+            url = urljoin(url, location)
+            if not location or not self.allowed(url):
+                return VERDICT_UNKNOWN
+        return VERDICT_UNKNOWN
+
+    async def _check(self, key: str, record: LinkRecord) -> str:
+        semaphore = self._semaphores.get(record.type)
+        if semaphore is None:
+            semaphore = self._semaphores[record.type] = asyncio.Semaphore(self.concurrency_per_type)
+        async with semaphore:
+            try:
+                verdict = await self._fetch_share_page(record.type, record.url)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                verdict = VERDICT_UNKNOWN
+        self.counts[verdict] += 1
+        self.verdicts.set(key, verdict, self.ttls[verdict])
+        return verdict
+
+    def schedule(self, records: Iterable[LinkRecord]) -> List[asyncio.Task]:
+        """为没有结论的链接启动检查，返回这些链接对应的检查任务（包括已经在进行中的）"""
+        tasks = []
+        for record in records:
+            if record.type not in self.cloud_types or not self.allowed(record.url):
+                continue
+            key = share_key(record.url)
+            if key in self.verdicts:
+                continue
+            task = self._inflight.get(key)
+            if task is None:
+                if len(self._inflight) >= self.max_inflight:
+                    self.skipped += 1
+                    continue
+                task = self._inflight[key] = asyncio.create_task(self._check(key, record))
+                task.add_done_callback(lambda _, key=key: self._inflight.pop(key, None))
+            tasks.append(task)
+        return tasks
+
+    async def check(self, records: Iterable[LinkRecord], timeout: float):
+        """检查并最多等待 timeout 秒，没有完成的检查继续在后台进行"""
+        tasks = self.schedule(records)
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+    def drop_dead(self, records: List[LinkRecord]) -> List[LinkRecord]:
+        kept = [record for record in records if self.verdicts.get(share_key(record.url)) != VERDICT_DEAD]
+        self.dropped += len(records) - len(kept)
+        return kept
+
+    def record_transfer(self, url: str, success: bool):
+        key = (self.verdict(url), success)
+        self.transfers[key] = self.transfers.get(key, 0) + 1
+
+    async def close(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        if self._inflight:
+            await asyncio.gather(*self._inflight.values(), return_exceptions=True)
+
+    def stats(self) -> Dict:
+        checked_failures = sum(count for (verdict, success), count in self.transfers.items()
+                               if verdict == VERDICT_ALIVE and not success)
+        checked_transfers = sum(count for (verdict, _), count in self.transfers.items() if verdict == VERDICT_ALIVE)
+        return {
+            "cached": len(self.verdicts),
+            "inflight": len(self._inflight),
+            "alive": self.counts[VERDICT_ALIVE],
+            "dead": self.counts[VERDICT_DEAD],
+            "unknown": self.counts[VERDICT_UNKNOWN],
+            "skipped": self.skipped,
+            "dropped": self.dropped,
+            "transfers_checked_alive": checked_transfers,
+            "failures_checked_alive": checked_failures,
+            "transfers_unchecked": sum(count for (verdict, _), count in self.transfers.items() if verdict != VERDICT_ALIVE),
+            "failures_unchecked": sum(count for (verdict, success), count in self.transfers.items()
+                                      if verdict != VERDICT_ALIVE and not success),
+        }
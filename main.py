@@ -1,15 +1,49 @@
 from astrbot.api.event import filter, AstrMessageEvent, MessageEventResult
-from astrbot.api.star import Context, Star, register
+from astrbot.api.star import Context, Star, StarTools, register
 from astrbot.api import logger, AstrBotConfig
 from astrbot.core.star.filter.event_message_type import EventMessageType
-import json
-import re
-import requests
-from typing import List, Dict, Optional, Tuple
+import asyncio
+import aiohttp
+import math
+from contextlib import aclosing
+from typing import Awaitable, List, Dict, Optional, Set, Tuple, Union
 from datetime import datetime, timedelta
 import os
+import time
 from pathlib import Path
 
+from .admission import SCOPE_GROUP, SCOPE_USER, AdmissionController, ParallelLimiter, QueueFull, WorkQueue
+from .backends import BackendPool
+from .cache import SingleFlight, TTLCache
+from .dedup import dedupe_links, share_key
+from .http_client import AsyncHttpClient
+from .link_index import LinkIndex
+from .liveness import VERDICT_DEAD, LivenessChecker
+from .metrics import MetricsRegistry
+from .normalizer import ResponseNormalizer
+from .prefetch import Prefetcher
+from .query import DEFAULT_STRIP_PATTERNS, QueryNormalizer
+from .ranking import KIND_SOURCE, KIND_TYPE, Ranker, ReliabilityTracker
+from .records import (LinkRecord, add_rendered_page, decode_links_by_type, decode_session, encode_links_by_type,
+                      encode_session, estimate_session_size)
+from .router import (ROUTE_AT, ROUTE_BATCH, ROUTE_JOIN, ROUTE_PAGE, ROUTE_SEARCH, ROUTE_SELECT, SELECTION_RE,
+                     MessageRouter, parse_selection)
+from .sessions import SessionStore
+from .storage import create_backend
+from .streaming import MergedStreamParser
+from .tracing import Tracer
+
+# 访问分享页检查链接有效性时使用的请求头
+SHARE_PAGE_HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"}
+
+# 转存 API 的 expired_type 对应的分享链接有效期（秒），与夸克网盘分享接口的取值一致：1 永久、2 一天、3 七天、4 三十天
+SHARE_LIFETIMES = {1: None, 2: 86400, 3: 7 * 86400, 4: 30 * 86400}
+
+# _select 的结果：转存成功；转存请求失败（需要提醒群主）；还没发出转存请求就被拒绝（序号无效、链接已失效、排队已满等）
+OUTCOME_SUCCESS = "success"
+OUTCOME_FAILED = "failed"
+OUTCOME_REJECTED = "rejected"
+
 # 配置文件路径（保留用于兼容旧版本）
 CONFIG_FILE = Path(__file__).parent / "config.json"
 
@@ -21,6 +55,7 @@ class MyPlugin(Star):
         
         # 初始化网盘搜索转存功能
         self.pansou_api_url = self.config.get("pansou_api_url", "http://154.12.83.97:8085")
+        self.pansou_mirror_urls = self.config.get("pansou_mirror_urls", [])
         self.ziliao_api_url = self.config.get("ziliao_api_url", "https://www.ziliao.xyz")
         self.ziliao_api_key = self.config.get("ziliao_api_key", "")
         self.ziliao_api_path = self.config.get("ziliao_api_path", "/api/open/transfer")
@@ -29,14 +64,212 @@ class MyPlugin(Star):
         self.group_owner_id = self.config.get("group_owner_id", "")
         self.page_size = self.config.get("page_size", 6)  # 每页显示6个结果
         self.links_per_type = self.config.get("links_per_type", 3)  # 每种网盘每轮显示2条
+        self.http_pool_limit = self.config.get("http_pool_limit", 100)
+        self.http_per_host_limit = self.config.get("http_per_host_limit", 20)
+        self.http_keepalive_timeout = self.config.get("http_keepalive_timeout", 30)
+        self.search_cache_ttl = self.config.get("search_cache_ttl", 300)
+        self.search_cache_max_entries = self.config.get("search_cache_max_entries", 500)
+        self.search_cache_max_bytes = self.config.get("search_cache_max_mb", 64) * 1024 * 1024
+        self.transfer_expired_type = self.config.get("transfer_expired_type", 1)
+        self.transfer_share_lifetime = self.config.get("transfer_share_lifetime", 86400)
+        self.transfer_cache_max_entries = self.config.get("transfer_cache_max_entries", 2000)
+        self.max_sessions = self.config.get("max_sessions", 5000)
+        self.session_max_bytes = self.config.get("session_max_mb", 64) * 1024 * 1024
+        self.rate_limit_user_per_minute = self.config.get("rate_limit_user_per_minute", 0)
+        self.rate_limit_user_burst = self.config.get("rate_limit_user_burst", 3)
+        self.rate_limit_group_per_minute = self.config.get("rate_limit_group_per_minute", 0)
+        self.rate_limit_group_burst = self.config.get("rate_limit_group_burst", 10)
+        self.rate_limit_global_per_minute = self.config.get("rate_limit_global_per_minute", 0)
+        self.rate_limit_global_burst = self.config.get("rate_limit_global_burst", 30)
+        self.search_concurrency = self.config.get("search_concurrency", 8)
+        self.transfer_concurrency = self.config.get("transfer_concurrency", 4)
+        self.upstream_queue_size = self.config.get("upstream_queue_size", 32)
+        self.batch_max_items = self.config.get("batch_max_items", 5)
+        self.batch_user_parallelism = self.config.get("batch_user_parallelism", 2)
+        self.batch_global_parallelism = self.config.get("batch_global_parallelism", 4)
+        self.batch_reply_mode = self.config.get("batch_reply_mode", "stream")
+        self.backend_failure_threshold = self.config.get("backend_failure_threshold", 3)
+        self.backend_cooldown = self.config.get("backend_cooldown", 30)
+        self.hedge_enabled = self.config.get("hedge_enabled", False)
+        self.hedge_min_delay_ms = self.config.get("hedge_min_delay_ms", 300)
+        self.hedge_max_delay_ms = self.config.get("hedge_max_delay_ms", 5000)
+        self.liveness_enabled = self.config.get("liveness_enabled", False)
+        self.liveness_concurrency_per_type = self.config.get("liveness_concurrency_per_type", 4)
+        self.liveness_timeout = self.config.get("liveness_timeout", 5)
+        self.liveness_first_page_wait_ms = self.config.get("liveness_first_page_wait_ms", 800)
+        self.liveness_alive_ttl = self.config.get("liveness_alive_ttl", 3600)
+        self.liveness_dead_ttl = self.config.get("liveness_dead_ttl", 86400)
+        self.prefetch_enabled = self.config.get("prefetch_enabled", False)
+        self.prefetch_top_n = self.config.get("prefetch_top_n", 2)
+        self.prefetch_concurrency = self.config.get("prefetch_concurrency", 2)
+        self.prefetch_daily_budget = self.config.get("prefetch_daily_budget", 200)
+        self.metrics_http_port = self.config.get("metrics_http_port", 0)
+        self.metrics_http_host = self.config.get("metrics_http_host", "127.0.0.1")
+        self.metrics_file = self.config.get("metrics_file", "")
+        self.metrics_dump_interval = self.config.get("metrics_dump_interval", 60)
+        self.storage_backend = self.config.get("storage_backend", "memory")
+        self.sqlite_path = self.config.get("sqlite_path", "")
+        self.index_enabled = self.config.get("index_enabled", False)
+        self.index_path = self.config.get("index_path", "")
+        self.index_fallback_after_ms = self.config.get("index_fallback_after_ms", 3000)
+        self.index_max_links = self.config.get("index_max_links", 50000)
+        self.index_max_age_days = self.config.get("index_max_age_days", 30)
+        self.stream_parse = self.config.get("stream_parse", False)
+        self.fanout_enabled = self.config.get("fanout_enabled", False)
+        self.dedupe_enabled = self.config.get("dedupe_enabled", True)
+        self.ranking_enabled = self.config.get("ranking_enabled", False)
+        self.ranking_top_k = self.config.get("ranking_top_k", 16)
+        self.ranking_similarity_weight = self.config.get("ranking_similarity_weight", 0.6)
+        self.ranking_freshness_weight = self.config.get("ranking_freshness_weight", 0.15)
+        self.ranking_reliability_weight = self.config.get("ranking_reliability_weight", 0.25)
+        self.ranking_freshness_half_life_days = self.config.get("ranking_freshness_half_life_days", 30)
+        self.query_normalize = self.config.get("query_normalize", True)
+        self.query_strip_patterns = self.config.get("query_strip_patterns", DEFAULT_STRIP_PATTERNS)
+        self.fanout_first_page_timeout_ms = self.config.get("fanout_first_page_timeout_ms", 1500)
+        self.trace_enabled = self.config.get("trace_enabled", False)
+        self.trace_sample_percent = self.config.get("trace_sample_percent", 100)
+        self.trace_max_payload = self.config.get("trace_max_payload", 1024)
         
         # 确保 API URL 不以 / 结尾
         self.pansou_api_url = self.pansou_api_url.rstrip('/')
+        self.pansou_mirror_urls = [url.strip().rstrip('/') for url in self.pansou_mirror_urls if url and url.strip()]
         self.ziliao_api_url = self.ziliao_api_url.rstrip('/')
         
+        # 异步 HTTP 客户端（共享连接池，搜索和转存请求不再阻塞事件循环）
+        self.http_client = AsyncHttpClient(
+            timeout=self.timeout,
+            pool_limit=self.http_pool_limit,
+            per_host_limit=self.http_per_host_limit,
+            keepalive_timeout=self.http_keepalive_timeout,
+        )
+        
+        # 搜索后端池：主地址加镜像，按延迟和错误率调度，失败自动切换，可选对冲请求
+        self.search_pool = BackendPool(
+            [self.pansou_api_url, *self.pansou_mirror_urls],
+            failure_threshold=self.backend_failure_threshold,
+            cooldown=self.backend_cooldown,
+            hedge=self.hedge_enabled,
+            hedge_min_delay=self.hedge_min_delay_ms / 1000,
+            hedge_max_delay=self.hedge_max_delay_ms / 1000,
+        )
+        
+        # 只支持这4种网盘类型，按顺序：夸克、百度、UC、迅雷
+        self.cloud_types = ["quark", "baidu", "uc", "xunlei"]
+        # 响应结构识别与链接提取，每种网盘最多保留100条
+        self.normalizer = ResponseNormalizer(self.cloud_types, max_per_type=100)
+        # 消息分发规则预先编译，普通聊天看首字符即可跳过
+        self.router = MessageRouter()
+        # 关键词规范化：同一部剧的不同写法（全角、繁体、书名号、第几季等）共用一个缓存键和一次上游搜索
+        self.query_normalizer = QueryNormalizer(self.query_strip_patterns)
+        
+        # 调试追踪：默认关闭，关闭时热路径上不做任何序列化
+        self.tracer = Tracer(
+            enabled=self.trace_enabled,
+            sample_percent=self.trace_sample_percent,
+            max_payload=self.trace_max_payload,
+        )
+        
+        # 存储后端：默认只使用进程内存，配置为 sqlite 时会话和缓存会持久化，重启后仍然有效
+        self.backend = create_backend(self.storage_backend, self.sqlite_path or self._default_sqlite_path())
+        
+        # 本地链接索引：保存上游返回过的所有链接，上游失败、超时或响应太慢时用历史结果回答
+        self.link_index: Optional[LinkIndex] = None
+        if self.index_enabled:
+            self.link_index = LinkIndex(
+                self.index_path or str(Path(self._default_sqlite_path()).with_name("pansou_index.db")),
+                max_links=self.index_max_links,
+                max_age_days=self.index_max_age_days,
+            )
+        
+        # 搜索结果缓存：相同关键词和网盘类型在有效期内直接复用上游结果
+        self.search_cache = TTLCache(
+            ttl=self.search_cache_ttl,
+            max_entries=self.search_cache_max_entries,
+            max_bytes=self.search_cache_max_bytes,
+            backend=self.backend,
+            namespace="search",
+            encode=encode_links_by_type,
+            decode=decode_links_by_type,
+        )
+        # 合并并发的相同搜索，同一 (关键词, 网盘类型) 同时只向上游发一次请求
+        self.search_flight = SingleFlight()
+        
+        # 转存结果缓存：同一 (链接, 提取码) 在分享有效期内只转存一次
+        # 预留 10% 的有效期余量，避免把快要过期的分享链接发给用户
+        self.transfer_cache = TTLCache(
+            ttl=self._transfer_cache_lifetime() * 0.9,
+            max_entries=self.transfer_cache_max_entries,
+            backend=self.backend,
+            namespace="transfer",
+        )
+        self.transfer_flight = SingleFlight()
+        
+        # 限速与排队：用户/群/全局令牌桶，搜索和转存各自一个有界并发队列（排在并发合并之后，相同请求只占一个位置）
+        self.admission = AdmissionController(
+            user_per_minute=self.rate_limit_user_per_minute,
+            user_burst=self.rate_limit_user_burst,
+            group_per_minute=self.rate_limit_group_per_minute,
+            group_burst=self.rate_limit_group_burst,
+            global_per_minute=self.rate_limit_global_per_minute,
+            global_burst=self.rate_limit_global_burst,
+        )
+        self.search_queue = WorkQueue("search", self.search_concurrency, self.upstream_queue_size)
+        self.transfer_queue = WorkQueue("transfer", self.transfer_concurrency, self.upstream_queue_size)
+        # 批量选择：每个用户和所有用户合计同时进行的转存数，避免一个人的批量选择占满转存队列
+        self.batch_limiter = ParallelLimiter(self.batch_user_parallelism, self.batch_global_parallelism)
+        
         # 会话状态管理（存储用户的搜索结果和分页状态）
-        self.user_sessions = {}  # {user_id: {'keyword': str, 'results': list, 'timestamp': datetime, 'current_page': int}}
         self.session_timeout = timedelta(minutes=5)  # 会话5分钟过期
+        self.user_sessions = SessionStore(  # {user_id: {'keyword': str, 'results': list, 'current_page': int}}
+            timeout=self.session_timeout.total_seconds(),
+            max_sessions=self.max_sessions,
+            backend=self.backend,
+            encode=encode_session,
+            decode=decode_session,
+            # 所有会话合计的内存预算：超出后先把最久未操作的会话截断到看过的页，再淘汰
+            max_bytes=self.session_max_bytes,
+            sizeof=estimate_session_size,
+            shrink=self._shrink_session,
+        )
+        self._sweeper_task: Optional[asyncio.Task] = None
+        # 分网盘并发搜索时，第一页发出后继续等待其余网盘结果的后台任务
+        self._fanout_tasks: Set[asyncio.Task] = set()
+        
+        # 链接有效性检查：后台访问分享页，已知失效的链接不再展示给用户
+        self.liveness: Optional[LivenessChecker] = None
+        if self.liveness_enabled:
+            self.liveness = LivenessChecker(
+                lambda url: self.http_client.get_text(url, timeout=self.liveness_timeout, headers=SHARE_PAGE_HEADERS,
+                                                      allow_redirects=False),
+                self.cloud_types,
+                concurrency_per_type=self.liveness_concurrency_per_type,
+                alive_ttl=self.liveness_alive_ttl,
+                dead_ttl=self.liveness_dead_ttl,
+            )
+        
+        # 结果排序：转存成功率按来源和网盘类型持续统计（未开启排序时也统计），开启后按相似度、发布时间和成功率排列
+        self.ranker = Ranker(
+            ReliabilityTracker(backend=self.backend),
+            top_k=self.ranking_top_k,
+            similarity_weight=self.ranking_similarity_weight,
+            freshness_weight=self.ranking_freshness_weight,
+            reliability_weight=self.ranking_reliability_weight,
+            freshness_half_life_days=self.ranking_freshness_half_life_days,
+        )
+        
+        # 预转存：展示结果页后在后台转存最前面的几条，用户选择时直接命中转存缓存或合并到进行中的转存
+        self.prefetcher = Prefetcher(
+            top_n=self.prefetch_top_n,
+            concurrency=self.prefetch_concurrency,
+            daily_budget=self.prefetch_daily_budget,
+            claim_window=self.session_timeout.total_seconds(),
+        )
+        
+        # 运行指标：延迟直方图和计数器，可通过管理员指令、本地 HTTP 端点或文件读取
+        self.metrics = MetricsRegistry()
+        self._register_metrics()
+        self._metrics_runner = None
+        self._metrics_task: Optional[asyncio.Task] = None
         
         # 网盘类型中文名称映射
         self.cloud_type_names = {
@@ -57,8 +290,36 @@ class MyPlugin(Star):
         
         logger.info(f"[PanSearch] 增强版插件初始化完成")
 
+    # 内部方法：转存结果的缓存时间，不超过 expired_type 对应的分享有效期，避免发出已经过期的分享链接
+    def _transfer_cache_lifetime(self) -> float:
+        lifetime = self.transfer_share_lifetime
+        if self.transfer_expired_type not in SHARE_LIFETIMES:
+            logger.warning(f"[PanSearch] 未知的 transfer_expired_type: {self.transfer_expired_type}，"
+                           f"转存结果按 transfer_share_lifetime（{lifetime} 秒）缓存，请确认两者一致")
+            return lifetime
+        share_lifetime = SHARE_LIFETIMES[self.transfer_expired_type]
+        if share_lifetime is not None and lifetime > share_lifetime:
+            logger.warning(f"[PanSearch] transfer_share_lifetime（{lifetime} 秒）超过 expired_type="
+                           f"{self.transfer_expired_type} 的分享有效期（{share_lifetime} 秒），按分享有效期缓存转存结果")
+            return share_lifetime
+        return lifetime
+    
     async def initialize(self):
         """可选择实现异步的插件初始化方法，当实例化该插件类之后会自动调用该方法。"""
+        if self.backend is not None:
+            await self.backend.start()
+        if self.link_index is not None:
+            await self.link_index.start()
+        # 后台定期清理过期会话，消息处理路径上不再做全量扫描
+        self._sweeper_task = asyncio.create_task(self.user_sessions.run_sweeper(interval=30))
+        if self.metrics_http_port:
+            try:
+                self._metrics_runner = await self.metrics.start_http(self.metrics_http_host, self.metrics_http_port)
+            except OSError as e:
+                logger.error(f"[PanSearch] 指标端点启动失败: {str(e)}")
+        if self.metrics_file:
+            self._metrics_task = asyncio.create_task(
+                self.metrics.run_dumper(self.metrics_file, self.metrics_dump_interval))
 
     # 注册指令的装饰器。指令名为 helloworld。注册成功后，发送 `/helloworld` 就会触发这个指令，并回复 `你好, {user_name}!`
     @filter.command("helloworld")
@@ -79,21 +340,34 @@ class MyPlugin(Star):
             yield event.plain_result("❌ 请输入搜索关键词，格式：/search 关键词")
             return
             
+        rejection = self._check_admission(event, free=self._search_is_free(message_str))
+        if rejection:
+            yield event.plain_result(rejection)
+            return
+        
         user_id = str(event.get_sender_id())
-        result = self._handle_search(message_str, user_id)
+        result = await self._handle_search(message_str, user_id)
         yield event.plain_result(result)
     
     # 注册指令：转存
     @filter.command("transfer")
     async def transfer(self, event: AstrMessageEvent, *args, **kwargs):
-        """转存网盘资源，格式：/transfer 序号"""
+        """转存网盘资源，格式：/transfer 序号，支持批量：/transfer 1-3 或 /transfer 1 3 5"""
         message_str = event.message_str.strip()
         if not message_str:
             yield event.plain_result("❌ 请输入序号，格式：/transfer 序号")
             return
             
         user_id = str(event.get_sender_id())
-        result = self._handle_transfer(message_str, user_id)
+        indexes = [int(message_str)] if message_str.isdigit() else (
+            self._expand_selection(parse_selection(message_str)) if SELECTION_RE.fullmatch(message_str) else None)
+        rejection = self._check_admission(
+            event, free=isinstance(indexes, list) and self._transfers_are_free(indexes, user_id))
+        if rejection:
+            yield event.plain_result(rejection)
+            return
+        
+        result = await self._handle_transfer(message_str, user_id)
         yield event.plain_result(result)
     
     # 注册指令：翻页
@@ -115,130 +389,53 @@ class MyPlugin(Star):
     @filter.event_message_type(EventMessageType.ALL)
     async def handle_any_message(self, event: AstrMessageEvent, *args, **kwargs):
         """处理所有消息，支持：搜XX、求XX、搜索XX、找XX"""
-        # 检查是否为群成员加入事件
-        try:
-            # 获取事件类型
-            event_type = None
-            if hasattr(event, 'event_type'):
-                event_type = event.event_type
-            elif hasattr(event, 'message_type'):
-                event_type = event.message_type
-            
-            # 检查消息内容是否包含群成员加入的特征
-            message_str = event.message_str
-            message_chain = event.get_messages()
-            
-            # 常见的群成员加入消息特征
-            join_keywords = ['加入了群聊', '加入群聊', '已加入', '新成员', 'welcome', 'Welcome']
-            is_join_event = False
-            
-            # 检查消息字符串中是否包含加入关键词
-            if any(keyword in message_str for keyword in join_keywords):
-                is_join_event = True
-            
-            # 检查消息链中是否有相关元素
-            if message_chain and not is_join_event:
-                for msg in message_chain:
-                    if hasattr(msg, 'type') and msg.type in ['MemberJoin', 'MemberJoinEvent', '群成员加入', '入群']:
-                        is_join_event = True
-                        break
-                    # 检查消息内容
-                    if hasattr(msg, 'content') and any(keyword in msg.content for keyword in join_keywords):
-                        is_join_event = True
-                        break
-            
-            # 如果是群成员加入事件，发送欢迎消息
-            if is_join_event:
-                # 获取新加入的用户信息
-                user_name = event.get_sender_name()
-                # 发送欢迎消息
-                welcome_message = f"@{user_name} 欢迎小伙伴，想要看啥剧，输入搜+剧名发群里并输入数字即可获取链接\n\nPS:搜索功能是机器人回复的，群主没法实时看群，有问题@群主等待处理"
-                yield event.plain_result(welcome_message)
-                return
-        except Exception as e:
-            logger.error(f"[PanSearch] 处理群成员加入事件异常: {str(e)}")
-        
-        message_str = event.message_str.strip()
-        user_id = str(event.get_sender_id())
-        message_chain = event.get_messages()
+        route = self.router.route(event)
+        self.metrics.inc("messages_total", route=route[0] if route else "ignored")
+        if route is None:
+            return
+        kind, value = route
         
-        # 检查是否被@
-        is_at_me = False
-        try:
-            # 获取机器人自身信息
-            if hasattr(event, 'bot'):
-                bot = event.bot
-                bot_id = str(bot.get('user_id', ''))
-                bot_name = bot.get('nickname', '')
-            else:
-                # 如果没有bot属性，尝试使用其他方式获取机器人信息
-                bot_id = ''
-                bot_name = ''
-            
-            # 检查消息链中是否有@机器人的元素
-            if message_chain:
-                for msg in message_chain:
-                    # 检查是否是At类型的消息
-                    if hasattr(msg, 'type') and msg.type in ['At', 'at']:
-                        # 检查At的对象是否是机器人
-                        if hasattr(msg, 'target') and str(msg.target) == bot_id:
-                            is_at_me = True
-                            break
-                        elif hasattr(msg, 'qq') and str(msg.qq) == bot_id:
-                            is_at_me = True
-                            break
-                    # 检查消息内容中是否包含机器人名称
-                    if hasattr(msg, 'content') and bot_name in msg.content:
-                        is_at_me = True
-                        break
-        except Exception as e:
-            logger.error(f"[PanSearch] 检查@事件异常: {str(e)}")
+        # 如果是群成员加入事件，发送欢迎消息
+        if kind == ROUTE_JOIN:
+            # 获取新加入的用户信息
+            user_name = event.get_sender_name()
+            # 发送欢迎消息
+            welcome_message = f"@{user_name} 欢迎小伙伴，想要看啥剧，输入搜+剧名发群里并输入数字即可获取链接\n\nPS:搜索功能是机器人回复的，群主没法实时看群，有问题@群主等待处理"
+            yield event.plain_result(welcome_message)
+            return
         
         # 如果被@，发送使用说明
-        if is_at_me:
+        if kind == ROUTE_AT:
             help_message = "想要看啥剧，输入搜+剧名发群里并输入数字即可获取链接\n如 \"搜仙逆\" 跳出来的对话 如 \"2\"\nPS:搜索功能是机器人回复的，群主没法实时看群，有问题@群主等群主来解决就行"
             yield event.plain_result(help_message)
             return
         
-        # 处理搜索指令（支持：搜XX、百度XX、夸克XX、UCXX、迅雷XX）
-        search_patterns = [
-            r'^搜(.+)$',  # 原有的搜索格式
-            r'^百度(.+)$',  # 百度网盘搜索
-            r'^夸克(.+)$',  # 夸克网盘搜索
-            r'^UC(.+)$',   # UC网盘搜索
-            r'^迅雷(.+)$',  # 迅雷网盘搜索
-        ]
-        
-        keyword = None
-        cloud_type = "all"  # 默认搜索所有网盘
-        
-        for pattern in search_patterns:
-            match = re.match(pattern, message_str)
-            if match:
-                keyword = match.group(1).strip()
-                # 根据匹配的模式确定网盘类型
-                if pattern == r'^百度(.+)$':
-                    cloud_type = "baidu"
-                elif pattern == r'^夸克(.+)$':
-                    cloud_type = "quark"
-                elif pattern == r'^UC(.+)$':
-                    cloud_type = "uc"
-                elif pattern == r'^迅雷(.+)$':
-                    cloud_type = "xunlei"
-                break
+        user_id = str(event.get_sender_id())
         
-        if keyword:
-            # 发送搜索中提示
-            yield event.plain_result("🔍 搜索中，请等待")
+        # 处理搜索指令（支持：搜XX、百度XX、夸克XX、UCXX、迅雷XX）
+        if kind == ROUTE_SEARCH:
+            keyword, cloud_type = value
+            rejection = self._check_admission(event, free=self._search_is_free(keyword, cloud_type))
+            if rejection:
+                yield event.plain_result(rejection)
+                return
+            
+            # 发送搜索中提示，前面有其他搜索在排队时告知数量
+            position = self.search_queue.position()
+            if position > 1 and not self.search_queue.full:
+                yield event.plain_result(f"🔍 搜索中，前面还有 {position - 1} 个搜索在排队，请等待")
+            else:
+                yield event.plain_result("🔍 搜索中，请等待")
             
             # 记录开始时间
             start_time = datetime.now()
             
-            result = self._handle_search(keyword, user_id, cloud_type)
+            result = await self._handle_search(keyword, user_id, cloud_type)
             
             # 计算耗时
             end_time = datetime.now()
             elapsed_time = (end_time - start_time).total_seconds()
+            self.metrics.observe("command_seconds", elapsed_time, command="search")
             
             # 获取用户名称用于@
             user_name = event.get_sender_name()
@@ -248,25 +445,28 @@ class MyPlugin(Star):
             current_page = session.get('current_page', 1)
             
             # 组合最终结果
-            final_result = f"@{user_name}\n"
-            final_result += result
-            final_result += f"\n💡 序号有效期5分钟，过期请重新搜索\n"
-            final_result += f"⏱️  本次操作耗时：{elapsed_time:.2f}秒\n"
-            final_result += f"📄 当前页：{current_page}"
+            final_result = "".join((
+                f"@{user_name}\n",
+                result,
+                "\n💡 序号有效期5分钟，过期请重新搜索\n",
+                f"⏱️  本次操作耗时：{elapsed_time:.2f}秒\n",
+                f"📄 当前页：{current_page}",
+            ))
             
             yield event.plain_result(final_result)
             return
         
         # 处理翻页命令
-        if message_str in ["下一页", "下一頁", "next", "下页", "下頁"]:
+        if kind == ROUTE_PAGE:
             # 记录开始时间
             start_time = datetime.now()
             
-            result = self._handle_page_navigation("next", user_id)
+            result = self._handle_page_navigation(value, user_id)
             
             # 计算耗时
             end_time = datetime.now()
             elapsed_time = (end_time - start_time).total_seconds()
+            self.metrics.observe("command_seconds", elapsed_time, command="page")
             
             # 获取用户名称用于@
             user_name = event.get_sender_name()
@@ -276,95 +476,457 @@ class MyPlugin(Star):
             current_page = session.get('current_page', 1)
             
             # 组合最终结果
-            final_result = f"@{user_name}\n"
-            final_result += result
-            final_result += f"\n💡 序号有效期5分钟，过期请重新搜索\n"
-            final_result += f"⏱️  本次操作耗时：{elapsed_time:.2f}秒\n"
-            final_result += f"📄 当前页：{current_page}"
+            final_result = "".join((
+                f"@{user_name}\n",
+                result,
+                "\n💡 序号有效期5分钟，过期请重新搜索\n",
+                f"⏱️  本次操作耗时：{elapsed_time:.2f}秒\n",
+                f"📄 当前页：{current_page}",
+            ))
             
             yield event.plain_result(final_result)
             return
         
-        if message_str in ["上一页", "上一頁", "prev", "previous", "上页", "上頁"]:
+        # 处理选择命令（支持：第X个、X、选择X）
+        # 只有在用户搜索之后才会处理选择命令
+        if kind == ROUTE_SELECT and user_id in self.user_sessions:
+            rejection = self._check_admission(event, free=self._transfers_are_free([value], user_id))
+            if rejection:
+                yield event.plain_result(rejection)
+                return
+            
+            position = self.transfer_queue.position()
+            if position > 1 and not self.transfer_queue.full:
+                yield event.plain_result(f"⏳ 转存排队中，前面还有 {position - 1} 个转存，请等待")
+            
             # 记录开始时间
             start_time = datetime.now()
             
-            result = self._handle_page_navigation("prev", user_id)
+            result = await self._handle_select(value, user_id)
             
             # 计算耗时
             end_time = datetime.now()
             elapsed_time = (end_time - start_time).total_seconds()
+            self.metrics.observe("command_seconds", elapsed_time, command="select")
             
-            # 获取用户名称用于@
-            user_name = event.get_sender_name()
-            
-            # 添加@用户、有效期和耗时信息
-            session = self.user_sessions.get(user_id, {})
-            current_page = session.get('current_page', 1)
-            
-            # 组合最终结果
-            final_result = f"@{user_name}\n"
-            final_result += result
-            final_result += f"\n💡 序号有效期5分钟，过期请重新搜索\n"
-            final_result += f"⏱️  本次操作耗时：{elapsed_time:.2f}秒\n"
-            final_result += f"📄 当前页：{current_page}"
+            # 添加耗时信息
+            result += f"\n⏱️  本次操作耗时：{elapsed_time:.2f}秒"
             
-            yield event.plain_result(final_result)
+            yield event.plain_result(result)
             return
         
-        # 处理选择命令（支持：第X个、X、选择X）
-        # 只有在用户搜索之后才会处理选择命令
-        if user_id in self.user_sessions:
-            select_patterns = [
-                r'^第(\d+)个$',
-                r'^第(\d+)個$',
-                r'^(\d+)$',
-                r'^选择(\d+)$',
-                r'^選擇(\d+)$',
-                r'^转存(\d+)$',
-            ]
-            
-            selected_index = None
-            for pattern in select_patterns:
-                match = re.match(pattern, message_str)
-                if match:
-                    selected_index = int(match.group(1))
-                    break
+        # 处理批量选择命令（支持：1-4、1 3 5、选择1,3），同样只在用户搜索之后处理
+        if kind == ROUTE_BATCH and user_id in self.user_sessions:
+            ranges, explicit = value
+            # 不带前缀的 1-4、1 3 5 也可能是普通聊天（电话号码、日期），只有序号都在看过的页内时才当作批量选择
+            if not explicit and not self._is_shown_selection(ranges, user_id):
+                return
+            indexes = self._expand_selection(ranges)
+            if isinstance(indexes, str):
+                yield event.plain_result(indexes)
+                return
             
-            if selected_index is not None:
-                # 记录开始时间
-                start_time = datetime.now()
-                
-                result = self._handle_select(selected_index, user_id)
-                
-                # 计算耗时
-                end_time = datetime.now()
-                elapsed_time = (end_time - start_time).total_seconds()
-                
-                # 添加耗时信息
-                result += f"\n⏱️  本次操作耗时：{elapsed_time:.2f}秒"
-                
-                yield event.plain_result(result)
+            # 整个批量选择只扣一次令牌，数量由 batch_max_items 限制
+            rejection = self._check_admission(event, free=self._transfers_are_free(indexes, user_id))
+            if rejection:
+                yield event.plain_result(rejection)
                 return
+            
+            start_time = datetime.now()
+            
+            if self.batch_reply_mode == "combined":
+                results = [item async for item in self._iter_batch_select(indexes, user_id)]
+                output = self._format_batch(sorted(results, key=lambda item: item[0]), len(indexes))
+            else:
+                yield event.plain_result(f"⏳ 正在转存 {len(indexes)} 个资源，每完成一个回复一次...")
+                results = []
+                async for index, outcome, result in self._iter_batch_select(indexes, user_id):
+                    results.append((index, outcome, result))
+                    yield event.plain_result(f"【{index}】{result}")
+                output = self._format_batch_summary(results, len(indexes))
+            
+            elapsed_time = (datetime.now() - start_time).total_seconds()
+            self.metrics.observe("command_seconds", elapsed_time, command="batch")
+            output += f"\n⏱️  本次操作耗时：{elapsed_time:.2f}秒"
+            
+            yield event.plain_result(output)
+            return
+
+    # 注册指令：搜索缓存管理（仅管理员）
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("pansou_cache")
+    async def pansou_cache(self, event: AstrMessageEvent, action: str = "stats", keyword: str = ""):
+        """查看或清空缓存，格式：/pansou_cache stats | /pansou_cache clear [关键词] | /pansou_cache clear_transfer"""
+        if action == "clear_transfer":
+            count = self.transfer_cache.clear()
+            yield event.plain_result(f"✅ 已清空转存缓存，共 {count} 条")
+            return
+        
+        if action == "clear":
+            if keyword:
+                normalized = self.query_normalizer.canonical(keyword) if self.query_normalize else self._normalize_keyword(keyword)
+                count = self.search_cache.invalidate_where(lambda key: key[0] == normalized)
+                yield event.plain_result(f"✅ 已清除「{keyword}」的 {count} 条搜索缓存")
+            else:
+                count = self.search_cache.clear()
+                yield event.plain_result(f"✅ 已清空搜索缓存，共 {count} 条")
+            return
+        
+        stats = self.search_cache.stats()
+        output = "📊 搜索缓存统计\n"
+        output += f"条目数: {stats['entries']}/{self.search_cache_max_entries}\n"
+        output += f"占用: {stats['bytes'] / 1024 / 1024:.2f}MB\n"
+        output += f"命中: {stats['hits']}  未命中: {stats['misses']}\n"
+        output += f"命中率: {stats['hit_rate']:.1%}\n"
+        output += f"淘汰: {stats['evictions']}  过期: {stats['expirations']}\n"
+        
+        flight_stats = self.search_flight.stats()
+        output += f"\n🔀 并发合并\n"
+        output += f"上游请求: {flight_stats['flights']}  合并等待: {flight_stats['waiters']}\n"
+        output += f"平均扇出: {flight_stats['avg_fanout']:.2f}  最大扇出: {flight_stats['max_fanout']}\n"
+        output += f"进行中: {flight_stats['inflight']}\n"
+        
+        transfer_stats = self.transfer_cache.stats()
+        transfer_flight_stats = self.transfer_flight.stats()
+        output += f"\n📦 转存缓存\n"
+        output += f"条目数: {transfer_stats['entries']}/{self.transfer_cache_max_entries}\n"
+        output += f"命中: {transfer_stats['hits']}  未命中: {transfer_stats['misses']}\n"
+        output += f"命中率: {transfer_stats['hit_rate']:.1%}\n"
+        output += f"转存请求: {transfer_flight_stats['flights']}  合并等待: {transfer_flight_stats['waiters']}"
+        yield event.plain_result(output)
+
+    # 注册指令：会话统计（仅管理员）
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("pansou_sessions")
+    async def pansou_sessions(self, event: AstrMessageEvent, *args, **kwargs):
+        """查看用户会话统计"""
+        stats = self.user_sessions.stats()
+        output = "📊 会话统计\n"
+        output += f"活跃会话: {stats['live']}/{stats['max']}\n"
+        output += f"已过期: {stats['expired']}\n"
+        output += f"超出上限被淘汰: {stats['evicted']}\n"
+        output += f"估算内存: {stats['bytes'] / 1024 / 1024:.1f}MB"
+        output += f"/{stats['max_bytes'] / 1024 / 1024:.0f}MB\n" if stats['max_bytes'] else "（不限制）\n"
+        output += f"内存超出预算: 截断 {stats['truncated']} 个，淘汰 {stats['budget_evicted']} 个"
+        yield event.plain_result(output)
+
+    # 注册指令：限速与排队统计（仅管理员）
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("pansou_queue")
+    async def pansou_queue(self, event: AstrMessageEvent, *args, **kwargs):
+        """查看限速和上游请求队列统计"""
+        admission = self.admission.stats()
+        rejected = admission['rejected']
+        output = "📊 限速统计\n"
+        output += f"已放行: {admission['admitted']}\n"
+        output += f"被拒绝: 用户 {rejected['user']} / 群 {rejected['group']} / 全局 {rejected['global']}\n"
+        output += f"跟踪中: 用户 {admission['tracked_users']} / 群 {admission['tracked_groups']}\n"
+        for title, queue in (("搜索队列", self.search_queue), ("转存队列", self.transfer_queue)):
+            stats = queue.stats()
+            output += f"\n📊 {title}\n"
+            output += f"执行中: {stats['active']}/{stats['concurrency']}\n"
+            output += f"排队中: {stats['waiting']}/{stats['max_waiting']}（最多 {stats['max_depth']}）\n"
+            output += f"已完成: {stats['completed']}，排过队: {stats['queued']}，队满拒绝: {stats['rejected']}\n"
+            output += f"平均等待: {stats['avg_wait_ms']:.1f}ms\n"
+        batch = self.batch_limiter.stats()
+        output += "\n📊 批量转存\n"
+        output += f"执行中: {batch['active']}/{batch['total']}（最多 {batch['max_active']}，每人 {batch['per_key']}）\n"
+        output += f"进行中的用户: {batch['keys']}，已完成: {batch['completed']}\n"
+        yield event.plain_result(output.rstrip())
+
+    # 注册指令：搜索后端状态（仅管理员）
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("pansou_backends")
+    async def pansou_backends(self, event: AstrMessageEvent, *args, **kwargs):
+        """查看搜索后端的延迟、错误率和熔断状态"""
+        state_names = {"closed": "正常", "open": "熔断中", "half_open": "探测中"}
+        output = "📊 搜索后端\n"
+        for stats in self.search_pool.stats():
+            output += f"\n{stats['url']}（{state_names.get(stats['state'], stats['state'])}）\n"
+            output += f"延迟: EWMA {stats['latency_ms']:.0f}ms / p95 {stats['p95_ms']:.0f}ms\n"
+            output += f"错误率: {stats['error_rate']:.1%}，请求 {stats['requests']} 次，失败 {stats['failures']} 次\n"
+            output += f"对冲: 发出 {stats['hedges']} 次，胜出 {stats['hedge_wins']} 次\n"
+        yield event.plain_result(output.rstrip())
+
+    # 注册指令：预转存统计（仅管理员）
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("pansou_prefetch")
+    async def pansou_prefetch(self, event: AstrMessageEvent, *args, **kwargs):
+        """查看预转存的命中率和浪费的转存次数"""
+        stats = self.prefetcher.stats()
+        output = f"📊 预转存统计（{'已开启' if self.prefetch_enabled else '未开启'}）\n"
+        output += f"今日已用: {stats['used_today']}/{stats['daily_budget']}，进行中: {stats['inflight']}\n"
+        output += f"已发起: {stats['started']}，成功: {stats['succeeded']}，失败: {stats['failed']}\n"
+        output += f"命中率: {stats['hit_rate']:.1%}（选择 {stats['selections']} 次，命中 {stats['hits']} 次，其中进行中命中 {stats['inflight_hits']} 次）\n"
+        output += f"浪费: {stats['wasted']}，观察期内未被选择: {stats['unclaimed']}\n"
+        output += f"跳过: 并发已满 {stats['skipped_busy']} 次，超出每日额度 {stats['skipped_budget']} 次"
+        yield event.plain_result(output)
+
+    # 注册指令：关键词规范化统计（仅管理员）
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("pansou_queries")
+    async def pansou_queries(self, event: AstrMessageEvent, *args, **kwargs):
+        """查看关键词规范化合并了多少种写法"""
+        stats = self.query_normalizer.stats()
+        output = f"📊 关键词规范化（{'已开启' if self.query_normalize else '未开启'}）\n"
+        output += f"搜索: {stats['queries']}，被改写: {stats['rewritten']}\n"
+        output += f"规范化关键词: {stats['tracked']}，被合并的写法: {stats['collapsed']}\n"
+        for item in self.query_normalizer.top():
+            output += f"\n{item['keyword']} ← {'、'.join(item['variants'])}"
+        yield event.plain_result(output.rstrip())
+
+    # 注册指令：本地链接索引（仅管理员）
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("pansou_index")
+    async def pansou_index(self, event: AstrMessageEvent, action: str = "stats"):
+        """查看或压缩本地链接索引，格式：/pansou_index stats | /pansou_index compact"""
+        if self.link_index is None:
+            yield event.plain_result("❌ 本地链接索引未开启")
+            return
+        if action == "compact":
+            await self.link_index.flush()
+            removed = await self.link_index.compact()
+            yield event.plain_result(f"✅ 索引压缩完成，删除 {removed} 条链接")
+            return
+        stats = self.link_index.stats()
+        output = "📊 本地链接索引\n"
+        output += f"链接数: {stats['links']}/{stats['max_links']}，待写入: {stats['pending']}\n"
+        output += f"文件大小: {stats['bytes'] / 1024 / 1024:.2f}MB\n"
+        output += f"新增: {stats['added']}，更新: {stats['updated']}，压缩删除: {stats['removed']}（{stats['compactions']} 次）\n"
+        output += f"查询: {stats['queries']}，有结果: {stats['hits']}，平均耗时: {stats['avg_query_ms']:.1f}ms"
+        yield event.plain_result(output)
+
+    # 注册指令：链接有效性检查统计（仅管理员）
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("pansou_liveness")
+    async def pansou_liveness(self, event: AstrMessageEvent, *args, **kwargs):
+        """查看链接有效性检查的结论分布和拦截的失效链接数"""
+        if self.liveness is None:
+            yield event.plain_result("❌ 链接有效性检查未开启")
+            return
+        stats = self.liveness.stats()
+        output = "📊 链接有效性检查\n"
+        output += f"已检查: 有效 {stats['alive']}，失效 {stats['dead']}，无法判断 {stats['unknown']}\n"
+        output += f"缓存结论: {stats['cached']}，检查中: {stats['inflight']}，繁忙跳过: {stats['skipped']}\n"
+        output += f"拦截失效链接: {stats['dropped']} 条（这些链接被选择时必然转存失败）\n"
+        output += f"检查为有效的链接: 转存 {stats['transfers_checked_alive']} 次，失败 {stats['failures_checked_alive']} 次\n"
+        output += f"未检查或无法判断的链接: 转存 {stats['transfers_unchecked']} 次，失败 {stats['failures_unchecked']} 次"
+        yield event.plain_result(output)
+
+    # 注册指令：结果排序和来源可靠性（仅管理员）
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("pansou_ranking")
+    async def pansou_ranking(self, event: AstrMessageEvent, *args, **kwargs):
+        """查看各网盘类型和来源的转存成功率估计，以及排序耗时"""
+        stats = self.ranker.stats()
+        output = f"📊 结果排序（{'已开启' if self.ranking_enabled else '未开启'}）\n"
+        output += f"已排序: {stats['ranked']} 次，平均耗时: {stats['avg_rank_ms']:.2f}ms\n"
+        output += f"已记录转存: {stats['recorded']} 次\n"
+        for title, kind, limit in (("网盘类型", KIND_TYPE, None), ("来源（成功率最低的10个）", KIND_SOURCE, 10)):
+            rows = self.ranker.reliability.table(kind)
+            output += f"\n📊 {title}\n"
+            if not rows:
+                output += "暂无记录\n"
+            for name, estimate, success, failure in rows[:limit]:
+                output += f"{self.cloud_type_names.get(name, name) or '未知'}: {estimate:.0%}（成功 {success:.1f} / 失败 {failure:.1f}）\n"
+        yield event.plain_result(output.rstrip())
+
+    # 注册指令：运行指标（仅管理员）
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("pansou_metrics")
+    async def pansou_metrics(self, event: AstrMessageEvent, *args, **kwargs):
+        """查看延迟分位数、计数器和容量余量"""
+        output = self.metrics.summary()
+        sessions = self.user_sessions.stats()
+        output += "\n\n📊 容量余量\n"
+        output += f"会话: {sessions['live']}/{sessions['max']}\n"
+        if sessions['max_bytes']:
+            output += f"会话内存: {sessions['bytes'] / 1024 / 1024:.1f}MB/{sessions['max_bytes'] / 1024 / 1024:.0f}MB\n"
+        for title, queue in (("搜索", self.search_queue), ("转存", self.transfer_queue)):
+            stats = queue.stats()
+            output += f"{title}队列: 执行中 {stats['active']}/{stats['concurrency']}，排队 {stats['waiting']}/{stats['max_waiting']}\n"
+        yield event.plain_result(output.rstrip())
 
     async def terminate(self):
         """可选择实现异步的插件销毁方法，当插件被卸载/停用时会调用。"""
+        if self._sweeper_task is not None:
+            self._sweeper_task.cancel()
+        await self.prefetcher.close()
+        if self.liveness is not None:
+            await self.liveness.close()
+        for task in list(self._fanout_tasks):
+            task.cancel()
+        if self._metrics_task is not None:
+            self._metrics_task.cancel()
+            await self.metrics.dump(self.metrics_file)
+        if self._metrics_runner is not None:
+            await self._metrics_runner.cleanup()
+        await self.http_client.close()
+        if self.link_index is not None:
+            await self.link_index.close()
+        if self.backend is not None:
+            await self.backend.close()
         logger.info(f"[PanSearch] 插件已卸载")
     
-    # 内部方法：清理过期会话
-    def _cleanup_expired_sessions(self):
-        now = datetime.now()
-        expired_users = []
-        for user_id, session in self.user_sessions.items():
-            if now - session['timestamp'] > self.session_timeout:
-                expired_users.append(user_id)
-        for user_id in expired_users:
-            del self.user_sessions[user_id]
-    
-    # 内部方法：搜索资源
-    def _search_resources(self, keyword: str, src: str = "all") -> Dict:
+    # 内部方法：注册指标的说明，以及从各模块现有统计中读取的回调指标（会话淘汰、队列深度等）
+    def _register_metrics(self):
+        metrics = self.metrics
+        metrics.counter("messages_total", "按分发结果统计的消息数")
+        metrics.counter("searches_total", "搜索次数，按缓存命中、合并、请求上游区分")
+        metrics.counter("empty_results_total", "没有找到结果的搜索次数")
+        metrics.counter("transfer_failures_total", "转存失败次数")
+        metrics.counter("duplicate_links_total", "搜索结果中去掉的重复分享链接数")
+        metrics.histogram("command_seconds", "从收到指令到回复的耗时")
+        metrics.histogram("upstream_search_seconds", "搜索API请求耗时")
+        metrics.histogram("upstream_transfer_seconds", "转存API请求耗时")
+        metrics.histogram("stage_seconds", "本地处理各阶段耗时（解析、提取、格式化）")
+        metrics.histogram("fanout_first_page_seconds", "分网盘并发搜索时发出第一页前的等待时间")
+        
+        def session_evictions():
+            stats = self.user_sessions.stats()
+            return [({"reason": "expired"}, stats['expired']), ({"reason": "evicted"}, stats['evicted']),
+                    ({"reason": "memory"}, stats['budget_evicted'])]
+        
+        def session_truncations():
+            return [({}, self.user_sessions.stats()['truncated'])]
+        
+        def sessions():
+            stats = self.user_sessions.stats()
+            return [({"state": "live"}, stats['live']), ({"state": "max"}, stats['max'])]
+        
+        def session_bytes():
+            stats = self.user_sessions.stats()
+            return [({"state": "used"}, stats['bytes']), ({"state": "max"}, stats['max_bytes'])]
+        
+        def queues():
+            samples = []
+            for queue in (self.search_queue, self.transfer_queue):
+                stats = queue.stats()
+                for field in ("active", "concurrency", "waiting", "max_waiting"):
+                    samples.append(({"queue": queue.name, "field": field}, stats[field]))
+            return samples
+        
+        def queue_rejections():
+            return [({"queue": queue.name}, queue.rejected) for queue in (self.search_queue, self.transfer_queue)]
+        
+        def rate_limited():
+            return [({"scope": scope}, count) for scope, count in self.admission.rejected.items()]
+        
+        def cache_entries():
+            return [({"cache": "search"}, len(self.search_cache)), ({"cache": "transfer"}, len(self.transfer_cache))]
+        
+        def query_variants():
+            stats = self.query_normalizer.stats()
+            return [({"kind": "rewritten"}, stats['rewritten']), ({"kind": "collapsed"}, stats['collapsed'])]
+        
+        def index_links():
+            return [({}, self.link_index.link_count if self.link_index is not None else 0)]
+        
+        def liveness_verdicts():
+            if self.liveness is None:
+                return []
+            stats = self.liveness.stats()
+            return [({"verdict": verdict}, stats[verdict]) for verdict in ("alive", "dead", "unknown")]
+        
+        def liveness_dropped():
+            return [({}, self.liveness.dropped if self.liveness is not None else 0)]
+        
+        def backends_up():
+            return [({"backend": stats['url']}, 1 if stats['state'] == "closed" else 0) for stats in self.search_pool.stats()]
+        
+        metrics.register_callback("session_evictions_total", "counter", "会话因过期、超出数量上限或内存预算被移除的次数",
+                                  session_evictions)
+        metrics.register_callback("sessions", "gauge", "当前会话数和会话上限", sessions)
+        metrics.register_callback("session_bytes", "gauge", "所有会话估算占用的字节数和内存预算", session_bytes)
+        metrics.register_callback("session_truncations_total", "counter", "内存超出预算时被截断到已看过页的会话数",
+                                  session_truncations)
+        metrics.register_callback("queue", "gauge", "上游请求队列的并发和排队情况", queues)
+        metrics.register_callback("queue_rejections_total", "counter", "队列已满被拒绝的请求数", queue_rejections)
+        metrics.register_callback("rate_limited_total", "counter", "被限速拒绝的请求数", rate_limited)
+        metrics.register_callback("cache_entries", "gauge", "缓存条目数", cache_entries)
+        metrics.register_callback("query_variants", "gauge", "被规范化改写的搜索数和被合并的关键词写法数", query_variants)
+        metrics.register_callback("index_links", "gauge", "本地链接索引中的链接数", index_links)
+        metrics.register_callback("liveness_checks_total", "counter", "链接有效性检查次数，按结论区分", liveness_verdicts)
+        metrics.register_callback("liveness_dropped_total", "counter", "展示前被去掉的已知失效链接数", liveness_dropped)
+        metrics.register_callback("backend_up", "gauge", "搜索后端是否可用（熔断中为0）", backends_up)
+    
+    # 内部方法：默认的 SQLite 数据库路径（AstrBot 插件数据目录）
+    @staticmethod
+    def _default_sqlite_path() -> str:
+        try:
+            data_dir = StarTools.get_data_dir("QQbot_pansou")
+        except Exception:
+            data_dir = Path(__file__).parent
+        return str(data_dir / "pansou.db")
+    
+    # 内部方法：规范化搜索关键词（去除首尾及重复空白、统一大小写）
+    @staticmethod
+    def _normalize_keyword(keyword: str) -> str:
+        return " ".join(keyword.split()).lower()
+    
+    # 内部方法：带缓存的搜索，缓存键为 (规范化关键词, 网盘类型)
+    async def _cached_search(self, keyword: str, src: str = "all") -> Dict[str, List[LinkRecord]]:
+        cache_key = (self._normalize_keyword(keyword), src)
+        cached = self.search_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"[PanSearch] 命中搜索缓存: {keyword}, 网盘类型: {src}")
+            self.metrics.inc("searches_total", source="cache")
+            return cached
+        
+        async def fetch():
+            async with self.search_queue.slot():
+                result = await self._search_resources(keyword, src)
+            # 只缓存非空结果，避免把上游的临时故障缓存下来
+            if result:
+                self.search_cache.set(cache_key, result)
+                if self.link_index is not None:
+                    self.link_index.add(result)
+            return result
+        
+        if cache_key in self.search_flight:
+            logger.info(f"[PanSearch] 合并到进行中的搜索: {keyword}, 网盘类型: {src}")
+            self.metrics.inc("searches_total", source="coalesced")
+        else:
+            self.metrics.inc("searches_total", source="upstream")
+        if self.link_index is None:
+            return await self.search_flight.do(cache_key, fetch)
+        return await self._search_with_index(keyword, src, self.search_flight.do(cache_key, fetch))
+    
+    # 内部方法：上游搜索失败、没有结果、队列已满或超过等待时间时，用本地链接索引中的历史结果回答
+    async def _search_with_index(self, keyword: str, src: str, upstream: Awaitable) -> Dict[str, List[LinkRecord]]:
+        task = asyncio.ensure_future(upstream)
+        if self.index_fallback_after_ms > 0:
+            done, _ = await asyncio.wait({task}, timeout=self.index_fallback_after_ms / 1000)
+            if not done:
+                local = await self._search_index(keyword, src)
+                if local:
+                    # 上游搜索继续在后台进行，完成后结果照常进入缓存和索引
+                    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                    return local
+        try:
+            result = await task
+        except QueueFull:
+            local = await self._search_index(keyword, src)
+            if local:
+                return local
+            raise
+        return result or await self._search_index(keyword, src)
+    
+    # 内部方法：查询本地链接索引，出错时返回空结果
+    async def _search_index(self, keyword: str, src: str) -> Dict[str, List[LinkRecord]]:
+        try:
+            local = await self.link_index.search(keyword, src, per_type=self.normalizer.max_per_type)
+        except Exception as e:
+            logger.error(f"[PanSearch] 链接索引查询异常: {str(e)}")
+            return {}
+        if local:
+            logger.info(f"[PanSearch] 使用本地索引的历史结果: {keyword}, 网盘类型: {src}")
+            self.metrics.inc("searches_total", source="index")
+        return local
+    
+    # 内部方法：搜索资源，返回按网盘类型分组的链接
+    async def _search_resources(self, keyword: str, src: str = "all") -> Dict[str, List[LinkRecord]]:
         try:
-            url = f"{self.pansou_api_url}/api/search"
             payload = {
                 "kw": keyword,
                 "res": "merge",
@@ -372,65 +934,38 @@ class MyPlugin(Star):
             }
             
             logger.info(f"[PanSearch] 搜索关键词: {keyword}, 网盘类型: {src}")
-            logger.info(f"[PanSearch] API请求URL: {url}")
-            logger.info(f"[PanSearch] API请求参数: {json.dumps(payload)}")
+            self.tracer.event("API请求参数", payload=payload)
             
-            response = requests.post(
-                url,
-                json=payload,
-                timeout=self.timeout
-            )
-            response.raise_for_status()
+            async def request(base_url: str) -> Tuple[Dict[str, List[LinkRecord]], str]:
+                url = f"{base_url}/api/search"
+                self.tracer.event("API请求URL: %s", url)
+                if self.stream_parse:
+                    # 流式解析时网络读取和解析交织在一起，整体计入上游耗时
+                    start = time.perf_counter()
+                    parsed = await self._search_streaming(url, payload, src, base_url)
+                    self.metrics.observe("upstream_search_seconds", time.perf_counter() - start, backend=base_url)
+                    return parsed
+                start = time.perf_counter()
+                result = await self.http_client.post_json(url, json=payload)
+                self.metrics.observe("upstream_search_seconds", time.perf_counter() - start, backend=base_url)
+                self.tracer.event("API响应", payload=result)
+                if isinstance(result, dict) and result.get("code", 0) != 0:
+                    logger.error(f"[PanSearch] 搜索失败: {result.get('message', '未知错误')}")
+                # 即使返回码不是0，也尝试从响应中提取链接
+                with self.metrics.time("stage_seconds", stage="parse"):
+                    return self.normalizer.normalize(result, src, backend=base_url)
             
-            result = response.json()
-            logger.info(f"[PanSearch] API响应: {json.dumps(result)}")
-            logger.info(f"[PanSearch] API响应类型: {type(result)}")
-            logger.info(f"[PanSearch] API响应包含的键: {list(result.keys())}")
+            (links_by_type, shape), backend_url = await self.search_pool.run(request)
             
-            if result.get("code") == 0:
-                logger.info(f"[PanSearch] API返回成功状态码")
-                
-                # 检查各种可能的数据结构
-                if result.get("data"):
-                    data = result.get("data", {})
-                    logger.info(f"[PanSearch] 从data字段获取搜索结果")
-                    logger.info(f"[PanSearch] data字段类型: {type(data)}")
-                    logger.info(f"[PanSearch] data包含的键: {list(data.keys())}")
-                    
-                    # 检查data字段是否包含有效数据
-                    if isinstance(data, dict) and (data.get('total', 0) > 0 or data.get('links', []) or data.get('merged_by_type', {})):
-                        logger.info(f"[PanSearch] 搜索成功，找到 {data.get('total', 0)} 条结果")
-                        return data
-                    elif isinstance(data, list):
-                        logger.info(f"[PanSearch] data字段是列表，长度: {len(data)}")
-                        # 如果data是列表，可能直接包含结果
-                        return {"total": len(data), "links": data}
-                
-                # 检查是否有其他可能的数据结构
-                elif "links" in result:
-                    logger.info(f"[PanSearch] 直接从API响应获取links字段")
-                    links = result.get("links", [])
-                    return {"total": len(links), "links": links}
-                
-                elif "merged_by_type" in result:
-                    logger.info(f"[PanSearch] 直接从API响应获取merged_by_type字段")
-                    merged_by_type = result.get("merged_by_type", {})
-                    # 计算总结果数
-                    total = sum(len(links) for links in merged_by_type.values())
-                    return {"total": total, "merged_by_type": merged_by_type}
-                
-                # 如果没有找到预期的数据结构，但返回码是0
-                logger.warning(f"[PanSearch] API返回成功，但数据结构不符合预期: {json.dumps(result)}")
-                return result
+            total = sum(len(links) for links in links_by_type.values())
+            self.tracer.event("后端: %s, 响应结构: %s", backend_url, shape)
+            if total:
+                logger.info(f"[PanSearch] 搜索成功，找到 {total} 条结果")
             else:
-                logger.error(f"[PanSearch] 搜索失败: {result.get('message', '未知错误')}")
-                # 即使返回码不是0，也尝试返回可能的数据
-                if result.get("data"):
-                    logger.info(f"[PanSearch] API返回错误码，但包含data字段")
-                    return result.get("data", {})
-                return {}
+                logger.warning(f"[PanSearch] 搜索结果中没有可用的链接: {keyword}")
+            return links_by_type
                 
-        except requests.exceptions.RequestException as e:
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             logger.error(f"[PanSearch] 搜索请求异常: {str(e)}")
             return {}
         except Exception as e:
@@ -438,177 +973,151 @@ class MyPlugin(Star):
             logger.exception("[PanSearch] 搜索异常详细信息")
             return {}
     
-    # 内部方法：提取链接
-    def _extract_all_links(self, search_result: Dict) -> List[Dict]:
-        logger.info(f"[PanSearch] 提取链接开始，搜索结果类型: {type(search_result)}, 内容: {json.dumps(search_result)}")
-        logger.info(f"[PanSearch] 搜索结果包含的键: {list(search_result.keys())}")
-        merged_by_type = search_result.get("merged_by_type", {})
+    # 内部方法：流式解析搜索响应，每种网盘取满配额后立即停止读取
+    async def _search_streaming(self, url: str, payload: Dict, src: str, backend: str) -> Tuple[Dict[str, List[LinkRecord]], str]:
+        wanted_types = [src] if src in self.cloud_types else self.cloud_types
+        parser = MergedStreamParser(wanted_types, quota=self.normalizer.max_per_type)
+        async with aclosing(self.http_client.post_stream(url, json=payload)) as chunks:
+            async for chunk in chunks:
+                if parser.feed(chunk):
+                    break
         
-        # 只支持这4种网盘类型，按顺序：夸克、百度、UC、迅雷
-        cloud_types = ["quark", "baidu", "uc", "xunlei"]
-        
-        # 按类型收集链接
-        max_links_per_type = 100
-        all_links_by_type = {}
-        
-        # 检查是否有merged_by_type字段（全类型搜索时返回）
-        if merged_by_type:
-            logger.info(f"[PanSearch] 找到merged_by_type字段，类型: {type(merged_by_type)}, 内容: {json.dumps(merged_by_type)}")
-            logger.info(f"[PanSearch] merged_by_type包含的键: {list(merged_by_type.keys())}")
-            for cloud_type in cloud_types:
-                if cloud_type in merged_by_type:
-                    logger.info(f"[PanSearch] 找到{cloud_type}类型的链接，数量: {len(merged_by_type[cloud_type])}")
-                    type_links = []
-                    for link in merged_by_type[cloud_type][:max_links_per_type]:
-                        logger.info(f"[PanSearch] 处理链接: {link}")
-                        type_links.append({
-                            "url": link.get("url", ""),
-                            "password": link.get("password", ""),
-                            "note": link.get("note", ""),
-                            "type": cloud_type,
-                            "source": link.get("source", "")
-                        })
-                    if type_links:
-                        all_links_by_type[cloud_type] = type_links
-                        logger.info(f"[PanSearch] 提取到{cloud_type}类型的{len(type_links)}个链接")
-        else:
-            logger.info(f"[PanSearch] 没有找到merged_by_type字段，尝试其他数据结构")
-            # 没有merged_by_type字段，可能是特定网盘类型搜索
-            # 尝试从直接结果中提取链接
-            links = search_result.get("links", [])
-            logger.info(f"[PanSearch] 直接links字段数量: {len(links)}")
-            if links:
-                logger.info(f"[PanSearch] 找到直接links字段: {len(links)}个链接")
-                logger.info(f"[PanSearch] 第一个链接内容: {links[0] if links else '无'}")
-                # 确定当前搜索的网盘类型
-                current_src = search_result.get("src", "")
-                logger.info(f"[PanSearch] 当前搜索的网盘类型: {current_src}")
-                if current_src in cloud_types:
-                    # 创建该类型的链接列表
-                    type_links = []
-                    for link in links[:max_links_per_type]:
-                        type_links.append({
-                            "url": link.get("url", ""),
-                            "password": link.get("password", ""),
-                            "note": link.get("note", ""),
-                            "type": current_src,
-                            "source": link.get("source", "")
-                        })
-                    if type_links:
-                        all_links_by_type[current_src] = type_links
-                        logger.info(f"[PanSearch] 提取到{current_src}类型的{len(type_links)}个链接")
-            else:
-                logger.info(f"[PanSearch] 没有找到直接links字段，尝试按网盘类型查找")
-                # 尝试另一种可能的数据结构
-                for cloud_type in cloud_types:
-                    if cloud_type in search_result:
-                        logger.info(f"[PanSearch] 找到{cloud_type}字段，内容: {search_result[cloud_type]}")
-                        type_links = []
-                        for link in search_result[cloud_type][:max_links_per_type]:
-                            type_links.append({
-                                "url": link.get("url", ""),
-                                "password": link.get("password", ""),
-                                "note": link.get("note", ""),
-                                "type": cloud_type,
-                                "source": link.get("source", "")
-                            })
-                        if type_links:
-                            all_links_by_type[cloud_type] = type_links
-                            logger.info(f"[PanSearch] 提取到{cloud_type}类型的{len(type_links)}个链接")
-            
-            # 尝试一种新的可能数据结构（特定网盘搜索可能返回的结构）
-            if not all_links_by_type and "data" in search_result:
-                logger.info(f"[PanSearch] 尝试从data字段提取链接")
-                data = search_result.get("data", {})
-                logger.info(f"[PanSearch] data字段内容: {json.dumps(data)}")
-                logger.info(f"[PanSearch] data包含的键: {list(data.keys())}")
-                
-                # 检查data字段是否包含links
-                data_links = data.get("links", [])
-                if data_links:
-                    logger.info(f"[PanSearch] 从data字段找到links: {len(data_links)}个链接")
-                    current_src = data.get("src", "") or search_result.get("src", "")
-                    logger.info(f"[PanSearch] 当前搜索的网盘类型: {current_src}")
-                    if current_src in cloud_types:
-                        type_links = []
-                        for link in data_links[:max_links_per_type]:
-                            type_links.append({
-                                "url": link.get("url", ""),
-                                "password": link.get("password", ""),
-                                "note": link.get("note", ""),
-                                "type": current_src,
-                                "source": link.get("source", "")
-                            })
-                        if type_links:
-                            all_links_by_type[current_src] = type_links
-                            logger.info(f"[PanSearch] 从data字段提取到{current_src}类型的{len(type_links)}个链接")
-            
-            # 最后尝试一种可能的数据结构
-            if not all_links_by_type:
-                logger.info(f"[PanSearch] 尝试直接从搜索结果提取所有可能的链接")
-                for key, value in search_result.items():
-                    if isinstance(value, list):
-                        logger.info(f"[PanSearch] 检查{key}字段，类型为列表，长度: {len(value)}")
-                        if value and isinstance(value[0], dict):
-                            logger.info(f"[PanSearch] {key}字段包含字典列表，尝试提取链接")
-                            # 确定可能的网盘类型
-                            possible_types = [t for t in cloud_types if t in str(key).lower() or t in str(search_result.get("src", ""))]
-                            cloud_type = possible_types[0] if possible_types else "other"
-                            
-                            type_links = []
-                            for link in value[:max_links_per_type]:
-                                if "url" in link or "link" in link:
-                                    type_links.append({
-                                        "url": link.get("url", link.get("link", "")),
-                                        "password": link.get("password", link.get("pwd", "")),
-                                        "note": link.get("note", link.get("title", "")),
-                                        "type": cloud_type,
-                                        "source": link.get("source", "")
-                                    })
-                            if type_links:
-                                all_links_by_type[cloud_type] = type_links
-                                logger.info(f"[PanSearch] 直接提取到{cloud_type}类型的{len(type_links)}个链接")
+        if not parser.found_merged:
+            # 不是 merged 结构，按完整响应交给通用的结构识别处理
+            result = parser.close()
+            self.tracer.event("API响应", payload=result)
+            return self.normalizer.normalize(result, src, backend=backend)
+        
+        if parser.code not in (None, 0):
+            logger.error(f"[PanSearch] 搜索失败: {parser.message or '未知错误'}")
+        self.tracer.event("流式解析读取 %s 字节，提前结束: %s", parser.bytes_read, parser.done)
+        return parser.links_by_type, "merged_by_type(stream)"
+    
+    # 内部方法：按轮次排列链接；stats 用于记下去重数量和是否排序，结果列表最终确定后由 _record_search_stats 统计
+    def _extract_all_links(self, links_by_type: Dict[str, List[LinkRecord]], keyword: str = "",
+                           stats: Optional[Dict[str, int]] = None) -> List[LinkRecord]:
+        # 同一个分享可能由多个来源返回，或者只是查询参数、提取码写法不同，排列前先去重
+        if self.dedupe_enabled:
+            links_by_type, removed = dedupe_links(links_by_type)
+            if removed:
+                self.tracer.event("去掉重复链接: %s", removed)
+            if stats is not None:
+                stats['duplicates'] = removed
+        
+        if self.ranking_enabled and keyword:
+            links = self.ranker.arrange(keyword, links_by_type, self.cloud_types, self.links_per_type)
+            if stats is not None:
+                stats['ranked'] = 1
+            logger.info(f"[PanSearch] 提取到 {len(links)} 个链接（已排序）")
+            return links
         
         # 按轮次排列：每轮都是 夸克2条 -> 百度2条 -> UC2条 -> 迅雷2条
         links = []
         
         # 计算最大需要多少轮
-        max_links_per_type = max([len(links) for links in all_links_by_type.values()], default=0)
+        max_links_per_type = max([len(links) for links in links_by_type.values()], default=0)
         max_rounds = (max_links_per_type + self.links_per_type - 1) // self.links_per_type
         
-        logger.info(f"[PanSearch] 最大轮次: {max_rounds}, 每轮链接数: {self.links_per_type}")
+        self.tracer.event("最大轮次: %s, 每轮链接数: %s", max_rounds, self.links_per_type)
         
         for round_num in range(max_rounds):
-            for cloud_type in cloud_types:
-                if cloud_type in all_links_by_type:
-                    type_links = all_links_by_type[cloud_type]
-                    start_idx = round_num * self.links_per_type
-                    end_idx = start_idx + self.links_per_type
-                    round_links = type_links[start_idx:end_idx]
-                    if round_links:
-                        logger.info(f"[PanSearch] 第{round_num+1}轮，{cloud_type}类型，添加{len(round_links)}个链接")
-                        links.extend(round_links)
-        
-        # 如果没有轮次排列的链接，直接返回所有收集到的链接
-        if not links:
-            logger.info(f"[PanSearch] 没有轮次排列的链接，直接返回所有收集到的链接")
-            for cloud_type in cloud_types:
-                if cloud_type in all_links_by_type:
-                    logger.info(f"[PanSearch] 直接添加{cloud_type}类型的{len(all_links_by_type[cloud_type])}个链接")
-                    links.extend(all_links_by_type[cloud_type][:max_links_per_type])
+            start_idx = round_num * self.links_per_type
+            end_idx = start_idx + self.links_per_type
+            for cloud_type in self.cloud_types:
+                type_links = links_by_type.get(cloud_type)
+                if type_links:
+                    links.extend(type_links[start_idx:end_idx])
         
         logger.info(f"[PanSearch] 提取到 {len(links)} 个链接")
         return links
     
+    # 内部方法：分网盘类型并发搜索，凑够一页或到达等待时限就返回，返回 (已到达的链接, 已到达的分组, 未完成的搜索)
+    async def _fanout_first_page(self, keyword: str, query: str = "", stats: Optional[Dict[str, int]] = None) -> Tuple[List[LinkRecord], Dict[str, List[LinkRecord]], Set[asyncio.Task]]:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + self.fanout_first_page_timeout_ms / 1000
+        # 每种网盘单独走缓存、并发合并和搜索队列
+        pending = {asyncio.create_task(self._cached_search(keyword, cloud_type)) for cloud_type in self.cloud_types}
+        arrived: Dict[str, List[LinkRecord]] = {}
+        links: List[LinkRecord] = []
+        queue_full = False
+        while pending:
+            remaining = deadline - loop.time()
+            if len(links) >= self.page_size or (links and remaining <= 0):
+                break
+            # 到达时限后还没有任何结果时，继续等到第一批结果或全部结束
+            done, pending = await asyncio.wait(pending, timeout=remaining if remaining > 0 else None,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    arrived.update(task.result())
+                except QueueFull:
+                    queue_full = True
+                except Exception as e:
+                    logger.error(f"[PanSearch] 分网盘搜索异常: {str(e)}")
+            with self.metrics.time("stage_seconds", stage="extract"):
+                links = self._extract_all_links(arrived, query or keyword, stats)
+        
+        self.metrics.observe("fanout_first_page_seconds", loop.time() - start)
+        if not links and queue_full:
+            raise QueueFull("search")
+        return links, arrived, pending
+    
+    # 内部方法：第一页发出后，把陆续到达的其他网盘结果合并进会话；已经展示过的结果保持原来的位置和序号
+    async def _merge_late_results(self, user_id: str, session: Dict, arrived: Dict[str, List[LinkRecord]],
+                                  pending: Set[asyncio.Task], stats: Dict[str, int]):
+        first_page_types = len(arrived)
+        try:
+            await self._merge_pending(user_id, session, arrived, pending)
+        finally:
+            # 合并时只对没展示过的部分去重，有后到的结果时按到达的全部结果重新计算一次重复数
+            if self.dedupe_enabled and len(arrived) > first_page_types:
+                stats['duplicates'] = dedupe_links(arrived)[1]
+            self._record_search_stats(stats)
+    
+    async def _merge_pending(self, user_id: str, session: Dict, arrived: Dict[str, List[LinkRecord]],
+                             pending: Set[asyncio.Task]):
+        for next_done in asyncio.as_completed(pending):
+            try:
+                result = await next_done
+            except Exception as e:
+                logger.warning(f"[PanSearch] 分网盘搜索异常: {str(e)}")
+                continue
+            if not result:
+                continue
+            # 用户已经重新搜索或会话已过期，剩下的搜索结果只进入缓存
+            if self.user_sessions.get(user_id) is not session:
+                return
+            arrived.update(result)
+            # 用户看过的页由 max_viewed_page 记录；_pages 只是渲染缓存，截断会话时会被清空
+            shown = session['results'][:session.get('max_viewed_page', 1) * self.page_size]
+            # 去重和排序后，每种网盘展示过的不一定是原始列表的前几条，按分享键排除
+            shown_keys = {share_key(record.url) for record in shown}
+            rest = {cloud_type: [record for record in links if share_key(record.url) not in shown_keys]
+                    for cloud_type, links in arrived.items()}
+            session['results'] = shown + self._extract_all_links(rest, session.get('_query') or session['keyword'])
+            self._rerender_pages(session)
+            # 结果列表被替换，重新估算会话大小
+            self.user_sessions.resize(user_id)
+            self.user_sessions.touch(user_id)
+            logger.info(f"[PanSearch] 合并后到的搜索结果，共 {len(session['results'])} 条")
+    
+    # 内部方法：一次搜索的结果列表最终确定后记录去重和排序统计；分网盘并发搜索中间多次排列的结果不重复计数
+    def _record_search_stats(self, stats: Dict[str, int]):
+        if stats.get('duplicates'):
+            self.metrics.inc("duplicate_links_total", stats['duplicates'])
+        if stats.get('ranked'):
+            self.ranker.count()
+    
     # 内部方法：转存链接
-    def _transfer_link(self, url: str, password: str = "") -> Optional[Dict]:
+    async def _transfer_link(self, url: str, password: str = "") -> Optional[Dict]:
         try:
             api_url = f"{self.ziliao_api_url}{self.ziliao_api_path}"
             
             payload = {
                 "url": url,
                 "code": password,
-                "expired_type": 1,
+                "expired_type": self.transfer_expired_type,
                 "isType": 0
             }
             
@@ -620,15 +1129,9 @@ class MyPlugin(Star):
             }
             
             logger.info(f"[PanSearch] 转存链接: {url[:50]}...")
-            response = requests.post(
-                api_url,
-                data=payload,
-                headers=headers,
-                timeout=self.timeout
-            )
-            response.raise_for_status()
-            
-            result = response.json()
+            start = time.perf_counter()
+            result = await self.http_client.post_json(api_url, data=payload, headers=headers)
+            self.metrics.observe("upstream_transfer_seconds", time.perf_counter() - start)
             
             if result.get("code") == 200 and result.get("data"):
                 data = result.get("data", {})
@@ -643,15 +1146,39 @@ class MyPlugin(Star):
                 logger.error(f"[PanSearch] 转存失败: {error_msg}")
                 return None
                 
-        except requests.exceptions.RequestException as e:
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             logger.error(f"[PanSearch] 转存请求异常: {str(e)}")
             return None
         except Exception as e:
             logger.error(f"[PanSearch] 转存处理异常: {str(e)}")
             return None
     
+    # 内部方法：带缓存的转存，缓存键为 (链接, 提取码)，并发的相同转存只请求一次
+    # record 为选中的链接，真正向转存API发出请求时用于记录来源可靠性和有效性检查的统计
+    async def _cached_transfer(self, url: str, password: str = "", record: Optional[LinkRecord] = None) -> Optional[Dict]:
+        cache_key = (url, password)
+        cached = self.transfer_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"[PanSearch] 命中转存缓存: {url[:50]}...")
+            return cached
+        
+        async def transfer():
+            async with self.transfer_queue.slot():
+                result = await self._transfer_link(url, password)
+            # 只缓存转存成功的结果
+            if result:
+                self.transfer_cache.set(cache_key, result)
+            # 命中缓存或合并到进行中的转存不会走到这里，同一次转存只计数一次
+            if record is not None:
+                if self.liveness is not None:
+                    self.liveness.record_transfer(url, bool(result))
+                self.ranker.reliability.record(record, bool(result))
+            return result
+        
+        return await self.transfer_flight.do(cache_key, transfer)
+    
     # 内部方法：格式化分页结果
-    def _format_results_page(self, results: List[Dict], page: int = 1) -> Tuple[str, int]:
+    def _format_results_page(self, results: List[LinkRecord], page: int = 1) -> Tuple[str, int]:
         if not results:
             return "❌ 没有找到结果", 0
         
@@ -666,94 +1193,208 @@ class MyPlugin(Star):
         end_idx = start_idx + self.page_size
         page_results = results[start_idx:end_idx]
         
-        output = f"🔍 搜索结果（共 {len(results)} 个，第 {page}/{total_pages} 页）\n\n"
+        parts = [f"🔍 搜索结果（共 {len(results)} 个，第 {page}/{total_pages} 页）\n\n"]
+        separator = "-" * 40 + "\n\n"
         
         for i, result in enumerate(page_results, start=start_idx + 1):
-            cloud_type = result.get("type", "unknown")
-            cloud_name = self.cloud_type_names.get(cloud_type, cloud_type)
-            note = result.get("note", "无标题")
-            
-            output += f"【{i}】{note}\n"
-            output += f"    📦 {cloud_name}\n"
+            cloud_name = self.cloud_type_names.get(result.type, result.type)
+            parts.append(f"【{i}】{result.note}\n    📦 {cloud_name}\n")
             # 添加分割符，最后一个结果不添加
             if i < end_idx and i < len(results):
-                output += "" + "-" * 40 + "\n\n"
+                parts.append(separator)
             else:
-                output += "\n"
+                parts.append("\n")
         
         if total_pages > 1:
-            output += f"💡 输入「下一页」或「上一页」翻页\n"
-            output += f"💡 输入「第X个」或「X」选择资源（如：第1个、1）\n"
+            parts.append("💡 输入「下一页」或「上一页」翻页\n")
+            parts.append("💡 输入「第X个」或「X」选择资源（如：第1个、1）\n")
         
+        output = "".join(parts)
         return output, total_pages
     
+    # 内部方法：限速检查，通过时返回 None，否则返回提示语；free 为 True（不会请求上游）时不检查也不扣令牌
+    def _check_admission(self, event: AstrMessageEvent, free: bool = False) -> Optional[str]:
+        if free:
+            return None
+        user_id = str(event.get_sender_id())
+        group_id = str(event.get_group_id() or "")
+        rejection = self.admission.check(user_id, group_id)
+        if rejection is None:
+            return None
+        scope, wait = rejection
+        seconds = math.ceil(wait)
+        logger.info(f"[PanSearch] 请求被限速: {scope}, 用户: {user_id}, 群: {group_id}")
+        if scope == SCOPE_USER:
+            return f"⏳ 操作太频繁了，请 {seconds} 秒后再试"
+        if scope == SCOPE_GROUP:
+            return f"⏳ 本群请求太多了，请 {seconds} 秒后再试"
+        return f"⏳ 机器人繁忙，请 {seconds} 秒后再试"
+    
+    # 内部方法：搜索结果已经缓存或正在搜索时，这次搜索不会请求上游
+    def _search_is_free(self, keyword: str, cloud_type: str = "all") -> bool:
+        if self.query_normalize:
+            keyword = self.query_normalizer.canonical(keyword)
+        keyword = self._normalize_keyword(keyword)
+        # 分网盘并发搜索时每种网盘单独缓存
+        sources = self.cloud_types if cloud_type == "all" and self.fanout_enabled else [cloud_type]
+        return all((keyword, src) in self.search_cache or (keyword, src) in self.search_flight for src in sources)
+    
+    # 内部方法：选中的链接都已经转存过或正在转存时，这次选择不会请求上游；序号无效的只会回复提示
+    def _transfers_are_free(self, indexes: List[int], user_id: str) -> bool:
+        session = self.user_sessions.get(user_id)
+        if session is None:
+            return True
+        results = session['results']
+        for index in indexes:
+            if 1 <= index <= len(results):
+                key = (results[index - 1].url, results[index - 1].password)
+                if key not in self.transfer_cache and key not in self.transfer_flight:
+                    return False
+        return True
+    
+    # 内部方法：后台预转存当前页最前面的几条结果，只在转存队列空闲时进行，不挤占用户自己的转存
+    def _prefetch_page(self, session: Dict, page: int):
+        if not self.prefetch_enabled or self.transfer_queue.position():
+            return
+        start_idx = (page - 1) * self.page_size
+        records = {(result.url, result.password): result
+                   for result in session['results'][start_idx:start_idx + self.page_size] if result.url}
+        launched = self.prefetcher.schedule(
+            records,
+            lambda key: self._cached_transfer(*key, record=records[key]),
+            skip=lambda key: key in self.transfer_cache or key in self.transfer_flight,
+        )
+        if launched:
+            logger.info(f"[PanSearch] 预转存第 {page} 页的 {launched} 个资源")
+    
+    # 内部方法：第一次展示某一页之前去掉这一页及之后已知失效的链接（之前的页已经展示过，序号不变），并提前检查后面两页
+    def _drop_dead_links(self, session: Dict, page: int) -> bool:
+        start_idx = (page - 1) * self.page_size
+        results = session['results']
+        kept = self.liveness.drop_dead(results[start_idx:])
+        self.liveness.schedule(kept[self.page_size:self.page_size * 3])
+        if len(kept) == len(results) - start_idx:
+            return False
+        session['results'] = results[:start_idx] + kept
+        self._rerender_pages(session)
+        return True
+    
+    # 内部方法：获取会话中已渲染的页面，只有第一次访问某一页时才渲染，之后直接复用，随会话一起过期；
+    # 会话已经保存时传入 user_id，新渲染的页计入会话的内存估算
+    def _render_page(self, session: Dict, page: int, user_id: str = "") -> str:
+        pages = session.get('_pages')
+        if pages is None:
+            pages = session['_pages'] = {}
+        output = pages.get(page)
+        if output is None:
+            with self.metrics.time("stage_seconds", stage="format"):
+                output, total_pages = self._format_results_page(session['results'], page)
+            # 超出总页数时渲染的是最后一页，不记在请求的页码下
+            if page <= max(total_pages, 1):
+                added = add_rendered_page(pages, page, output)
+                if user_id:
+                    self.user_sessions.resize(user_id, added)
+        return output
+    
+    # 内部方法：结果列表变化后，已渲染页面中的总数和总页数不再准确，清空后重新渲染仍在范围内的页
+    def _rerender_pages(self, session: Dict):
+        pages = session.get('_pages') or {}
+        session['_pages'] = {}
+        total_pages = (len(session['results']) + self.page_size - 1) // self.page_size
+        for page in pages:
+            if page <= total_pages:
+                self._render_page(session, page)
+    
     # 内部方法：处理搜索
-    def _handle_search(self, keyword: str, user_id: str, cloud_type: str = "all") -> str:
-        self._cleanup_expired_sessions()
-        
-        try:
-            # 搜索资源
-            search_result = self._search_resources(keyword, cloud_type)
-            logger.info(f"[PanSearch] _handle_search: 搜索结果: {json.dumps(search_result)}")
-            
-            if not search_result:
-                logger.info(f"[PanSearch] _handle_search: 搜索结果为空")
-                return ">>>查询失败<<<<\n--------------------\n剧名宁少写，不多写、错写\n不要标点、演员名、第几季\n如再查询不到@群主帮你找"
-            
-            # 计算可能的总结果数
-            if isinstance(search_result, dict):
-                # 尝试从不同字段获取总结果数
-                total = search_result.get("total", 0)
-                if total == 0:
-                    # 计算实际存在的链接数
-                    if "merged_by_type" in search_result:
-                        total = sum(len(links) for links in search_result["merged_by_type"].values())
-                    elif "links" in search_result:
-                        total = len(search_result["links"])
-            else:
-                total = 0
-            
-            logger.info(f"[PanSearch] _handle_search: 总结果数: {total}")
-            
-            if total == 0:
-                return ">>>查询失败<<<<\n--------------------\n剧名宁少写，不多写、错写\n不要标点、演员名、第几季\n如再查询不到@群主帮你找"
-            
-            # 提取所有链接
-            links = self._extract_all_links(search_result)
-            logger.info(f"[PanSearch] _handle_search: 提取到的链接数量: {len(links)}")
-            if not links:
-                return ">>>查询失败<<<<\n--------------------\n剧名宁少写，不多写、错写\n不要标点、演员名、第几季\n如再查询不到@群主帮你找"
+    async def _handle_search(self, keyword: str, user_id: str, cloud_type: str = "all") -> str:
+        # 规范化会去掉集数等后缀，排序时仍按用户原本输入的内容比较标题
+        query = keyword
+        if self.query_normalize:
+            keyword = self.query_normalizer.normalize(keyword)
+        with self.tracer.span(f"搜索 {keyword}"):
+            try:
+                pending: Set[asyncio.Task] = set()
+                stats: Dict[str, int] = {}
+                if cloud_type == "all" and self.fanout_enabled:
+                    # 分网盘并发搜索，最快的网盘返回后就可以发出第一页
+                    links, arrived, pending = await self._fanout_first_page(keyword, query, stats)
+                else:
+                    # 搜索资源
+                    links_by_type = await self._cached_search(keyword, cloud_type)
+                    
+                    # 提取所有链接
+                    with self.metrics.time("stage_seconds", stage="extract"):
+                        links = self._extract_all_links(links_by_type, query, stats)
+                self.tracer.event("_handle_search: 提取到的链接数量: %s", len(links))
+                if not links:
+                    self.metrics.inc("empty_results_total")
+                    return ">>>查询失败<<<<\n--------------------\n剧名宁少写，不多写、错写\n不要标点、演员名、第几季\n如再查询不到@群主帮你找"
             
-            # 保存到会话
-            self.user_sessions[user_id] = {
-                'keyword': keyword,
-                'results': links,
-                'timestamp': datetime.now(),
-                'current_page': 1
-            }
+                # 检查前两页的链接，最多等待一小段时间，第一页中失效的链接由第二页的链接补上
+                if self.liveness is not None:
+                    await self.liveness.check(links[:self.page_size * 2], timeout=self.liveness_first_page_wait_ms / 1000)
+                
+                session = {
+                    'keyword': keyword,
+                    'results': links,
+                    'current_page': 1,
+                    # 看过的最后一页：这一页及之前的序号已经展示给用户，之后合并结果时保持不变
+                    'max_viewed_page': 1,
+                    '_query': query,
+                }
             
-            # 格式化第一页
-            output, total_pages = self._format_results_page(links, 1)
-            return output
+                # 格式化第一页：先去掉失效链接再渲染和预转存，预转存不会选中失效链接
+                if self.liveness is not None:
+                    self._drop_dead_links(session, 1)
+                output = self._render_page(session, 1)
+                # 渲染好第一页再保存到会话，写入时估算的大小包含第一页
+                self.user_sessions[user_id] = session
+                self._prefetch_page(session, 1)
+                if pending:
+                    # 去重和排序统计等后到的结果合并完再记录
+                    task = asyncio.create_task(self._merge_late_results(user_id, session, arrived, pending, stats))
+                    self._fanout_tasks.add(task)
+                    task.add_done_callback(self._fanout_tasks.discard)
+                    output += f"⏳ 还有 {len(pending)} 种网盘的结果在加载，稍后翻页即可看到\n"
+                else:
+                    self._record_search_stats(stats)
+                return output
             
-        except Exception as e:
-            logger.error(f"搜索处理异常: {str(e)}")
-            return f"❌ 搜索失败: {str(e)}"
+            except QueueFull:
+                logger.warning(f"[PanSearch] 搜索队列已满，拒绝搜索: {keyword}")
+                return "⏳ 当前搜索的人太多了，请稍后再试"
+            except Exception as e:
+                logger.error(f"搜索处理异常: {str(e)}")
+                return f"❌ 搜索失败: {str(e)}"
+    
+    # 内部方法：会话内存超出预算时截断结果列表，只保留用户已经看过的页，返回是否有变化
+    def _shrink_session(self, session: Dict) -> bool:
+        pages = session.get('_pages') or {}
+        keep = session.get('max_viewed_page', session.get('current_page', 1)) * self.page_size
+        truncated = len(session['results']) > keep
+        if not truncated and not pages:
+            return False
+        if truncated:
+            session['results'] = session['results'][:keep]
+            session['_truncated'] = True
+        # 渲染好的页面文本也释放（里面有总数和总页数，截断后需要重新渲染）
+        session['_pages'] = {}
+        return True
     
     # 内部方法：处理分页导航
     def _handle_page_navigation(self, direction: str, user_id: str) -> str:
-        self._cleanup_expired_sessions()
-        
-        if user_id not in self.user_sessions:
+        session = self.user_sessions.get(user_id)
+        if session is None:
             return "❌ 请先搜索资源"
         
-        session = self.user_sessions[user_id]
         results = session['results']
         current_page = session.get('current_page', 1)
         total_pages = (len(results) + self.page_size - 1) // self.page_size
         
         if direction == "next":
             if current_page >= total_pages:
+                if session.get('_truncated'):
+                    return "❌ 当前使用的人太多，后面的结果已释放，请重新搜索"
                 return f"❌ 已经是最后一页了（共 {total_pages} 页）"
             current_page += 1
         else:  # prev
@@ -762,40 +1403,66 @@ class MyPlugin(Star):
             current_page -= 1
         
         session['current_page'] = current_page
-        session['timestamp'] = datetime.now()
+        if current_page > session.get('max_viewed_page', 1):
+            # 第一次看到这一页，只在还没展示过的部分去掉失效链接；看过的页（包括合并结果后重新渲染的）序号不变
+            if self.liveness is not None and self._drop_dead_links(session, current_page):
+                # 结果变少后总页数可能变少，这一页之后的链接全部失效时停在新的最后一页
+                total_pages = max(1, (len(session['results']) + self.page_size - 1) // self.page_size)
+                current_page = session['current_page'] = min(current_page, total_pages)
+                # 结果列表被替换，重新估算会话大小
+                self.user_sessions.resize(user_id)
+            session['max_viewed_page'] = max(session.get('max_viewed_page', 1), current_page)
+        self.user_sessions.touch(user_id)
         
-        output, _ = self._format_results_page(results, current_page)
+        output = self._render_page(session, current_page, user_id)
+        self._prefetch_page(session, current_page)
         return output
     
     # 内部方法：处理选择
-    def _handle_select(self, selected_index: int, user_id: str) -> str:
-        self._cleanup_expired_sessions()
-        
-        if user_id not in self.user_sessions:
-            return "❌ 请先搜索资源"
+    async def _handle_select(self, selected_index: int, user_id: str) -> str:
+        _, output = await self._select(selected_index, user_id)
+        return output
+    
+    # 内部方法：转存选中的资源，返回 (结果 OUTCOME_*, 回复内容)；批量选择时 owner_ping 为 False，由汇总行统一提醒群主
+    async def _select(self, selected_index: int, user_id: str, owner_ping: bool = True) -> Tuple[str, str]:
+        session = self.user_sessions.get(user_id)
+        if session is None:
+            return OUTCOME_REJECTED, "❌ 请先搜索资源"
         
-        session = self.user_sessions[user_id]
         results = session['results']
         
         if selected_index < 1 or selected_index > len(results):
-            return f"❌ 序号无效，请输入 1-{len(results)} 之间的数字"
+            return OUTCOME_REJECTED, f"❌ 序号无效，请输入 1-{len(results)} 之间的数字"
         
         # 获取选中的资源
         selected_result = results[selected_index - 1]
-        url = selected_result.get("url", "")
-        password = selected_result.get("password", "")
-        note = selected_result.get("note", "")
-        cloud_type = selected_result.get("type", "")
+        url = selected_result.url
+        password = selected_result.password
+        note = selected_result.note
+        cloud_type = selected_result.type
         cloud_name = self.cloud_type_names.get(cloud_type, cloud_type)
         
         if not url:
-            return "❌ 该资源链接无效"
+            return OUTCOME_REJECTED, "❌ 该资源链接无效"
+        
+        # 已经展示过的链接之后才查出失效时不从列表中去掉（序号保持不变），选择时直接提示
+        if self.liveness is not None and self.liveness.verdict(url) == VERDICT_DEAD:
+            return OUTCOME_REJECTED, "❌ 该资源链接已失效，请选择其他序号"
         
         # 执行转存
         output = f"⏳ 正在转存第 {selected_index} 个资源...\n"
         output += f"📦 类型: {cloud_name}\n\n"
         
-        transfer_result = self._transfer_link(url, password)
+        if self.prefetch_enabled:
+            hit = self.prefetcher.claim((url, password))
+            if hit:
+                logger.info(f"[PanSearch] 命中预转存（{hit}）: {url[:50]}...")
+        
+        try:
+            transfer_result = await self._cached_transfer(url, password, record=selected_result)
+        except QueueFull:
+            logger.warning(f"[PanSearch] 转存队列已满，拒绝转存: {url[:50]}...")
+            return OUTCOME_REJECTED, "⏳ 当前转存的人太多了，请稍后再试"
         
         if transfer_result:
             share_url = transfer_result.get("share_url", "")
@@ -808,28 +1475,90 @@ class MyPlugin(Star):
                 output += f"🔑 提取码: {password}\n"
             output += f"📦 网盘: {cloud_name}\n"
             
-            # 更新会话时间戳，延长会话有效期
-            session['timestamp'] = datetime.now()
+            # 延长会话有效期
+            self.user_sessions.touch(user_id)
             
-            return output
+            return OUTCOME_SUCCESS, output
         else:
+            self.metrics.inc("transfer_failures_total")
             error_message = "❌ 转存失败，请稍后重试\n\n❌ 转存失败，请更换链接"
-            if self.group_owner_id:
+            if self.group_owner_id and owner_ping:
                 error_message += f"\n\n@{self.group_owner_id} 群主，有人转存失败了！"
-            return error_message
+            return OUTCOME_FAILED, error_message
+    
+    # 内部方法：序号都在用户看过的页内，且数量不超过 batch_max_items
+    def _is_shown_selection(self, ranges: List[Tuple[int, int]], user_id: str) -> bool:
+        session = self.user_sessions.get(user_id)
+        if session is None:
+            return False
+        shown = min(len(session['results']), session.get('max_viewed_page', 1) * self.page_size)
+        count = sum(end - start + 1 for start, end in ranges)
+        return count <= self.batch_max_items and all(start >= 1 and end <= shown for start, end in ranges)
+    
+    # 内部方法：把批量选择的区间展开成序号列表（去重、保持顺序），超出数量上限时返回提示
+    def _expand_selection(self, ranges: List[Tuple[int, int]]) -> Union[List[int], str]:
+        indexes: Dict[int, None] = {}
+        for start, end in ranges:
+            # 逐个展开，超出上限立即停止，1-100000 这样的超大区间也不会真的展开
+            for index in range(start, end + 1):
+                indexes[index] = None
+                if len(indexes) > self.batch_max_items:
+                    return f"❌ 一次最多选择 {self.batch_max_items} 个资源"
+        return list(indexes)
+    
+    # 内部方法：并发转存多个序号，按完成顺序逐个产出 (序号, 结果 OUTCOME_*, 回复内容)
+    async def _iter_batch_select(self, indexes: List[int], user_id: str):
+        async def select_one(index: int) -> Tuple[int, str, str]:
+            async with self.batch_limiter.slot(user_id):
+                try:
+                    outcome, output = await self._select(index, user_id, owner_ping=False)
+                except Exception as e:
+                    logger.error(f"[PanSearch] 批量转存第 {index} 个资源异常: {str(e)}")
+                    outcome, output = OUTCOME_FAILED, "❌ 转存失败，请稍后重试"
+            return index, outcome, output
+        
+        tasks = [asyncio.create_task(select_one(index)) for index in indexes]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # 回复中途被取消时不再继续转存
+            for task in tasks:
+                task.cancel()
+    
+    # 内部方法：批量选择的汇总行，失败的序号逐个列出；有转存失败时在这里提醒一次群主，而不是每个失败的序号各提醒一次
+    def _format_batch_summary(self, results: List[Tuple[int, str, str]], total: int) -> str:
+        succeeded = sum(1 for _, outcome, _ in results if outcome == OUTCOME_SUCCESS)
+        failed = sorted(index for index, outcome, _ in results if outcome != OUTCOME_SUCCESS)
+        summary = f"📦 批量转存完成：成功 {succeeded} 个，失败 {len(failed)} 个（共 {total} 个）"
+        if failed:
+            summary += f"\n❌ 失败的序号：{'、'.join(str(index) for index in failed)}"
+        # 只有真正发出的转存请求失败才提醒群主，序号无效、链接已失效等用户自己可以处理
+        if self.group_owner_id and any(outcome == OUTCOME_FAILED for _, outcome, _ in results):
+            summary += f"\n\n@{self.group_owner_id} 群主，有人转存失败了！"
+        return summary
+    
+    # 内部方法：批量选择的合并回复，按序号排列
+    def _format_batch(self, results: List[Tuple[int, str, str]], total: int) -> str:
+        parts = [f"【{index}】{output.rstrip()}" for index, _, output in results]
+        parts.append(self._format_batch_summary(results, total))
+        return "\n------------------------\n".join(parts)
     
     # 内部方法：处理转存指令
-    def _handle_transfer(self, message_str: str, user_id: str) -> str:
+    async def _handle_transfer(self, message_str: str, user_id: str) -> str:
+        if not message_str.isdigit() and SELECTION_RE.fullmatch(message_str):
+            return await self._handle_batch_transfer(message_str, user_id)
         try:
             selected_index = int(message_str)
             # 记录开始时间
             start_time = datetime.now()
             
-            result = self._handle_select(selected_index, user_id)
+            result = await self._handle_select(selected_index, user_id)
             
             # 计算耗时
             end_time = datetime.now()
             elapsed_time = (end_time - start_time).total_seconds()
+            self.metrics.observe("command_seconds", elapsed_time, command="transfer")
             
             # 添加耗时信息
             result += f"\n⏱️  本次操作耗时：{elapsed_time:.2f}秒"
@@ -837,3 +1566,17 @@ class MyPlugin(Star):
             return result
         except ValueError:
             return "❌ 请输入有效的数字序号"
+    
+    # 内部方法：处理批量转存指令，全部完成后合并回复
+    async def _handle_batch_transfer(self, message_str: str, user_id: str) -> str:
+        if user_id not in self.user_sessions:
+            return "❌ 请先搜索资源"
+        indexes = self._expand_selection(parse_selection(message_str))
+        if isinstance(indexes, str):
+            return indexes
+        start_time = datetime.now()
+        results = [item async for item in self._iter_batch_select(indexes, user_id)]
+        elapsed_time = (datetime.now() - start_time).total_seconds()
+        self.metrics.observe("command_seconds", elapsed_time, command="transfer")
+        output = self._format_batch(sorted(results, key=lambda item: item[0]), len(indexes))
+        return output + f"\n⏱️  本次操作耗时：{elapsed_time:.2f}秒"
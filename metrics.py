@@ -0,0 +1,212 @@
+import asyncio
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+from astrbot.api import logger
+
+# 默认的延迟分桶（秒），覆盖本地处理的毫秒级到上游超时的 30 秒
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def total(self) -> float:
+        return sum(self.values.values())
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram:
+    """固定分桶的直方图，分位数按桶内线性插值估算"""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.series: Dict[LabelKey, _HistogramSeries] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        series = self.series.get(key)
+        if series is None:
+            # 最后一个位置是 +Inf 桶
+            series = self.series[key] = _HistogramSeries(len(self.buckets) + 1)
+        series.counts[bisect_left(self.buckets, value)] += 1
+        series.count += 1
+        series.sum += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def quantile(self, q: float, key: LabelKey = ()) -> Optional[float]:
+        series = self.series.get(key)
+        if series is None or not series.count:
+            return None
+        rank = q * series.count
+        seen = 0
+        for index, count in enumerate(series.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """插件内的指标注册表：计数器、直方图，以及在读取时才计算的回调型指标（队列深度、会话数等）。
+
+    可以通过管理员指令查看摘要，也可以按 Prometheus 文本格式从本地 HTTP 端点读取或定期写入文件。
+    """
+
+    def __init__(self, prefix: str = "pansou"):
+        self.prefix = prefix
+        self.counters: Dict[str, Counter] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        # name -> (类型, 说明, 回调)，回调返回 [(标签, 值), ...]
+        self.callbacks: Dict[str, Tuple[str, str, Callable[[], List[Tuple[Dict[str, str], float]]]]] = {}
+        self.started_at = time.time()
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        if name not in self.counters:
+            self.counters[name] = Counter(f"{self.prefix}_{name}", help_text)
+        return self.counters[name]
+
+    def histogram(self, name: str, help_text: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        if name not in self.histograms:
+            self.histograms[name] = Histogram(f"{self.prefix}_{name}", help_text, buckets)
+        return self.histograms[name]
+
+    def register_callback(self, name: str, kind: str, help_text: str,
+                          fn: Callable[[], List[Tuple[Dict[str, str], float]]]):
+        """kind 为 gauge 或 counter（读取已有模块里单调递增的统计值）"""
+        self.callbacks[name] = (kind, help_text, fn)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        self.counter(name).inc(amount, **labels)
+
+    def observe(self, name: str, value: float, **labels):
+        self.histogram(name).observe(value, **labels)
+
+    def time(self, name: str, **labels):
+        return self.histogram(name).time(**labels)
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for counter in self.counters.values():
+            lines.append(f"# HELP {counter.name} {counter.help}")
+            lines.append(f"# TYPE {counter.name} counter")
+            for key, value in counter.values.items():
+                lines.append(f"{counter.name}{_format_labels(key)} {value:g}")
+        for histogram in self.histograms.values():
+            lines.append(f"# HELP {histogram.name} {histogram.help}")
+            lines.append(f"# TYPE {histogram.name} histogram")
+            for key, series in histogram.series.items():
+                cumulative = 0
+                for bound, count in zip((*histogram.buckets, "+Inf"), series.counts):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    lines.append(f"{histogram.name}_bucket{_format_labels(key, le)} {cumulative}")
+                lines.append(f"{histogram.name}_sum{_format_labels(key)} {series.sum:.6f}")
+                lines.append(f"{histogram.name}_count{_format_labels(key)} {series.count}")
+        for name, (kind, help_text, fn) in self.callbacks.items():
+            full_name = f"{self.prefix}_{name}"
+            try:
+                samples = fn()
+            except Exception as e:
+                logger.error(f"[PanSearch] 读取指标 {full_name} 失败: {str(e)}")
+                continue
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{full_name}{_format_labels(_label_key(labels))} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """管理员指令使用的简要文本：每个直方图的次数和 p50/p99，以及计数器"""
+        lines = [f"📊 运行指标（已运行 {(time.time() - self.started_at) / 3600:.1f} 小时）"]
+        for name, histogram in self.histograms.items():
+            for key, series in sorted(histogram.series.items()):
+                label = ",".join(value for _, value in key)
+                p50 = histogram.quantile(0.5, key) * 1000
+                p99 = histogram.quantile(0.99, key) * 1000
+                lines.append(f"{name}{f'[{label}]' if label else ''}: {series.count} 次, "
+                             f"p50 {p50:.1f}ms, p99 {p99:.1f}ms")
+        for name, counter in self.counters.items():
+            if len(counter.values) <= 1:
+                lines.append(f"{name}: {counter.total():g}")
+            else:
+                detail = ", ".join(f"{','.join(v for _, v in key)} {value:g}" for key, value in sorted(counter.values.items()))
+                lines.append(f"{name}: {counter.total():g}（{detail}）")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _write(path: str, text: str):
+        # 先写临时文件再替换，读取方（node_exporter textfile 等）不会读到写了一半的文件
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    async def dump(self, path: str):
+        # 在事件循环里生成文本，只把文件写入放到线程中，避免遍历时指标被修改
+        await asyncio.to_thread(self._write, path, self.render_prometheus())
+
+    async def run_dumper(self, path: str, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.dump(path)
+            except Exception as e:
+                logger.error(f"[PanSearch] 写入指标文件失败: {str(e)}")
+
+    async def start_http(self, host: str, port: int) -> web.AppRunner:
+        """启动只提供 GET /metrics 的本地 HTTP 端点"""
+        async def handle(request: web.Request) -> web.Response:
+            return web.Response(text=self.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        logger.info(f"[PanSearch] 指标端点已启动: http://{host}:{port}/metrics")
+        return runner
@@ -0,0 +1,153 @@
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .records import LinkRecord
+
+# pansou 及其镜像已知的几种响应结构
+SHAPE_MERGED = "merged_by_type"   # {"merged_by_type": {"quark": [...], ...}}
+SHAPE_LINKS = "links"             # {"links": [...]} 或 data 直接是链接列表
+SHAPE_TYPE_KEYS = "type_keys"     # {"quark": [...], "baidu": [...]}
+SHAPE_GENERIC = "generic"         # 其他任意包含字典列表的字段
+SHAPE_EMPTY = "empty"
+
+LinksByType = Dict[str, List[LinkRecord]]
+
+
+class ResponseNormalizer:
+    """把 pansou 的各种响应结构一次性转换为 {网盘类型: [LinkRecord, ...]}。
+
+    - 先剥掉 {"code", "data"} 外层，再识别结构；识别结果按后端缓存，
+      同一个后端之后的响应直接按已知结构提取，结构变化（提取不到链接）时才重新识别
+    - 每种结构只遍历一次原始列表，每种网盘类型取满 max_per_type 条即停止，不做中间复制
+    """
+
+    def __init__(self, cloud_types: Iterable[str], max_per_type: int = 100):
+        self.cloud_types = tuple(cloud_types)
+        self.max_per_type = max_per_type
+        self._shapes: Dict[str, str] = {}
+        self.detections = 0
+
+    def shape_of(self, backend: str) -> Optional[str]:
+        return self._shapes.get(backend)
+
+    @staticmethod
+    def unwrap(response: Any) -> Any:
+        """去掉 {"code": 0, "data": ...} 外层，data 为空时返回原响应"""
+        if isinstance(response, dict) and response.get("data"):
+            return response["data"]
+        return response
+
+    def normalize(self, response: Any, src: str = "all", backend: str = "") -> Tuple[LinksByType, str]:
+        """返回 (按网盘类型分组的链接, 识别出的结构)"""
+        body = self.unwrap(response)
+        cached_shape = self._shapes.get(backend)
+        if cached_shape is not None:
+            links_by_type = self._extract(cached_shape, body, src)
+            if links_by_type:
+                return links_by_type, cached_shape
+
+        shape = self.detect(body)
+        self.detections += 1
+        links_by_type = self._extract(shape, body, src)
+        if links_by_type:
+            self._shapes[backend] = shape
+        return links_by_type, shape
+
+    def detect(self, body: Any) -> str:
+        if isinstance(body, list):
+            return SHAPE_LINKS if body and isinstance(body[0], dict) else SHAPE_EMPTY
+        if not isinstance(body, dict):
+            return SHAPE_EMPTY
+        if isinstance(body.get("merged_by_type"), dict) and body["merged_by_type"]:
+            return SHAPE_MERGED
+        if isinstance(body.get("links"), list) and body["links"]:
+            return SHAPE_LINKS
+        if any(isinstance(body.get(cloud_type), list) for cloud_type in self.cloud_types):
+            return SHAPE_TYPE_KEYS
+        return SHAPE_GENERIC
+
+    def _extract(self, shape: str, body: Any, src: str) -> LinksByType:
+        if shape == SHAPE_MERGED:
+            return self._from_type_map(body.get("merged_by_type") if isinstance(body, dict) else None)
+        if shape == SHAPE_TYPE_KEYS:
+            return self._from_type_map(body)
+        if shape == SHAPE_LINKS:
+            links = body if isinstance(body, list) else body.get("links") if isinstance(body, dict) else None
+            return self._from_flat_list(links, self._default_type(body, src))
+        if shape == SHAPE_GENERIC:
+            return self._from_any_list(body, src)
+        return {}
+
+    def _default_type(self, body: Any, src: str) -> str:
+        """扁平链接列表没有类型字段时，使用响应里的 src 或本次搜索的网盘类型"""
+        if isinstance(body, dict) and body.get("src") in self.cloud_types:
+            return body["src"]
+        return src
+
+    def _from_type_map(self, type_map: Any) -> LinksByType:
+        if not isinstance(type_map, dict):
+            return {}
+        links_by_type = {}
+        for cloud_type in self.cloud_types:
+            links = type_map.get(cloud_type)
+            if not isinstance(links, list):
+                continue
+            records = [
+                LinkRecord(link.get("url", ""), link.get("password", ""), link.get("note", ""),
+                           cloud_type, link.get("source", ""), link.get("datetime") or "")
+                for link in islice(links, self.max_per_type)
+            ]
+            if records:
+                links_by_type[cloud_type] = records
+        return links_by_type
+
+    def _from_flat_list(self, links: Any, default_type: str) -> LinksByType:
+        if not isinstance(links, list):
+            return {}
+        links_by_type: LinksByType = {}
+        full = 0
+        for link in links:
+            if not isinstance(link, dict):
+                continue
+            cloud_type = link.get("type") or default_type
+            if cloud_type not in self.cloud_types:
+                continue
+            bucket = links_by_type.setdefault(cloud_type, [])
+            if len(bucket) >= self.max_per_type:
+                continue
+            bucket.append(LinkRecord(link.get("url", ""), link.get("password", ""), link.get("note", ""),
+                                     cloud_type, link.get("source", ""), link.get("datetime") or ""))
+            if len(bucket) == self.max_per_type:
+                full += 1
+                if full == len(self.cloud_types):
+                    break
+        return links_by_type
+
+    def _from_any_list(self, body: Any, src: str) -> LinksByType:
+        """兜底：从任意一个字典列表字段中提取带 url/link 的条目，字段名或 src 决定网盘类型"""
+        if not isinstance(body, dict):
+            return {}
+        links_by_type: LinksByType = {}
+        for key, value in body.items():
+            if not isinstance(value, list) or not value or not isinstance(value[0], dict):
+                continue
+            key_lower = str(key).lower()
+            cloud_type = next((t for t in self.cloud_types if t in key_lower), None) or self._default_type(body, src)
+            if cloud_type not in self.cloud_types:
+                continue
+            bucket = links_by_type.setdefault(cloud_type, [])
+            for link in value:
+                if len(bucket) >= self.max_per_type:
+                    break
+                if isinstance(link, dict) and ("url" in link or "link" in link):
+                    bucket.append(LinkRecord(
+                        link.get("url", link.get("link", "")),
+                        link.get("password", link.get("pwd", "")),
+                        link.get("note", link.get("title", "")),
+                        cloud_type,
+                        link.get("source", ""),
+                        link.get("datetime") or "",
+                    ))
+            if not bucket:
+                del links_by_type[cloud_type]
+        return links_by_type
@@ -0,0 +1,153 @@
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set
+
+from astrbot.api import logger
+
+STATE_INFLIGHT = "inflight"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+
+
+class _Entry:
+    __slots__ = ("started_at", "state", "claimed")
+
+    def __init__(self, started_at: float):
+        self.started_at = started_at
+        self.state = STATE_INFLIGHT
+        self.claimed = False
+
+
+class Prefetcher:
+    """在用户选择之前，后台预先转存当前页排在最前面的几条结果。
+
+    - 同时进行的预转存不超过 concurrency 个，每天最多 daily_budget 次，超出的直接跳过，不排队
+    - 用户选择时调用 claim() 统计命中：预转存已完成或仍在进行中都算命中（后者会合并到进行中的转存）
+    - 预转存成功但 claim_window 秒内没有被选择的记为浪费
+    """
+
+    def __init__(self, top_n: int = 2, concurrency: int = 2, daily_budget: int = 200,
+                 claim_window: float = 300, max_tracked: int = 2000):
+        self.top_n = top_n
+        self.concurrency = max(1, concurrency)
+        self.daily_budget = daily_budget
+        self.claim_window = claim_window
+        self.max_tracked = max_tracked
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+        self._day = date.today()
+        self.used_today = 0
+        self.started = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.selections = 0
+        self.hits = 0
+        self.inflight_hits = 0
+        self.wasted = 0
+        self.skipped_busy = 0
+        self.skipped_budget = 0
+
+    @property
+    def inflight(self) -> int:
+        return len(self._tasks)
+
+    def _budget_left(self) -> bool:
+        today = date.today()
+        if today != self._day:
+            self._day = today
+            self.used_today = 0
+        return self.daily_budget <= 0 or self.used_today < self.daily_budget
+
+    def schedule(self, keys: Iterable[Hashable], run: Callable[[Hashable], Awaitable[Any]],
+                 skip: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """为 keys 中的前 top_n 个启动后台预转存，skip(key) 为 True 的（已缓存、正在转存等）不算在内。返回启动的数量"""
+        self._expire()
+        launched = 0
+        for key in list(keys)[:self.top_n]:
+            if key in self._entries or (skip is not None and skip(key)):
+                continue
+            if len(self._tasks) >= self.concurrency:
+                self.skipped_busy += 1
+                continue
+            if not self._budget_left():
+                self.skipped_budget += 1
+                continue
+            self.used_today += 1
+            self.started += 1
+            entry = self._entries[key] = _Entry(time.monotonic())
+            if len(self._entries) > self.max_tracked:
+                self._drop(next(iter(self._entries)))
+            task = asyncio.create_task(self._run(key, entry, run))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            launched += 1
+        return launched
+
+    async def _run(self, key: Hashable, entry: _Entry, run: Callable[[Hashable], Awaitable[Any]]):
+        try:
+            result = await run(key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"[PanSearch] 预转存异常: {str(e)}")
+            result = None
+        if result:
+            entry.state = STATE_DONE
+            self.succeeded += 1
+        else:
+            entry.state = STATE_FAILED
+            self.failed += 1
+
+    def claim(self, key: Hashable) -> Optional[str]:
+        """用户选择了 key 对应的资源，返回命中的预转存状态，没有命中返回 None"""
+        self.selections += 1
+        entry = self._entries.get(key)
+        if entry is None or entry.claimed or entry.state == STATE_FAILED:
+            return None
+        entry.claimed = True
+        self.hits += 1
+        if entry.state == STATE_INFLIGHT:
+            self.inflight_hits += 1
+        return entry.state
+
+    def _drop(self, key: Hashable):
+        entry = self._entries.pop(key)
+        if entry.state == STATE_DONE and not entry.claimed:
+            self.wasted += 1
+
+    def _expire(self):
+        deadline = time.monotonic() - self.claim_window
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.started_at > deadline or entry.state == STATE_INFLIGHT:
+                break
+            self._drop(key)
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        self._expire()
+        # 还在观察期内、尚未被选择的成功预转存
+        pending = sum(1 for entry in self._entries.values() if entry.state == STATE_DONE and not entry.claimed)
+        return {
+            "inflight": self.inflight,
+            "started": self.started,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "used_today": self.used_today,
+            "daily_budget": self.daily_budget,
+            "selections": self.selections,
+            "hits": self.hits,
+            "inflight_hits": self.inflight_hits,
+            "hit_rate": self.hits / self.selections if self.selections else 0.0,
+            "wasted": self.wasted,
+            "unclaimed": pending,
+            "skipped_busy": self.skipped_busy,
+            "skipped_budget": self.skipped_budget,
+        }
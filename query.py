@@ -0,0 +1,127 @@
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+
+from astrbot.api import logger
+
+# 默认的后缀规则：季数、集数、画质、片源类型等不影响搜索结果的尾巴，按顺序反复匹配关键词末尾
+DEFAULT_STRIP_PATTERNS = [
+    r"第[0-9一二三四五六七八九十百零〇两]+[季部集期话篇章]",
+    # 季数集数只认明确的写法：s01e02、s2、season 2、ep3、episode 3，以及单独成词的 e3；
+    # 字母和数字之间有空格时不算（WALL-E 2、Ocean's 11 去掉标点后是 wall e 2、ocean s 11）
+    r"(?<![a-z0-9])s\d+(?:\s*ep?\d+)?",
+    r"(?<![a-z0-9])(?:season|episode|ep)\s*\d+",
+    r"(?<![a-z0-9])e\d+",
+    r"\d{1,4}[集话]",
+    r"全\d*集|全集|完整版|完结|高清|蓝光|超清|4k|1080p|720p|国语|粤语|中字|电视剧|连续剧|动漫|动画|电影",
+]
+
+# 常见繁体字到简体字的对照，覆盖片名中常用的字；没有收录的字保持原样
+TRADITIONAL = (
+    "萬與專業東絲兩嚴喪個豐臨為麗舉義樂習鄉書買亂爭於雲亞產親億僅從們價眾優會偉傳傷倫體餘俠侶偵側債傾兒黨蘭關興養獸內軍農決況"
+    "淨涼減幾鳳憑凱擊劃劉則剛創別劍劇勸辦務動勵勞勢區醫華協單賣衛廠廳歷厲壓參雙發變葉號嚇呂嗎聽啟吳員響喚團園圍國圖圓聖場壞塊"
+    "堅墳壘夢夥奪奮婦媽孫學寶實寵審對將屍層島嶺師帶歸廣強彈後徑復徵恆惡愛態憂憶戀戰戲護報擔據擁擇攜數斷時晉樓標權機歡歲氣漢潛"
+    "濤灣滅燈爐爺犧獨獄現環畫當療盡監確禮禪種稱穩筆節範糧紀約紅紋納純紙級紛細終組結絕給統經綠網緣線練縱總繼續罷聲聯職艱藝蘇處"
+    "蟲蠻術衝補製複見規視覺觀記許設訪證評詩試話誠語說誰課調談請諸講謝譯讀貓貝負財貢貧貨質賭贏趕車軌輪轉輕載較輝邊遠還這進過運"
+    "達遲選遺鄭醜釋針銀鋼錄錢鐵長門開間閃陣陰陽際隊隨險隱難雞離電靈頂項順須頭題顏願風飛飯館馬駕驚驗髮鬥鬧魚鳥鶴麥黃齊齒龍龜慶"
+    "獵滿戶陳張楊趙錦繡傑燒殺誅滄蒼瀾鎮夠麼狀寬極飄嶼塵獅貞"
+)
+SIMPLIFIED = (
+    "万与专业东丝两严丧个丰临为丽举义乐习乡书买乱争于云亚产亲亿仅从们价众优会伟传伤伦体余侠侣侦侧债倾儿党兰关兴养兽内军农决况"
+    "净凉减几凤凭凯击划刘则刚创别剑剧劝办务动励劳势区医华协单卖卫厂厅历厉压参双发变叶号吓吕吗听启吴员响唤团园围国图圆圣场坏块"
+    "坚坟垒梦伙夺奋妇妈孙学宝实宠审对将尸层岛岭师带归广强弹后径复征恒恶爱态忧忆恋战戏护报担据拥择携数断时晋楼标权机欢岁气汉潜"
+    "涛湾灭灯炉爷牺独狱现环画当疗尽监确礼禅种称稳笔节范粮纪约红纹纳纯纸级纷细终组结绝给统经绿网缘线练纵总继续罢声联职艰艺苏处"
+    "虫蛮术冲补制复见规视觉观记许设访证评诗试话诚语说谁课调谈请诸讲谢译读猫贝负财贡贫货质赌赢赶车轨轮转轻载较辉边远还这进过运"
+    "达迟选遗郑丑释针银钢录钱铁长门开间闪阵阴阳际队随险隐难鸡离电灵顶项顺须头题颜愿风飞饭馆马驾惊验发斗闹鱼鸟鹤麦黄齐齿龙龟庆"
+    "猎满户陈张杨赵锦绣杰烧杀诛沧苍澜镇够么状宽极飘屿尘狮贞"
+)
+
+_FOLD_TABLE = str.maketrans(TRADITIONAL, SIMPLIFIED)
+# 括号中通常是演员、年份等补充说明，整段去掉；书名号等只去掉符号本身
+_ASIDE_RE = re.compile(r"[(（\[【][^)）\]】]*[)）\]】]")
+_CJK_GAP_RE = re.compile(r"(?<=[一-鿿])\s+(?=[一-鿿])")
+
+
+def fold_text(text: str) -> str:
+    """用于子串匹配的折叠形式：全角转半角、繁体转简体、转小写，去掉标点、符号和空白"""
+    text = unicodedata.normalize("NFKC", text).translate(_FOLD_TABLE).lower()
+    return "".join(char for char in text if not char.isspace() and unicodedata.category(char)[0] not in "PS")
+
+
+class QueryNormalizer:
+    """搜索关键词规范化：全角转半角、繁体转简体、去掉标点和括号注释、去掉季数集数等后缀。
+
+    规范化后的关键词同时作为搜索缓存键和发给上游的关键词，同一部剧的不同写法只搜索一次。
+    normalize() 会记录每个规范化关键词对应的原始写法，用于统计有多少写法被合并。
+    """
+
+    def __init__(self, strip_patterns: Optional[Iterable[str]] = None, max_tracked: int = 1000,
+                 max_variants: int = 20):
+        patterns = []
+        for pattern in DEFAULT_STRIP_PATTERNS if strip_patterns is None else strip_patterns:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                logger.error(f"[PanSearch] 忽略无效的关键词后缀规则 {pattern}: {str(e)}")
+                continue
+            patterns.append(pattern)
+        self._suffix_re = (re.compile(r"\s*(?:" + "|".join(f"(?:{p})" for p in patterns) + r")$")
+                           if patterns else None)
+        self.max_tracked = max_tracked
+        self.max_variants = max_variants
+        # 规范化关键词 -> 见过的原始写法，按最近使用排序
+        self._variants: "OrderedDict[str, Set[str]]" = OrderedDict()
+        self.queries = 0
+        self.rewritten = 0
+
+    def canonical(self, keyword: str) -> str:
+        """只做转换不计数；规则把关键词删空时退回到只做大小写和空白处理的结果"""
+        fallback = " ".join(keyword.split()).lower()
+        text = unicodedata.normalize("NFKC", keyword).translate(_FOLD_TABLE).lower()
+        if _ASIDE_RE.sub("", text).strip():
+            text = _ASIDE_RE.sub(" ", text)
+        text = "".join(" " if unicodedata.category(char)[0] in "PS" else char for char in text)
+        text = _CJK_GAP_RE.sub("", " ".join(text.split()))
+        if self._suffix_re is not None:
+            while True:
+                stripped = self._suffix_re.sub("", text)
+                if stripped == text or not stripped:
+                    break
+                text = stripped
+        return text or fallback
+
+    def normalize(self, keyword: str) -> str:
+        result = self.canonical(keyword)
+        self.queries += 1
+        raw = keyword.strip()
+        if result != raw:
+            self.rewritten += 1
+        variants = self._variants.get(result)
+        if variants is None:
+            variants = self._variants[result] = set()
+            if len(self._variants) > self.max_tracked:
+                self._variants.popitem(last=False)
+        else:
+            self._variants.move_to_end(result)
+        if len(variants) < self.max_variants:
+            variants.add(raw)
+        return result
+
+    @property
+    def collapsed(self) -> int:
+        """被合并到其他写法上的原始写法数量（每个规范化关键词的写法数减一之和）"""
+        return sum(len(variants) - 1 for variants in self._variants.values())
+
+    def top(self, limit: int = 10) -> List[Dict]:
+        ranked = sorted(self._variants.items(), key=lambda item: len(item[1]), reverse=True)
+        return [{"keyword": keyword, "variants": sorted(variants)}
+                for keyword, variants in ranked[:limit] if len(variants) > 1]
+
+    def stats(self) -> Dict:
+        return {
+            "queries": self.queries,
+            "rewritten": self.rewritten,
+            "tracked": len(self._variants),
+            "collapsed": self.collapsed,
+        }
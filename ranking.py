@@ -0,0 +1,178 @@
+import heapq
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .link_index import text_grams
+from .query import fold_text
+from .records import LinkRecord, parse_timestamp
+
+KIND_SOURCE = "source"
+KIND_TYPE = "type"
+
+
+class ReliabilityTracker:
+    """按来源和网盘类型统计转存成功率（只统计实际发出的转存请求），作为排序时的可靠性先验。
+
+    每个键保存按时间衰减的成功、失败次数（半衰期 half_life 秒），估计值为
+    (成功 + 先验成功率 × 先验强度) / (成功 + 失败 + 先验强度)，没有记录的键等于先验成功率。
+    配置了 backend 时每次更新都写入后端，启动时一次性读回。
+    """
+
+    def __init__(self, prior: float = 0.8, strength: float = 5.0, half_life: float = 7 * 86400,
+                 max_keys: int = 2000, backend: Any = None, namespace: str = "reliability"):
+        self.prior = prior
+        self.strength = strength
+        self.half_life = half_life
+        self.max_keys = max_keys
+        self.backend = backend
+        self.namespace = namespace
+        # (类型, 名称) -> [成功次数, 失败次数, 更新时间]
+        self._stats: Dict[Tuple[str, str], List[float]] = {}
+        self.recorded = 0
+        if backend is not None:
+            for key in backend.keys(namespace):
+                found = backend.get(namespace, key)
+                if found is not None:
+                    self._stats[tuple(key)] = list(found[0])
+
+    def _decayed(self, entry: List[float], now: float) -> Tuple[float, float]:
+        factor = 0.5 ** (max(0.0, now - entry[2]) / self.half_life)
+        return entry[0] * factor, entry[1] * factor
+
+    def estimate(self, kind: str, name: str, now: Optional[float] = None) -> float:
+        entry = self._stats.get((kind, name))
+        if entry is None:
+            return self.prior
+        success, failure = self._decayed(entry, now or time.time())
+        return (success + self.prior * self.strength) / (success + failure + self.strength)
+
+    def reliability(self, record: LinkRecord, now: float) -> float:
+        """来源和网盘类型两个估计值的平均"""
+        return (self.estimate(KIND_SOURCE, record.source, now) + self.estimate(KIND_TYPE, record.type, now)) / 2
+
+    def record(self, record: LinkRecord, success: bool):
+        now = time.time()
+        for key in ((KIND_SOURCE, record.source), (KIND_TYPE, record.type)):
+            entry = self._stats.get(key)
+            if entry is None and len(self._stats) >= self.max_keys:
+                # 来源数量异常多时淘汰最久没有更新的键
+                oldest = min(self._stats, key=lambda k: self._stats[k][2])
+                del self._stats[oldest]
+                if self.backend is not None:
+                    self.backend.delete(self.namespace, oldest)
+            success_count, failure_count = self._decayed(entry, now) if entry is not None else (0.0, 0.0)
+            entry = self._stats[key] = [success_count + success, failure_count + (not success), now]
+            if self.backend is not None:
+                # 衰减到可以忽略（1/256）之前一直保留
+                self.backend.set(self.namespace, key, entry, self.half_life * 8)
+        self.recorded += 1
+
+    def table(self, kind: str) -> List[Tuple[str, float, float, float]]:
+        """返回某一类键的 (名称, 估计成功率, 衰减后成功次数, 衰减后失败次数)，按估计值从低到高排列"""
+        now = time.time()
+        rows = []
+        for (entry_kind, name), entry in self._stats.items():
+            if entry_kind == kind:
+                success, failure = self._decayed(entry, now)
+                rows.append((name, self.estimate(kind, name, now), success, failure))
+        rows.sort(key=lambda row: row[1])
+        return rows
+
+
+class Ranker:
+    """搜索结果排序：按标题与关键词的相似度、发布时间和来源可靠性给每条链接打分。
+
+    - 每种网盘用堆选出得分最高的 top_k 条放在最前面，其余保持上游顺序，不对整个列表排序
+    - 仍按轮次排列，每轮每种网盘各取 links_per_type 条，只按得分调整同一轮内网盘的先后，
+      前几页的网盘种类和原来一样多
+    标题只比较折叠后（见 query.fold_text）的前 note_max_chars 个字符；同一标题和发布时间在缓存命中的搜索中反复出现，
+    折叠和解析结果用 LRU 缓存保存。
+    """
+
+    def __init__(self, reliability: ReliabilityTracker, top_k: int = 16, similarity_weight: float = 0.6,
+                 freshness_weight: float = 0.15, reliability_weight: float = 0.25,
+                 freshness_half_life_days: float = 30, note_max_chars: int = 64, fold_cache_size: int = 8192):
+        self.reliability = reliability
+        self.top_k = max(1, top_k)
+        self.similarity_weight = similarity_weight
+        self.freshness_weight = freshness_weight
+        self.reliability_weight = reliability_weight
+        self.freshness_half_life = freshness_half_life_days * 86400
+        self.note_max_chars = note_max_chars
+        self._fold_note = lru_cache(maxsize=fold_cache_size)(lambda note: fold_text(note[:note_max_chars]))
+        self._parse_timestamp = lru_cache(maxsize=fold_cache_size)(parse_timestamp)
+        self.ranked = 0
+        self.rank_seconds = 0.0
+
+    def similarity(self, folded_keyword: str, keyword_grams: Set[str], note: str) -> float:
+        folded = self._fold_note(note)
+        if not folded_keyword or not folded:
+            return 0.0
+        if folded_keyword in folded:
+            # 完整包含关键词，标题里多余的内容越少越好
+            return 0.6 + 0.4 * len(folded_keyword) / len(folded)
+        return 0.6 * len(keyword_grams & text_grams(folded)) / len(keyword_grams)
+
+    def freshness(self, published: str, now: float) -> float:
+        # 发布时间在提取链接时不解析，只在排序时解析
+        timestamp = self._parse_timestamp(published)
+        if not timestamp:
+            # 没有发布时间的链接按中间值处理
+            return 0.5
+        return 0.5 ** (max(0.0, now - timestamp) / self.freshness_half_life)
+
+    def score(self, folded_keyword: str, keyword_grams: Set[str], record: LinkRecord, now: float,
+              reliability: Optional[float] = None) -> float:
+        if reliability is None:
+            reliability = self.reliability.reliability(record, now)
+        return (self.similarity_weight * self.similarity(folded_keyword, keyword_grams, record.note)
+                + self.freshness_weight * self.freshness(record.datetime, now)
+                + self.reliability_weight * reliability)
+
+    def arrange(self, keyword: str, links_by_type: Dict[str, List[LinkRecord]], cloud_types: Iterable[str],
+                links_per_type: int) -> List[LinkRecord]:
+        start = time.perf_counter()
+        now = time.time()
+        folded_keyword = fold_text(keyword)
+        keyword_grams = text_grams(folded_keyword)
+        # 每种网盘：得分最高的 top_k 条在前，其余保持原顺序；同时记下每条链接的得分
+        ordered: Dict[str, List[Tuple[float, LinkRecord]]] = {}
+        # 同一次排列中来源和网盘类型的可靠性不变，按 (来源, 类型) 只算一次
+        reliabilities: Dict[Tuple[str, str], float] = {}
+        for cloud_type in cloud_types:
+            links = links_by_type.get(cloud_type)
+            if not links:
+                continue
+            scored = []
+            for record in links:
+                key = (record.source, record.type)
+                reliability = reliabilities.get(key)
+                if reliability is None:
+                    reliability = reliabilities[key] = self.reliability.reliability(record, now)
+                scored.append((self.score(folded_keyword, keyword_grams, record, now, reliability), record))
+            top = heapq.nlargest(self.top_k, range(len(scored)), key=lambda i: scored[i][0])
+            chosen = set(top)
+            ordered[cloud_type] = [scored[i] for i in top] + [item for i, item in enumerate(scored) if i not in chosen]
+
+        links: List[LinkRecord] = []
+        max_links_per_type = max((len(items) for items in ordered.values()), default=0)
+        for start_idx in range(0, max_links_per_type, links_per_type):
+            groups = [items[start_idx:start_idx + links_per_type] for items in ordered.values()]
+            # 同一轮内得分高的网盘在前（排序是稳定的，得分相同时保持原来的网盘顺序）
+            groups.sort(key=lambda group: max((score for score, _ in group), default=-1.0), reverse=True)
+            for group in groups:
+                links.extend(record for _, record in group)
+        self.rank_seconds += time.perf_counter() - start
+        return links
+
+    def count(self):
+        """一次搜索的结果列表确定后调用一次；分网盘并发搜索中同一次搜索的多次排列，耗时合计为这一次"""
+        self.ranked += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ranked": self.ranked,
+            "avg_rank_ms": self.rank_seconds / self.ranked * 1000 if self.ranked else 0.0,
+            "recorded": self.reliability.recorded,
+        }
@@ -0,0 +1,109 @@
+import sys
+from datetime import datetime
+from typing import Any, Dict, List
+
+
+class LinkRecord:
+    """一条搜索结果链接。
+
+    使用 __slots__ 代替每条链接一个 dict，网盘类型和来源这类高度重复的字符串做驻留（intern），
+    所有会话共享同一个字符串对象。
+    """
+
+    __slots__ = ("url", "password", "note", "type", "source", "datetime", "_size")
+
+    def __init__(self, url: str, password: str = "", note: str = "", cloud_type: str = "", source: str = "",
+                 datetime: str = ""):
+        self.url = url
+        self.password = password
+        self.note = note
+        self.type = sys.intern(cloud_type)
+        self.source = sys.intern(source)
+        # 上游给出的发布时间原文，没有时为空字符串；只有排序时才用 parse_timestamp 解析，提取链接时不解析
+        self.datetime = datetime
+        # record_size() 第一次计算后记下，同一条链接被多个会话和搜索缓存共享时只算一次
+        self._size = 0
+
+    def __repr__(self) -> str:
+        return f"LinkRecord(type={self.type!r}, url={self.url!r}, note={self.note!r})"
+
+    def to_list(self) -> List[Any]:
+        """序列化为紧凑的列表，用于持久化存储；没有发布时间时省略最后一项，与旧数据格式相同"""
+        if self.datetime:
+            return [self.url, self.password, self.note, self.type, self.source, self.datetime]
+        return [self.url, self.password, self.note, self.type, self.source]
+
+    @classmethod
+    def from_list(cls, data: List[Any]) -> "LinkRecord":
+        return cls(*data)
+
+
+def parse_timestamp(value: str) -> float:
+    """把 pansou 返回的 RFC 3339 时间（如 2025-01-01T12:00:00Z）转换为 Unix 时间戳；
+    没有时区、无法解析，以及 Go 的零值时间（0001-01-01T00:00:00Z，表示没有发布时间）都返回 0"""
+    if not value:
+        return 0.0
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00", 1))
+    except ValueError:
+        return 0.0
+    if parsed.tzinfo is None:
+        return 0.0
+    return max(0.0, parsed.timestamp())
+
+
+# 一条链接对象本身（不含字符串内容）的大小，加上 record_size() 记下的整数
+RECORD_SIZE = sys.getsizeof(LinkRecord("")) + sys.getsizeof(1 << 20)
+# 四个字段都是 str，直接调用 str.__sizeof__ 比 sys.getsizeof 快（结果相同，str 不受 GC 跟踪）
+_str_size = str.__sizeof__
+
+
+def record_size(record: LinkRecord) -> int:
+    """一条链接的对象、链接、提取码、标题和发布时间占用的字节数；网盘类型和来源是驻留的共享字符串，不计入"""
+    size = record._size
+    if not size:
+        size = record._size = (RECORD_SIZE + _str_size(record.url) + _str_size(record.password)
+                               + _str_size(record.note) + _str_size(record.datetime))
+    return size
+
+
+def add_rendered_page(pages: Dict[int, str], page: int, text: str) -> int:
+    """把渲染好的一页加入会话的 _pages，返回估算字节数的增量（页面文本，加上字典扩容增加的部分）"""
+    before = sys.getsizeof(pages)
+    pages[page] = text
+    return sys.getsizeof(text) + sys.getsizeof(pages) - before
+
+
+def estimate_session_size(session: Dict[str, Any]) -> int:
+    """粗略估算会话占用的字节数：结果列表中每条链接（见 record_size），加上渲染好的页面文本。
+
+    链接对象可能同时被搜索缓存引用，这里仍按会话独占计算，结果偏大，不会低估。
+    会遍历整个结果列表，只在会话写入和结果列表被替换时调用；之后新渲染的页按 add_rendered_page 返回的增量累加。
+    """
+    results = session["results"]
+    size = sys.getsizeof(session) + sys.getsizeof(results) + sum(map(record_size, results))
+    pages = session.get("_pages")
+    if pages:
+        size += sys.getsizeof(pages) + sum(sys.getsizeof(text) for text in pages.values())
+    return size
+
+
+def encode_session(session: Dict[str, Any]) -> Dict[str, Any]:
+    """把会话转换为可 JSON 序列化的数据，以下划线开头的字段只在内存中使用，不保存"""
+    data = {key: value for key, value in session.items() if not key.startswith("_")}
+    data["results"] = [record.to_list() for record in session["results"]]
+    return data
+
+
+def decode_session(data: Dict[str, Any]) -> Dict[str, Any]:
+    session = dict(data)
+    session["results"] = [LinkRecord.from_list(item) for item in data["results"]]
+    return session
+
+
+def encode_links_by_type(links_by_type: Dict[str, List[LinkRecord]]) -> Dict[str, List[List[str]]]:
+    return {cloud_type: [record.to_list() for record in links] for cloud_type, links in links_by_type.items()}
+
+
+def decode_links_by_type(data: Dict[str, List[List[str]]]) -> Dict[str, List[LinkRecord]]:
+    return {cloud_type: [LinkRecord.from_list(item) for item in links] for cloud_type, links in data.items()}
@@ -0,0 +1,135 @@
+import re
+from typing import Any, List, Optional, Tuple
+
+from astrbot.api import logger
+
+ROUTE_JOIN = "join"       # 新成员入群，发送欢迎语
+ROUTE_AT = "at"           # 被@，发送使用说明
+ROUTE_SEARCH = "search"   # value 为 (关键词, 网盘类型)
+ROUTE_PAGE = "page"       # value 为 "next" / "prev"
+ROUTE_SELECT = "select"   # value 为序号
+ROUTE_BATCH = "batch"     # value 为 (序号区间列表 [(起, 止), ...], 是否带选择前缀)
+
+# 常见的群成员加入消息特征
+JOIN_KEYWORDS = ['加入了群聊', '加入群聊', '已加入', '新成员', 'welcome', 'Welcome']
+JOIN_TYPES = frozenset(['MemberJoin', 'MemberJoinEvent', '群成员加入', '入群'])
+AT_TYPES = frozenset(['At', 'at'])
+
+# 搜索前缀（搜XX、百度XX、夸克XX、UCXX、迅雷XX）对应的网盘类型
+SEARCH_PREFIXES = {"搜": "all", "百度": "baidu", "夸克": "quark", "UC": "uc", "迅雷": "xunlei"}
+NEXT_PAGE_WORDS = ["下一页", "下一頁", "next", "下页", "下頁"]
+PREV_PAGE_WORDS = ["上一页", "上一頁", "prev", "previous", "上页", "上頁"]
+# 选择命令（第X个、X、选择X、转存X、批量X）
+SELECT_PREFIXES = ["选择", "選擇", "转存", "批量"]
+# 批量选择（1-4、1~4、1到4、1 3 5、1,3,5、1、3、5，可以混用）
+RANGE_SEPARATOR = r"\s*(?:[-~～]|到|至)\s*"
+LIST_SEPARATOR = r"\s*[,，、\s]\s*"
+SELECTION_ITEM = rf"\d+(?:{RANGE_SEPARATOR}\d+)?"
+_selection_item_re = re.compile(rf"(\d+)(?:{RANGE_SEPARATOR}(\d+))?")
+# 完整的批量选择文本（单个序号也能匹配）
+SELECTION_RE = re.compile(rf"{SELECTION_ITEM}(?:{LIST_SEPARATOR}{SELECTION_ITEM})*")
+
+Route = Tuple[str, Any]
+
+
+def parse_selection(text: str) -> List[Tuple[int, int]]:
+    """把批量选择文本拆成序号区间，区间两端按从小到大排列；只做拆分，不展开，由调用方检查数量上限"""
+    ranges = []
+    for match in _selection_item_re.finditer(text):
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) is not None else start
+        ranges.append((min(start, end), max(start, end)))
+    return ranges
+
+
+def _alternation(words) -> str:
+    # 长的在前，避免短词抢先匹配
+    return "|".join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+
+
+class MessageRouter:
+    """handle_any_message 的消息分发，所有规则在初始化时编译一次。
+
+    - 入群关键词合并为一个正则，消息链只遍历一次，同时检查入群事件和@机器人
+    - 文本命令先看首字符，不可能是命令的普通聊天直接返回 None，
+      否则用一个合并后的正则一次匹配出搜索、翻页、选择或批量选择命令
+    """
+
+    def __init__(self):
+        self._join_re = re.compile(_alternation(JOIN_KEYWORDS))
+        self._command_re = re.compile(
+            rf"^(?:(?P<prefix>{_alternation(SEARCH_PREFIXES)})(?P<keyword>.+)"
+            rf"|(?P<next>{_alternation(NEXT_PAGE_WORDS)})"
+            rf"|(?P<prev>{_alternation(PREV_PAGE_WORDS)})"
+            rf"|第(?P<nth>\d+)[个個]"
+            rf"|(?P<batch_prefix>{_alternation(SELECT_PREFIXES)})?(?P<batch>{SELECTION_ITEM}(?:{LIST_SEPARATOR}{SELECTION_ITEM})+"
+            rf"|\d+{RANGE_SEPARATOR}\d+)"
+            rf"|(?:{_alternation(SELECT_PREFIXES)})?(?P<index>\d+))$"
+        )
+        leading = [word[0] for word in [*SEARCH_PREFIXES, *NEXT_PAGE_WORDS, *PREV_PAGE_WORDS, *SELECT_PREFIXES, "第"]]
+        self._leading = frozenset(leading)
+
+    def route(self, event) -> Optional[Route]:
+        """返回 (路由类型, 参数)，不需要处理的消息返回 None"""
+        message_str = event.message_str
+        if self._join_re.search(message_str):
+            return ROUTE_JOIN, None
+
+        is_at_me = False
+        try:
+            bot_id, bot_name = self._bot_identity(event)
+            for msg in event.get_messages() or ():
+                msg_type = getattr(msg, 'type', None)
+                if msg_type in JOIN_TYPES:
+                    return ROUTE_JOIN, None
+                content = getattr(msg, 'content', None)
+                if content is not None and self._join_re.search(content):
+                    return ROUTE_JOIN, None
+                if is_at_me or bot_id is None:
+                    continue
+                if msg_type in AT_TYPES:
+                    # 检查At的对象是否是机器人
+                    if any(str(getattr(msg, attr)) == bot_id for attr in ('target', 'qq') if hasattr(msg, attr)):
+                        is_at_me = True
+                        continue
+                # 检查消息内容中是否包含机器人名称
+                if content is not None and bot_name in content:
+                    is_at_me = True
+        except Exception as e:
+            logger.error(f"[PanSearch] 检查消息链异常: {str(e)}")
+        if is_at_me:
+            return ROUTE_AT, None
+
+        return self.route_text(message_str.strip())
+
+    def route_text(self, text: str) -> Optional[Route]:
+        if not text or (text[0] not in self._leading and not text[0].isdigit()):
+            return None
+        match = self._command_re.match(text)
+        if match is None:
+            return None
+        prefix = match.group("prefix")
+        if prefix is not None:
+            keyword = match.group("keyword").strip()
+            return (ROUTE_SEARCH, (keyword, SEARCH_PREFIXES[prefix])) if keyword else None
+        if match.group("next") is not None:
+            return ROUTE_PAGE, "next"
+        if match.group("prev") is not None:
+            return ROUTE_PAGE, "prev"
+        batch = match.group("batch")
+        if batch is not None:
+            # 不带前缀的批量选择可能是普通聊天，由调用方结合会话判断
+            return ROUTE_BATCH, (parse_selection(batch), match.group("batch_prefix") is not None)
+        return ROUTE_SELECT, int(match.group("nth") or match.group("index"))
+
+    @staticmethod
+    def _bot_identity(event) -> Tuple[Optional[str], str]:
+        """获取机器人自身的 ID 和昵称，获取失败时返回 (None, "")，不再检查@"""
+        try:
+            if hasattr(event, 'bot'):
+                bot = event.bot
+                return str(bot.get('user_id', '')), bot.get('nickname', '')
+            return '', ''
+        except Exception as e:
+            logger.error(f"[PanSearch] 检查@事件异常: {str(e)}")
+            return None, ''
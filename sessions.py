@@ -0,0 +1,213 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+
+class SessionStore:
+    """用户会话存储，过期和淘汰都是均摊 O(1)。
+
+    所有会话的有效期相同，因此按"最后访问时间"排序的 OrderedDict 同时也是按过期时间排序的队列：
+    每次访问把会话移到队尾，队首永远是最早过期的会话。
+    - 读取时只检查当前会话本身是否过期，不再扫描全部会话
+    - 后台任务定期从队首弹出已过期的会话，遇到第一个未过期的就停止
+    - 会话数超过 max_sessions 时直接淘汰队首（最久未访问）的会话
+    - 从后端加载的会话剩余有效期较短，按过期时间插入到队列中对应的位置，而不是队尾
+    - 配置了 max_bytes 时，写入会话时用 sizeof 估算一次字节数，之后会话内容变化由调用方通过 resize() 告知
+      （新增的字节数，或结果列表被替换时重新估算），刷新有效期不重新估算。总数超出后从队首开始：
+      还没截断过的会话先用 shrink 截断（例如只保留看过的页），已经截断过的直接淘汰，
+      每个会话最多截断一次、淘汰一次，均摊 O(1)；当前正在写入的会话不受影响
+
+    配置了 backend（见 storage.py）时，会话在创建和刷新时写入后端，内存中找不到时再从后端加载，
+    encode/decode 负责会话和可序列化数据之间的转换。
+    """
+
+    def __init__(self, timeout: float, max_sessions: int = 5000, backend: Any = None,
+                 namespace: str = "session", encode: Optional[Callable[[Dict], Any]] = None,
+                 decode: Optional[Callable[[Any], Dict]] = None, max_bytes: int = 0,
+                 sizeof: Optional[Callable[[Dict], int]] = None, shrink: Optional[Callable[[Dict], bool]] = None):
+        self.timeout = timeout
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof if max_bytes and sizeof is not None else (lambda session: 0)
+        self._shrink = shrink
+        self.backend = backend
+        self.namespace = namespace
+        self._encode = encode or (lambda session: session)
+        self._decode = decode or (lambda data: data)
+        # user_id -> [session, expires_at, 估算字节数, 是否已截断]
+        self._sessions: "OrderedDict[str, list]" = OrderedDict()
+        self.total_bytes = 0
+        self.expired = 0
+        self.evicted = 0
+        self.budget_evicted = 0
+        self.truncated = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, user_id: str) -> bool:
+        return self.get(user_id) is not None
+
+    def __getitem__(self, user_id: str) -> Dict[str, Any]:
+        session = self.get(user_id)
+        if session is None:
+            raise KeyError(user_id)
+        return session
+
+    def __setitem__(self, user_id: str, session: Dict[str, Any]):
+        self._insert(user_id, session, self.timeout)
+        self._persist(user_id, session)
+
+    def _remove(self, user_id: str) -> Optional[list]:
+        entry = self._sessions.pop(user_id, None)
+        if entry is not None:
+            self.total_bytes -= entry[2]
+        return entry
+
+    def _insert(self, user_id: str, session: Dict[str, Any], ttl: float):
+        self._remove(user_id)
+        size = self._sizeof(session)
+        expires_at = time.monotonic() + ttl
+        self._sessions[user_id] = [session, expires_at, size, False]
+        self.total_bytes += size
+        if ttl < self.timeout:
+            self._place(user_id, expires_at)
+        while len(self._sessions) > self.max_sessions:
+            evicted_user = next(iter(self._sessions))
+            self._remove(evicted_user)
+            self.evicted += 1
+            if self.backend is not None:
+                self.backend.delete(self.namespace, evicted_user)
+        self._enforce_budget(user_id)
+
+    def _place(self, user_id: str, expires_at: float):
+        """把刚插入队尾的会话前移到按过期时间排序的位置：过期时间更晚的会话依次移回队尾"""
+        later = []
+        for other_id in reversed(self._sessions):
+            if other_id == user_id:
+                continue
+            if self._sessions[other_id][1] <= expires_at:
+                break
+            later.append(other_id)
+        for other_id in reversed(later):
+            self._sessions.move_to_end(other_id)
+
+    def _resize(self, entry: list):
+        size = self._sizeof(entry[0])
+        self.total_bytes += size - entry[2]
+        entry[2] = size
+
+    def _enforce_budget(self, current_user: str):
+        """总字节数超出 max_bytes 时，从最久未访问的会话开始截断或淘汰，current_user 除外"""
+        while self.max_bytes and self.total_bytes > self.max_bytes:
+            victims = []
+            freed = 0
+            shrunk = False
+            for user_id, entry in self._sessions.items():
+                if self.total_bytes - freed <= self.max_bytes:
+                    break
+                if user_id == current_user:
+                    continue
+                if not entry[3] and self._shrink is not None:
+                    # 第一次轮到的会话先截断，本轮不淘汰
+                    entry[3] = shrunk = True
+                    if self._shrink(entry[0]):
+                        self._resize(entry)
+                        self.truncated += 1
+                    continue
+                victims.append(user_id)
+                freed += entry[2]
+            for user_id in victims:
+                self._remove(user_id)
+                self.budget_evicted += 1
+                if self.backend is not None:
+                    self.backend.delete(self.namespace, user_id)
+            if not victims and not shrunk:
+                # 只剩当前会话（单个会话就超出预算），不再处理
+                break
+
+    def _persist(self, user_id: str, session: Dict[str, Any]):
+        if self.backend is not None:
+            self.backend.set(self.namespace, user_id, self._encode(session), self.timeout)
+
+    def get(self, user_id: str, default: Any = None) -> Any:
+        entry = self._sessions.get(user_id)
+        if entry is not None and entry[1] <= time.monotonic():
+            self._remove(user_id)
+            self.expired += 1
+            entry = None
+        if entry is not None:
+            return entry[0]
+        if self.backend is None:
+            return default
+        # 内存中没有时从后端加载（其他进程创建的会话，或重启前的会话）
+        found = self.backend.get(self.namespace, user_id)
+        if found is None:
+            return default
+        data, expires_at = found
+        session = self._decode(data)
+        self._insert(user_id, session, expires_at - time.time())
+        return session
+
+    def touch(self, user_id: str) -> bool:
+        """刷新会话有效期，同时把会话的最新状态写入后端"""
+        session = self.get(user_id)
+        if session is None:
+            return False
+        entry = self._sessions[user_id]
+        entry[1] = time.monotonic() + self.timeout
+        self._sessions.move_to_end(user_id)
+        self._persist(user_id, session)
+        return True
+
+    def resize(self, user_id: str, delta: Optional[int] = None):
+        """会话内容变化后更新估算的字节数并检查预算：delta 为新增的字节数（例如新渲染的一页），
+        为 None 时重新估算整个会话（例如结果列表被替换）"""
+        if not self.max_bytes:
+            return
+        entry = self._sessions.get(user_id)
+        if entry is None:
+            return
+        if delta is None:
+            self._resize(entry)
+        else:
+            entry[2] += delta
+            self.total_bytes += delta
+        self._enforce_budget(user_id)
+
+    def pop(self, user_id: str, default: Any = None) -> Any:
+        entry = self._remove(user_id)
+        if self.backend is not None:
+            self.backend.delete(self.namespace, user_id)
+        return default if entry is None else entry[0]
+
+    def sweep(self) -> int:
+        """从队首清理已过期的会话，返回清理数量"""
+        now = time.monotonic()
+        count = 0
+        while self._sessions:
+            user_id, entry = next(iter(self._sessions.items()))
+            if entry[1] > now:
+                break
+            self._remove(user_id)
+            count += 1
+        self.expired += count
+        return count
+
+    async def run_sweeper(self, interval: float = 30):
+        while True:
+            await asyncio.sleep(interval)
+            self.sweep()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "live": len(self._sessions),
+            "max": self.max_sessions,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "budget_evicted": self.budget_evicted,
+            "truncated": self.truncated,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+        }
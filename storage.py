@@ -0,0 +1,264 @@
+import asyncio
+import json
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from astrbot.api import logger
+
+_MISSING = object()
+
+
+def encode_key(key: Hashable) -> str:
+    """把缓存键（字符串或元组）编码为存储用的字符串"""
+    if isinstance(key, str):
+        return key
+    return json.dumps(key, ensure_ascii=False, separators=(",", ":"))
+
+
+def decode_key(raw: str) -> Hashable:
+    if raw.startswith("["):
+        return tuple(json.loads(raw))
+    return raw
+
+
+class StorageBackend(ABC):
+    """会话、搜索缓存、转存缓存的二级存储接口。
+
+    内存中的 SessionStore / TTLCache 是一级存储；配置了后端时，写入会同步到后端，
+    内存未命中时再从后端读取。默认不配置后端，数据只保存在进程内存中。
+    所有数据按命名空间（namespace）区分，每条数据带绝对过期时间（Unix 时间戳）。
+    """
+
+    @abstractmethod
+    def get(self, namespace: str, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """返回 (值, 过期时间)，不存在或已过期时返回 None"""
+        ...
+
+    @abstractmethod
+    def set(self, namespace: str, key: Hashable, value: Any, ttl: float):
+        ...
+
+    @abstractmethod
+    def delete(self, namespace: str, key: Hashable):
+        ...
+
+    @abstractmethod
+    def keys(self, namespace: str) -> Iterator[Hashable]:
+        ...
+
+    @abstractmethod
+    def clear(self, namespace: str):
+        ...
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class SQLiteBackend(StorageBackend):
+    """本地 SQLite（WAL 模式）存储后端。
+
+    - 写入先进入内存缓冲区，后台任务每隔 flush_interval 秒批量提交一次，
+      同一个键在一个批次内多次写入只落盘最后一次
+    - 表上按过期时间建索引，定期批量删除过期数据
+    - WAL 模式下读写互不阻塞，同一台机器上的多个进程可以共享同一个数据库文件
+    - 读取是在事件循环中同步进行的，查不到的键记住 negative_ttl 秒，期间再查直接返回 None：
+      没有会话的用户每发一条纯数字消息都要查一次会话，不能每次都读数据库。
+      本进程写入时立即失效；其他进程写入的数据最多晚 negative_ttl 秒可见
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, batch_size: int = 500,
+                 purge_interval: float = 60.0, negative_ttl: float = 10.0, negative_max_entries: int = 10000):
+        self.path = str(path)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.purge_interval = purge_interval
+        self.negative_ttl = negative_ttl
+        self.negative_max_entries = negative_max_entries
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        # 读连接在事件循环线程中使用，写连接只在批量提交的线程中使用
+        self._reader = self._connect()
+        self._writer = self._connect(check_same_thread=False)
+        self._writer.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._writer.execute("CREATE INDEX IF NOT EXISTS idx_kv_expires_at ON kv (expires_at)")
+        self._writer.commit()
+        # (namespace, key) -> (值或 _MISSING 表示删除, 过期时间)
+        self._pending: Dict[Tuple[str, str], Tuple[Any, float]] = {}
+        self._flushing: Dict[Tuple[str, str], Tuple[Any, float]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._background: Optional[asyncio.Task] = None
+        # 最近查过不存在的 (namespace, key) -> 结论失效的时间；有效期相同，插入顺序就是失效顺序
+        self._absent: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._last_purge = time.time()
+        self.writes = 0
+        self.batches = 0
+        self.reads = 0
+        self.negative_hits = 0
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get(self, namespace: str, key: Hashable) -> Optional[Tuple[Any, float]]:
+        raw_key = encode_key(key)
+        # 先查还没落盘的写入，保证读到自己刚写的数据
+        for buffer in (self._pending, self._flushing):
+            entry = buffer.get((namespace, raw_key))
+            if entry is not None:
+                value, expires_at = entry
+                if value is _MISSING or expires_at <= time.time():
+                    return None
+                return value, expires_at
+        absent_until = self._absent.get((namespace, raw_key))
+        if absent_until is not None:
+            if absent_until > time.monotonic():
+                self.negative_hits += 1
+                return None
+            del self._absent[(namespace, raw_key)]
+        self.reads += 1
+        row = self._reader.execute(
+            "SELECT value, expires_at FROM kv WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (namespace, raw_key, time.time()),
+        ).fetchone()
+        if row is None:
+            if self.negative_ttl > 0:
+                self._absent[(namespace, raw_key)] = time.monotonic() + self.negative_ttl
+                if len(self._absent) > self.negative_max_entries:
+                    self._absent.popitem(last=False)
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, namespace: str, key: Hashable, value: Any, ttl: float):
+        raw_key = encode_key(key)
+        self._absent.pop((namespace, raw_key), None)
+        self._pending[(namespace, raw_key)] = (value, time.time() + ttl)
+        if len(self._pending) >= self.batch_size:
+            self._schedule_flush()
+
+    def delete(self, namespace: str, key: Hashable):
+        self._pending[(namespace, encode_key(key))] = (_MISSING, 0.0)
+
+    def keys(self, namespace: str) -> Iterator[Hashable]:
+        raw_keys = {row[0] for row in self._reader.execute(
+            "SELECT key FROM kv WHERE namespace = ? AND expires_at > ?", (namespace, time.time()))}
+        for buffer in (self._flushing, self._pending):
+            for (ns, raw_key), (value, _) in buffer.items():
+                if ns != namespace:
+                    continue
+                if value is _MISSING:
+                    raw_keys.discard(raw_key)
+                else:
+                    raw_keys.add(raw_key)
+        return (decode_key(raw_key) for raw_key in raw_keys)
+
+    def clear(self, namespace: str):
+        for raw_key in [encode_key(key) for key in self.keys(namespace)]:
+            self._pending[(namespace, raw_key)] = (_MISSING, 0.0)
+
+    def _take_batch(self) -> List[Tuple[str, str, Optional[str], float]]:
+        """在事件循环线程中取出待写数据并序列化，避免写线程读到正在被修改的对象"""
+        self._flushing, self._pending = self._pending, {}
+        batch = []
+        for (namespace, raw_key), (value, expires_at) in self._flushing.items():
+            encoded = None if value is _MISSING else json.dumps(value, ensure_ascii=False)
+            batch.append((namespace, raw_key, encoded, expires_at))
+        return batch
+
+    def _write_batch(self, batch: List[Tuple[str, str, Optional[str], float]], purge: bool):
+        upserts = [row for row in batch if row[2] is not None]
+        deletes = [(row[0], row[1]) for row in batch if row[2] is None]
+        with self._writer:
+            if upserts:
+                self._writer.executemany(
+                    "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    upserts,
+                )
+            if deletes:
+                self._writer.executemany("DELETE FROM kv WHERE namespace = ? AND key = ?", deletes)
+            if purge:
+                self._writer.execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),))
+
+    async def flush(self):
+        async with self._flush_lock:
+            purge = time.time() - self._last_purge >= self.purge_interval
+            if not self._pending and not purge:
+                return
+            batch = self._take_batch()
+            try:
+                await asyncio.to_thread(self._write_batch, batch, purge)
+                self.writes += len(batch)
+                self.batches += 1
+                if purge:
+                    self._last_purge = time.time()
+            except Exception:
+                # 写入失败时把数据放回缓冲区，下次再试（期间的新写入优先）
+                for key, entry in self._flushing.items():
+                    self._pending.setdefault(key, entry)
+                raise
+            finally:
+                self._flushing = {}
+
+    def _schedule_flush(self):
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        try:
+            self._flush_task = asyncio.get_running_loop().create_task(self._safe_flush())
+        except RuntimeError:
+            # 不在事件循环中（例如初始化阶段），交给后台任务处理
+            pass
+
+    async def _safe_flush(self):
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"[PanSearch] SQLite 批量写入失败: {str(e)}")
+
+    async def _run_flusher(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._safe_flush()
+
+    async def start(self):
+        self._background = asyncio.create_task(self._run_flusher())
+
+    async def close(self):
+        if self._background is not None:
+            self._background.cancel()
+        if self._flush_task is not None and not self._flush_task.done():
+            await self._flush_task
+        await self._safe_flush()
+        self._reader.close()
+        self._writer.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "pending": len(self._pending),
+            "writes": self.writes,
+            "batches": self.batches,
+            "reads": self.reads,
+            "negative_hits": self.negative_hits,
+        }
+
+
+def create_backend(kind: str, path: str) -> Optional[StorageBackend]:
+    """根据配置创建存储后端，"memory" 表示只使用进程内存"""
+    if kind == "sqlite":
+        return SQLiteBackend(path)
+    return None
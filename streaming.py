@@ -0,0 +1,245 @@
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+from .records import LinkRecord
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+_SCALAR = re.compile(r"[^,\]}\s]+")
+_STRUCTURE = re.compile(r'[\[\]{}"]')
+# 不含嵌套结构的对象（绝大多数链接条目），整段一次匹配跳过
+_FLAT = r'\{[^{}\[\]"]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^{}\[\]"]*)*\}'
+_FLAT_OBJECT = re.compile(_FLAT, re.S)
+# 连续的一串不含嵌套结构的数组元素
+_FLAT_RUN = re.compile(rf'{_FLAT}(?:\s*,\s*{_FLAT})*', re.S)
+
+# 当缓冲区中已消费的部分超过这个大小时丢弃，控制峰值内存
+_TRIM_THRESHOLD = 256 * 1024
+
+ROLE_CONTAINER = "container"   # 根对象及其下一层对象（如 data），需要继续查找 merged_by_type
+ROLE_MERGED = "merged"         # merged_by_type 对象
+ROLE_TYPE = "type"             # merged_by_type 中需要的网盘类型数组
+
+
+class _Frame:
+    __slots__ = ("kind", "role", "key", "expect_key", "cloud_type")
+
+    def __init__(self, kind: str, role: str, cloud_type: str = ""):
+        self.kind = kind
+        self.role = role
+        self.key = ""
+        self.expect_key = True
+        self.cloud_type = cloud_type
+
+
+class MergedStreamParser:
+    """增量解析 pansou 的 merged 响应，每种需要的网盘类型取满配额后即可停止读取。
+
+    只跟踪根对象、根对象下一层的对象（data）以及 merged_by_type 本身，
+    其余字段和超出配额的链接用正则按括号深度快速跳过，不构造任何 Python 对象；
+    需要的链接元素用 JSONDecoder.raw_decode 逐个解码。
+    在 merged_by_type 出现之前会保留完整文本，响应不是 merged 结构时由调用方回退到完整解析。
+    """
+
+    def __init__(self, cloud_types: Iterable[str], quota: int = 100):
+        self.cloud_types = tuple(cloud_types)
+        self.quota = quota
+        self.links_by_type: Dict[str, List[LinkRecord]] = {}
+        self.found_merged = False
+        self.code: Optional[int] = None
+        self.message = ""
+        self.done = False
+        self.bytes_read = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._skip_depth = 0
+        self._full = 0
+        # 根不是对象时不做增量解析，只累积文本
+        self._passthrough = False
+
+    def feed(self, chunk: bytes) -> bool:
+        """送入一段响应数据，返回 True 表示已拿到需要的全部链接，可以停止读取"""
+        if self.done:
+            return True
+        self.bytes_read += len(chunk)
+        self._buf += self._decoder.decode(chunk)
+        if not self._passthrough:
+            self._run()
+        return self.done
+
+    def close(self) -> Optional[Any]:
+        """响应读取结束。没有找到 merged_by_type 时返回完整解析的 JSON，供调用方按其他结构处理"""
+        self._buf += self._decoder.decode(b"", final=True)
+        if self.found_merged:
+            return None
+        return json.loads(self._buf)
+
+    def _run(self):
+        buf = self._buf
+        while not self.done:
+            if self._skip_depth:
+                if not self._continue_skip():
+                    break
+                self._after_value()
+                continue
+
+            pos = _WHITESPACE.match(buf, self._pos).end()
+            self._pos = pos
+            if pos >= len(buf):
+                break
+            char = buf[pos]
+
+            if not self._stack:
+                if char != "{":
+                    self._passthrough = True
+                    return
+                self._stack.append(_Frame("{", ROLE_CONTAINER))
+                self._pos = pos + 1
+                continue
+
+            top = self._stack[-1]
+            if char in "}]":
+                self._pos = pos + 1
+                self._pop()
+                continue
+            if char == ",":
+                self._pos = pos + 1
+                continue
+
+            if top.kind == "{" and top.expect_key:
+                match = _STRING.match(buf, pos)
+                if match is None:
+                    break
+                top.key = match.group()[1:-1]
+                colon = _WHITESPACE.match(buf, match.end()).end()
+                if colon >= len(buf):
+                    break
+                self._pos = colon + 1
+                top.expect_key = False
+                continue
+
+            if not self._start_value(top, char):
+                break
+
+        self._trim()
+
+    def _start_value(self, parent: _Frame, char: str) -> bool:
+        """处理一个值的开头，数据不完整需要等待更多输入时返回 False"""
+        buf = self._buf
+        pos = self._pos
+
+        if parent.role == ROLE_TYPE:
+            bucket = self.links_by_type.setdefault(parent.cloud_type, [])
+            if len(bucket) >= self.quota:
+                # 配额已满，把数组剩余部分当作一个值整体跳过
+                self._stack.pop()
+                self._skip_depth = 1
+                if not self._continue_skip():
+                    return False
+                self._after_value()
+                return True
+            if char == "{":
+                try:
+                    link, end = self._json.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    return False
+                bucket.append(LinkRecord(link.get("url", ""), link.get("password", ""), link.get("note", ""),
+                                         parent.cloud_type, link.get("source", ""), link.get("datetime") or ""))
+                self._pos = end
+                if len(bucket) == self.quota:
+                    self._full += 1
+                    if self._full == len(self.cloud_types):
+                        self.done = True
+                return True
+        elif char == "{":
+            if parent.role == ROLE_CONTAINER and parent.key == "merged_by_type":
+                self.found_merged = True
+                self._stack.append(_Frame("{", ROLE_MERGED))
+                self._pos = pos + 1
+                return True
+            if parent.role == ROLE_CONTAINER and len(self._stack) == 1:
+                self._stack.append(_Frame("{", ROLE_CONTAINER))
+                self._pos = pos + 1
+                return True
+        elif char == "[":
+            if parent.role == ROLE_MERGED and parent.key in self.cloud_types:
+                self._stack.append(_Frame("[", ROLE_TYPE, parent.key))
+                self._pos = pos + 1
+                return True
+
+        # 其余的值全部跳过
+        if char == "{" and (flat := _FLAT_OBJECT.match(buf, pos)) is not None:
+            self._pos = flat.end()
+        elif char in "{[":
+            self._skip_depth = 1
+            self._pos = pos + 1
+            if not self._continue_skip():
+                return False
+        elif char == '"':
+            match = _STRING.match(buf, pos)
+            if match is None:
+                return False
+            self._pos = match.end()
+            if parent.role == ROLE_CONTAINER and parent.key == "message":
+                self.message = json.loads(match.group())
+        else:
+            match = _SCALAR.match(buf, pos)
+            if match is None or match.end() >= len(buf):
+                return False
+            self._pos = match.end()
+            if parent.role == ROLE_CONTAINER and parent.key == "code" and len(self._stack) == 1:
+                try:
+                    self.code = int(match.group())
+                except ValueError:
+                    pass
+        self._after_value()
+        return True
+
+    def _continue_skip(self) -> bool:
+        buf = self._buf
+        pos = self._pos
+        depth = self._skip_depth
+        while depth:
+            match = _STRUCTURE.search(buf, pos)
+            if match is None:
+                pos = len(buf)
+                break
+            char = match.group()
+            if char == "{" and (flat := _FLAT_RUN.match(buf, match.start())) is not None:
+                pos = flat.end()
+            elif char == '"':
+                string = _STRING.match(buf, match.start())
+                if string is None:
+                    pos = match.start()
+                    break
+                pos = string.end()
+            elif char in "[{":
+                depth += 1
+                pos = match.end()
+            else:
+                depth -= 1
+                pos = match.end()
+        self._pos = pos
+        self._skip_depth = depth
+        return depth == 0
+
+    def _after_value(self):
+        if self._stack and self._stack[-1].kind == "{":
+            self._stack[-1].expect_key = True
+
+    def _pop(self):
+        frame = self._stack.pop()
+        if frame.role == ROLE_MERGED or not self._stack:
+            # merged_by_type 已经读完，后面的内容不再需要
+            self.done = self.done or frame.role == ROLE_MERGED
+        self._after_value()
+
+    def _trim(self):
+        if self.found_merged and self._pos > _TRIM_THRESHOLD:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
@@ -0,0 +1,64 @@
+import json
+import os
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+
+from astrbot.api import logger
+
+# 当前请求的 trace ID，未被采样的请求为 None
+_current_trace: ContextVar[Optional[str]] = ContextVar("pansou_trace_id", default=None)
+
+
+class Tracer:
+    """搜索/提取热路径的调试追踪，默认关闭。
+
+    - 只有开启追踪且被采样的请求才会分配 trace ID，其余请求调用 event() 时直接返回，
+      不做任何字符串格式化或 JSON 序列化
+    - 日志消息使用 % 风格的参数延迟格式化，payload 序列化后截断到 max_payload 个字符
+    - trace ID 存放在 contextvars 中，同一请求内的各个方法（包括并发合并后的上游请求）共享
+    """
+
+    def __init__(self, enabled: bool = False, sample_percent: float = 100.0, max_payload: int = 1024):
+        self.enabled = enabled
+        self.sample_percent = sample_percent
+        self.max_payload = max_payload
+
+    @property
+    def active(self) -> bool:
+        return _current_trace.get() is not None
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[Optional[str]]:
+        """为一次请求开启追踪，按采样率决定是否记录"""
+        if _current_trace.get() is not None or not self.enabled or random.random() * 100 >= self.sample_percent:
+            yield _current_trace.get()
+            return
+        trace_id = os.urandom(4).hex()
+        token = _current_trace.set(trace_id)
+        logger.info(f"[PanSearch][trace:{trace_id}] 开始 {name}")
+        try:
+            yield trace_id
+        finally:
+            logger.info(f"[PanSearch][trace:{trace_id}] 结束 {name}")
+            _current_trace.reset(token)
+
+    def event(self, message: str, *args: Any, payload: Any = None):
+        trace_id = _current_trace.get()
+        if trace_id is None:
+            return
+        if args:
+            message = message % args
+        if payload is not None:
+            message = f"{message}: {self.truncate(payload)}"
+        logger.info(f"[PanSearch][trace:{trace_id}] {message}")
+
+    def truncate(self, payload: Any) -> str:
+        try:
+            text = json.dumps(payload, ensure_ascii=False, default=repr)
+        except (TypeError, ValueError):
+            text = repr(payload)
+        if len(text) > self.max_payload:
+            return f"{text[:self.max_payload]}...(共 {len(text)} 字符)"
+        return text